@@ -0,0 +1,163 @@
+// Micro-benchmark for the customiser geometry core (store/static/store/geometry.js).
+//
+//   node bench/customise_geometry.js [layers ...]      (default: 10 50 200)
+//
+// Compares the old linear code (reverse scan over every element per click/move,
+// font sizes tried 160 -> 10 one by one) with SpatialGrid + TextFitter.
+// Text is measured by a stand-in for canvas measureText, so the font numbers are
+// about how many measurements happen; in a browser each one costs a few microseconds.
+const { performance } = require("perf_hooks");
+const path = require("path");
+
+const { hitTest, SpatialGrid, TextFitter } = require(path.join(__dirname, "../store/static/store/geometry.js"));
+
+const CANVAS = { w: 900, h: 650 };
+const PRINT_AREA = { x: 300, y: 150, w: 300, h: 350 };
+const TEXT_PAD = 8;
+const HIT_TESTS = 200000;
+const TEXTS = ["Proxy", "Hello world", "Class of 2026", "Team Captain #10", "Limited edition drop"];
+
+// same seed every run, so numbers are comparable between commits
+function rng(seed) {
+  return () => {
+    seed = (seed * 1103515245 + 12345) % 2147483648;
+    return seed / 2147483648;
+  };
+}
+
+function makeLayers(n, random) {
+  const layers = [];
+  for (let i = 0; i < n; i++) {
+    const w = 30 + random() * 120;
+    const h = 30 + random() * 120;
+    layers.push({
+      id: String(i),
+      x: PRINT_AREA.x + random() * (PRINT_AREA.w - w),
+      y: PRINT_AREA.y + random() * (PRINT_AREA.h - h),
+      w, h,
+    });
+  }
+  return layers;
+}
+
+// ---- old code (what customise.js did before) ----
+
+function linearHit(elements, x, y) {
+  for (let i = elements.length - 1; i >= 0; i--) {
+    if (hitTest(elements[i], x, y)) return elements[i];
+  }
+  return null;
+}
+
+function linearMaxFontSize(measure, text) {
+  for (let size = 160; size >= 10; size--) {
+    const m = measure(text, size);
+    if (m.w + TEXT_PAD * 2 <= PRINT_AREA.w && m.h + TEXT_PAD * 2 <= PRINT_AREA.h) return size;
+  }
+  return 10;
+}
+
+// ---- helpers ----
+
+function countingMeasure() {
+  const measure = (text, size) => {
+    measure.calls += 1;
+    // roughly Arial: ~0.55em per character, ~1em tall
+    return { w: text.length * size * 0.55, h: size };
+  };
+  measure.calls = 0;
+  return measure;
+}
+
+// best of RUNS (after one warm-up run, so the JIT has compiled both versions)
+const RUNS = 5;
+
+function time(fn) {
+  let result = fn();
+  let best = Infinity;
+  for (let run = 0; run < RUNS; run++) {
+    const start = performance.now();
+    result = fn();
+    best = Math.min(best, performance.now() - start);
+  }
+  return [best, result];
+}
+
+function pad(value, width) {
+  return String(value).padStart(width);
+}
+
+// ---- benchmarks ----
+
+// clicks land anywhere on the 900x650 canvas (outside the print area = deselect)
+function benchHitTests(n) {
+  const random = rng(42);
+  const layers = makeLayers(n, random);
+  const grid = new SpatialGrid();
+  layers.forEach(el => grid.insert(el));
+
+  const points = [];
+  for (let i = 0; i < HIT_TESTS; i++) {
+    points.push([random() * CANVAS.w, random() * CANVAS.h]);
+  }
+
+  const [linearMs, linearHits] = time(() => points.filter(([x, y]) => linearHit(layers, x, y)).length);
+  const [gridMs, gridHits] = time(() => points.filter(([x, y]) => grid.topmostAt(x, y)).length);
+  if (linearHits !== gridHits) throw new Error(`grid found ${gridHits} hits, linear ${linearHits}`);
+
+  // a drag: move one layer 300 times, re-filing it in the grid and hit-testing each step
+  const dragged = layers[0];
+  const [dragMs] = time(() => {
+    for (let step = 0; step < 300; step++) {
+      dragged.x = PRINT_AREA.x + (step % 150);
+      grid.update(dragged);
+      grid.topmostAt(dragged.x + 5, dragged.y + 5);
+    }
+  });
+
+  return { n, linearMs, gridMs, dragMs };
+}
+
+function benchFontFit() {
+  const oldMeasure = countingMeasure();
+  const newMeasure = countingMeasure();
+  const fitter = new TextFitter(newMeasure, { pad: TEXT_PAD });
+  const fitNew = text => fitter.maxFontSize(text, PRINT_AREA.w, PRINT_AREA.h);
+
+  const oldSizes = TEXTS.map(text => linearMaxFontSize(oldMeasure, text));
+  const newSizes = TEXTS.map(fitNew);
+  if (oldSizes.join() !== newSizes.join()) throw new Error(`sizes differ: ${oldSizes} vs ${newSizes}`);
+  const addText = [oldMeasure.calls, newMeasure.calls];
+
+  // resizing a text layer asks for its max size on every mousemove
+  oldMeasure.calls = newMeasure.calls = 0;
+  for (let move = 0; move < 60; move++) {
+    linearMaxFontSize(oldMeasure, TEXTS[0]);
+    fitNew(TEXTS[0]);
+  }
+  return { addText, resize: [oldMeasure.calls, newMeasure.calls] };
+}
+
+function main() {
+  const sizes = process.argv.slice(2).map(Number).filter(Boolean);
+  const layerCounts = sizes.length ? sizes : [10, 50, 200];
+
+  console.log(`Hit-testing (${HIT_TESTS} random clicks on the canvas, best of ${RUNS})`);
+  console.log(`${pad("layers", 7)} ${pad("linear ms", 10)} ${pad("grid ms", 10)} ${pad("speedup", 8)} ${pad("300-step drag ms", 17)}`);
+  for (const n of layerCounts) {
+    const r = benchHitTests(n);
+    console.log(
+      `${pad(r.n, 7)} ${pad(r.linearMs.toFixed(1), 10)} ${pad(r.gridMs.toFixed(1), 10)} `
+      + `${pad((r.linearMs / r.gridMs).toFixed(1) + "x", 8)} ${pad(r.dragMs.toFixed(2), 17)}`,
+    );
+  }
+
+  const fit = benchFontFit();
+  console.log("");
+  console.log("Text fitting (measureText calls)");
+  console.log(`${pad("", 28)} ${pad("old", 6)} ${pad("new", 6)}`);
+  console.log(`${`Add Text, ${TEXTS.length} texts`.padEnd(28)} ${pad(fit.addText[0], 6)} ${pad(fit.addText[1], 6)}`);
+  console.log(`${"resize drag, 60 mousemoves".padEnd(28)} ${pad(fit.resize[0], 6)} ${pad(fit.resize[1], 6)}`);
+}
+
+main();
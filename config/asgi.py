@@ -5,6 +5,33 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+ASGI deployment mode
+--------------------
+The catalogue (home, shop, product_detail), cart and checkout/payment/thank-you views
+are async, and every middleware in settings.MIDDLEWARE is async-capable, so under an
+ASGI server those requests don't tie up a thread while they wait on the DB or cache.
+The other views are sync; Django runs them in a thread pool for us.
+
+    pip install -r requirements-asgi.txt
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+or behind gunicorn:
+
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+Notes:
+- Don't set DB_CONN_MAX_AGE under ASGI (it defaults to 0; set it to 60 for WSGI
+  deployments only). Sync code runs in a fresh thread per request, so
+  persistent connections would pile up instead of being reused. (With DB_PROFILE=postgres
+  the connection pool does the reusing instead.)
+- Static/media files are not served by uvicorn; put a web server or WhiteNoise in front.
+- The WSGI entry point (config/wsgi.py) keeps working unchanged; async views just run
+  through async_to_sync there.
+
+Compare the two paths on your machine with:
+
+    python manage.py bench_asgi --users 16 --iterations 5 --json bench-asgi.json
 """
 
 import os
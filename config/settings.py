@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,7 +44,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # per-view timings for /admin-panel/metrics/ (wraps everything below it)
+    'store.metrics.PerformanceMiddleware',
+    # outermost so session saves etc. count towards each view's @query_budget
+    'store.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # request.cart, kept in a signed cookie instead of the session (store/cart_store.py)
+    'store.cart_store.CartMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -76,14 +83,129 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+#
+# Picked with the DB_PROFILE environment variable:
+#   sqlite        (default) SQLite tuned for concurrent checkouts: WAL journal,
+#                 synchronous=NORMAL, busy timeout, BEGIN IMMEDIATE, persistent connections
+#                 (those only with DB_CONN_MAX_AGE set, see below)
+#   sqlite-plain  SQLite with Django's defaults (only useful to compare in benchmarks;
+#                 same SQLITE_PATH file as sqlite, so both runs hit the same data, but it
+#                 switches the file back to a rollback journal: WAL sticks to the file)
+#   postgres      PostgreSQL with a psycopg connection pool
+#                 (pip install -r requirements-postgres.txt; set POSTGRES_* below)
+# Compare them with: DB_PROFILE=... python manage.py bench_checkout
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'proxy'),
+            'USER': os.environ.get('POSTGRES_USER', 'proxy'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # the pool keeps connections open itself, so CONN_MAX_AGE must stay 0
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX', '10')),
+                    'timeout': 10,
+                },
+            },
+        }
+    }
+elif DB_PROFILE == 'sqlite-plain':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # a tuned run leaves the file in WAL mode, which would make this one tuned too
+                'init_command': 'PRAGMA journal_mode=DELETE;',
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            # keep connections between requests instead of reopening the file each time.
+            # Off unless asked for: set DB_CONN_MAX_AGE=60 when serving with WSGI workers
+            # (gunicorn etc.). Leave it unset under ASGI, where every sync_to_async
+            # thread would keep a connection of its own.
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # seconds a writer waits for the lock before "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),
+                # take the write lock at BEGIN, so two transactions can't deadlock
+                # upgrading read locks (the usual cause of instant "database is locked")
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: readers don't block the writer (and vice versa);
+                # NORMAL is safe with WAL and avoids an fsync on every commit
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                ),
+            },
+        }
+    }
+
+
+# What to do when a view runs more queries than its @query_budget:
+# "raise", "log" (warning in the log) or "off".
+# `manage.py test` always raises (TEST_RUNNER below switches it on for the run).
+QUERY_BUDGET_MODE = 'log'
+TEST_RUNNER = 'store.test_runner.QueryBudgetTestRunner'
+
+
+# Request metrics (store/metrics.py), served at /admin-panel/metrics/ in Prometheus format.
+# Numbers are per process; with several workers set SHARED_DIR so every worker's
+# snapshot is added into the scrape (clear the folder on deploy).
+METRICS = {
+    "ENABLED": True,
+    "SHARED_DIR": os.environ.get("METRICS_DIR") or None,
+    "FLUSH_INTERVAL": 10,        # seconds between snapshot writes to SHARED_DIR
+    "SLOW_REQUEST_MS": 500,      # slower requests get a SQL trace (if sampled)
+    "TRACE_SAMPLE_RATE": 0.1,    # share of requests that collect their SQL
+    "TRACE_KEEP": 50,
+    "TOKEN": os.environ.get("METRICS_TOKEN") or None,  # Prometheus: Authorization: Bearer <token>
+}
 
-DATABASES = {
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Local memory is per process. With several web processes (or run_workers) use the
+# file backend instead so catalogue invalidation reaches every process:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'proxy-default',
     }
 }
 
+# Cart storage (store/cart_store.py): signed cookie, big carts go to the cache.
+# With several server processes CACHE must be a shared cache (Redis/Memcached/database),
+# LocMemCache is per process.
+CART_STORE = {
+    "COOKIE_NAME": "cart",
+    "COOKIE_MAX_BYTES": 1024,
+    "CACHE": "default",
+}
+
+# Seconds the home/shop/product fragments may live (they are also invalidated
+# straight away by Product save/delete, see store/signals.py)
+CATALOGUE_CACHE_TIMEOUT = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -120,6 +242,44 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+# `manage.py build_static` collects, minifies, hashes and gzips/brotlis everything here
+STATIC_ROOT = BASE_DIR / "staticfiles"
+# Let Django serve STATIC_ROOT itself (store/static_pipeline.serve_static: precompressed files,
+# immutable caching for hashed names). Turn off when nginx serves /static/ (gzip_static/brotli_static).
+SERVE_STATIC = os.environ.get("SERVE_STATIC", "1") == "1"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Uploads are stored once per unique content (see store/storage.py + `manage.py gc_media`).
+# Static files get content-hashed names + .gz/.br copies (store/static_pipeline.py)
+STORAGES = {
+    "default": {
+        "BACKEND": "store.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "store.static_pipeline.PrecompressedManifestStorage",
+    },
+}
+
+
+# Background jobs (store/services/job_queue.py, run with `manage.py run_workers`)
+JOB_QUEUE = {
+    "WORKERS": 2,            # threads per run_workers process
+    "MAX_ATTEMPTS": 3,       # tries before a job is marked FAILED
+    "RETRY_DELAY": 30,       # seconds; multiplied by the attempt number
+    "POLL_INTERVAL": 1.0,    # seconds a worker sleeps when the queue is empty
+    "STALE_AFTER": 600,      # seconds before a RUNNING job is assumed dead and re-queued
+    "STALE_CHECK_EVERY": 60, # worker polls between checks for such jobs (also done at start)
+    "EAGER": False,          # True = run jobs inline in the request (handy without a worker)
+}
+
+
+# Print-resolution design files for production (store/services/print_export.py,
+# `manage.py export_print_files`). The product's print_w box is PRINT_WIDTH_IN wide on the garment.
+PRINT_EXPORT = {
+    "DPI": 300,
+    "PRINT_WIDTH_IN": 12,
+    "STRIP_HEIGHT": 512,     # rows rendered at a time; memory ~ 3600 px * this * 4 bytes
+    "WORKERS": None,         # export_print_files processes, None = one per CPU core
+}
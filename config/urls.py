@@ -15,14 +15,21 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from store.static_pipeline import serve_static
+from store.storage import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('store.urls')),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
+
+if settings.SERVE_STATIC:
+    # static() only works with DEBUG on; this one also serves the built files in production
+    urlpatterns.insert(0, re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), serve_static))
@@ -22,4 +22,8 @@ urlpatterns = [
     # Users
     path("users/", admin_views.admin_users_list, name="admin_users_list"),
     path("users/<int:user_id>/toggle-active/", admin_views.admin_users_toggle_active, name="admin_users_toggle_active"),
+
+    # Metrics (Prometheus text format) + slow request traces
+    path("metrics/", admin_views.admin_metrics, name="admin_metrics"),
+    path("metrics/traces/", admin_views.admin_metrics_traces, name="admin_metrics_traces"),
 ]
@@ -1,8 +1,19 @@
 from django.contrib.auth.decorators import user_passes_test
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 
+from .forms import OrderFilterForm
+from .metrics import collect, metrics_setting, render_prometheus
 from .models import Product, Order, OrderItem, Design
+from .query_budget import query_budget
+from .services.job_queue import enqueue
+from .services.keyset import keyset_page
+from .services.product_images import print_box_error
+from .services.queries import (
+    admin_designs, admin_orders, admin_products, admin_users, order_items, recent_orders,
+)
+from .services.stats import daily_series, get_stats
 
 # -----------------------------
 # Helper: only allow staff users
@@ -14,18 +25,55 @@ def staff_only(user):
 staff_required = user_passes_test(staff_only)
 
 
+def paginate(request, queryset, field="created_at"):
+    # keyset pagination: ?after=<cursor> for older rows, ?before=<cursor> for newer
+    return keyset_page(
+        queryset,
+        field=field,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+
+
+def pager_context(request, page):
+    # keep the other GET params (filters) when moving between pages
+    params = request.GET.copy()
+    for key in ("after", "before"):
+        params.pop(key, None)
+    base = params.urlencode()
+    prefix = f"?{base}&" if base else "?"
+
+    return {
+        "page": page,
+        "next_url": f"{prefix}after={page.next_cursor}" if page.next_cursor else None,
+        "prev_url": f"{prefix}before={page.prev_cursor}" if page.prev_cursor else None,
+    }
+
+
 # -----------------------------
 # Dashboard
 # -----------------------------
 @staff_required
+@query_budget(5)
 def admin_dashboard(request):
     # quick stats for the admin home page
+    # (pre-computed counters + daily rollups instead of COUNT(*) on every load)
+    stats = get_stats()
+    days = daily_series(14)
+
+    # bar heights for the little orders-per-day chart
+    busiest = max([d.orders for d in days] + [1])
+    for d in days:
+        d.bar_pct = round(d.orders * 100 / busiest)
+
     return render(request, "store/admin/dashboard.html", {
-        "product_count": Product.objects.count(),
-        "order_count": Order.objects.count(),
-        "design_count": Design.objects.count(),
-        "user_count": User.objects.count(),
-        "recent_orders": Order.objects.order_by("-created_at")[:5]
+        "product_count": stats.product_count,
+        "order_count": stats.order_count,
+        "design_count": stats.design_count,
+        "user_count": stats.user_count,
+        "stats": stats,
+        "days": days,
+        "recent_orders": recent_orders()
     })
 
 
@@ -33,16 +81,22 @@ def admin_dashboard(request):
 # PRODUCTS (CRUD)
 # -----------------------------
 @staff_required
+@query_budget(3)
 def admin_products_list(request):
-    products = Product.objects.all().order_by("-created_at")
-    return render(request, "store/admin/products_list.html", {"products": products})
+    page = paginate(request, admin_products())
+    return render(request, "store/admin/products_list.html", {"products": page, **pager_context(request, page)})
+
+
+def product_form_error(product):
+    return print_box_error(product.print_x, product.print_y, product.print_w, product.print_h)
 
 
 @staff_required
+@query_budget(13)  # worst case: two brand-new image blobs to reference-count + stats
 def admin_products_create(request):
     # keeping it simple: manual form handling
     if request.method == "POST":
-        Product.objects.create(
+        product = Product(
             name=request.POST.get("name", "").strip(),
             price=request.POST.get("price") or 0,
             description=request.POST.get("description", "").strip(),
@@ -53,6 +107,19 @@ def admin_products_create(request):
             print_w=int(request.POST.get("print_w") or 300),
             print_h=int(request.POST.get("print_h") or 360),
         )
+        error = product_form_error(product)
+        if error:
+            return render(request, "store/admin/products_form.html", {
+                "mode": "create",
+                "product": product,
+                "error": error,
+            }, status=400)
+
+        product.save()
+        # heavy image work happens in the worker, not in this request
+        # (including the canvas-sized copy of the template the customiser draws)
+        if product.image or product.template_image:
+            enqueue("process_product_images", product_id=product.id)
         return redirect("admin_products_list")
 
     return render(request, "store/admin/products_form.html", {
@@ -62,6 +129,7 @@ def admin_products_create(request):
 
 
 @staff_required
+@query_budget(13)
 def admin_products_edit(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
@@ -71,17 +139,32 @@ def admin_products_edit(request, product_id):
         product.description = request.POST.get("description", "").strip()
 
         # optional image updates
+        images_changed = False
         if request.FILES.get("image"):
             product.image = request.FILES["image"]
+            images_changed = True
         if request.FILES.get("template_image"):
             product.template_image = request.FILES["template_image"]
+            # the old pre-scaled copy is stale; the customiser uses the upload until the job is done
+            product.template_canvas = None
+            images_changed = True
 
         product.print_x = int(request.POST.get("print_x") or product.print_x)
         product.print_y = int(request.POST.get("print_y") or product.print_y)
         product.print_w = int(request.POST.get("print_w") or product.print_w)
         product.print_h = int(request.POST.get("print_h") or product.print_h)
 
+        error = product_form_error(product)
+        if error:
+            return render(request, "store/admin/products_form.html", {
+                "mode": "edit",
+                "product": product,
+                "error": error,
+            }, status=400)
+
         product.save()
+        if images_changed:
+            enqueue("process_product_images", product_id=product.id)
         return redirect("admin_products_list")
 
     return render(request, "store/admin/products_form.html", {
@@ -91,6 +174,7 @@ def admin_products_edit(request, product_id):
 
 
 @staff_required
+@query_budget(11)  # + 2-3 per cascaded design (preview refcount + dashboard stats)
 def admin_products_delete(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
@@ -110,19 +194,27 @@ def admin_products_delete(request, product_id):
 # ORDERS
 # -----------------------------
 @staff_required
+@query_budget(3)
 def admin_orders_list(request):
-    orders = Order.objects.all().order_by("-created_at")
-    return render(request, "store/admin/orders_list.html", {"orders": orders})
+    form = OrderFilterForm(request.GET or None)
+    page = paginate(request, form.filter(admin_orders()))
+    return render(request, "store/admin/orders_list.html", {
+        "orders": page,
+        "filter_form": form,
+        **pager_context(request, page)
+    })
 
 
 @staff_required
+@query_budget(4)
 def admin_orders_detail(request, order_id):
     order = get_object_or_404(Order, id=order_id)
-    items = order.items.all()  # because related_name="items"
+    items = order_items(order.id)
     return render(request, "store/admin/orders_detail.html", {"order": order, "items": items})
 
 
 @staff_required
+@query_budget(8)
 def admin_orders_update_status(request, order_id):
     order = get_object_or_404(Order, id=order_id)
 
@@ -138,14 +230,16 @@ def admin_orders_update_status(request, order_id):
 # DESIGNS
 # -----------------------------
 @staff_required
+@query_budget(3)
 def admin_designs_list(request):
-    designs = Design.objects.select_related("user", "product").order_by("-created_at")
-    return render(request, "store/admin/designs_list.html", {"designs": designs})
+    page = paginate(request, admin_designs())
+    return render(request, "store/admin/designs_list.html", {"designs": page, **pager_context(request, page)})
 
 
 @staff_required
+@query_budget(3)
 def admin_designs_detail(request, design_id):
-    design = get_object_or_404(Design, id=design_id)
+    design = get_object_or_404(Design.objects.select_related("user", "product").defer("design_data"), id=design_id)
     return render(request, "store/admin/designs_detail.html", {"design": design})
 
 
@@ -153,12 +247,14 @@ def admin_designs_detail(request, design_id):
 # USERS
 # -----------------------------
 @staff_required
+@query_budget(3)
 def admin_users_list(request):
-    users = User.objects.all().order_by("-date_joined")
-    return render(request, "store/admin/users_list.html", {"users": users})
+    page = paginate(request, admin_users(), field="date_joined")
+    return render(request, "store/admin/users_list.html", {"users": page, **pager_context(request, page)})
 
 
 @staff_required
+@query_budget(3)
 def admin_users_toggle_active(request, user_id):
     user = get_object_or_404(User, id=user_id)
 
@@ -168,3 +264,30 @@ def admin_users_toggle_active(request, user_id):
         user.save()
 
     return redirect("admin_users_list")
+
+
+# -----------------------------
+# Metrics (PerformanceMiddleware)
+# -----------------------------
+def can_read_metrics(request):
+    # staff in the browser, or Prometheus with the METRICS["TOKEN"] bearer token
+    token = metrics_setting("TOKEN")
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        return True
+    return staff_only(request.user)
+
+
+@query_budget(3)
+def admin_metrics(request):
+    # 403 rather than a login redirect: scrapers don't follow redirects to a form
+    if not can_read_metrics(request):
+        return HttpResponseForbidden("Staff only")
+    return HttpResponse(render_prometheus(collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@query_budget(3)
+def admin_metrics_traces(request):
+    if not can_read_metrics(request):
+        return HttpResponseForbidden("Staff only")
+    # newest first; each has the SQL the request ran (sampled, slow requests only)
+    return JsonResponse({"traces": list(reversed(collect()["traces"]))})
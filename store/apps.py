@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class StoreConfig(AppConfig):
     name = 'store'
+
+    def ready(self):
+        # registers the background job functions with the job queue
+        from . import tasks  # noqa: F401
+        from .metrics import connect_metrics
+        from .signals import connect_media_signals
+
+        connect_media_signals()
+        connect_metrics()
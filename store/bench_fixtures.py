@@ -0,0 +1,144 @@
+"""
+Fake-but-realistic data for the benchmark commands (bench_flows).
+
+Everything is bulk inserted and marked (BENCH_PREFIX product names, bench_user_N/bench_staff usernames,
+BENCH_DELIVERY orders), so clear_bench_data() removes it again without touching real rows.
+bulk_create skips signals, so the dashboard stats are reconciled at the end instead.
+"""
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from store.loadtest import BENCH_DELIVERY, BENCH_PASSWORD, BENCH_PREFIX
+from store.models import Design, Job, Order, OrderItem, Product
+from store.services.catalogue_cache import bump_catalogue_version
+from store.services.stats import reconcile_days, reconcile_totals
+
+BENCH_USER_PREFIX = "bench_user_"
+BENCH_STAFF = "bench_staff"
+
+# Orders/designs are spread over this many days (so the dashboard chart + keyset pages are realistic)
+SPREAD_DAYS = 90
+BATCH_SIZE = 500
+
+SIZES = ["S", "M", "L", "XL"]
+STATUSES = ["PENDING", "PAID", "PAID", "PAID", "SHIPPED"]
+
+SAMPLE_DESIGN = json.dumps({
+    "version": 2,
+    "printArea": {"x": 300, "y": 150, "w": 300, "h": 350},
+    "elements": [
+        {"id": "t1", "type": "text", "text": "Proxy", "fontSize": 48, "color": "#111111",
+         "x": 340, "y": 220, "w": 200, "h": 60},
+    ],
+})
+
+
+def bench_username(number):
+    return f"{BENCH_USER_PREFIX}{number}"
+
+
+def random_past(rng, now):
+    return now - timedelta(seconds=rng.randint(0, SPREAD_DAYS * 24 * 3600))
+
+
+def seed(products=2000, users=300, designs=3000, orders=2000, items_per_order=3, random_seed=1):
+    """
+    Clears old bench data and inserts a fresh set. Same random_seed = same data,
+    so runs on different commits are comparable. Returns the row counts.
+    """
+    clear_bench_data()
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    # hashed once, shared by every bench user (hashing thousands of passwords takes minutes)
+    password = make_password(BENCH_PASSWORD)
+
+    with transaction.atomic():
+        Product.objects.bulk_create([
+            Product(
+                name=f"{BENCH_PREFIX}Tee {i}",
+                description="Heavyweight cotton tee, printed to order.",
+                price=Decimal(rng.randint(1200, 3500)) / 100,
+            )
+            for i in range(products)
+        ], batch_size=BATCH_SIZE)
+        product_rows = list(Product.objects.filter(name__startswith=BENCH_PREFIX).only("id", "price"))
+
+        User.objects.bulk_create(
+            [User(username=bench_username(i), email=f"{bench_username(i)}@example.com", password=password)
+             for i in range(users)]
+            + [User(username=BENCH_STAFF, email="bench_staff@example.com", password=password, is_staff=True)],
+            batch_size=BATCH_SIZE,
+        )
+        user_rows = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX).only("id"))
+
+        design_rows = Design.objects.bulk_create([
+            Design(
+                user=rng.choice(user_rows),
+                product=rng.choice(product_rows),
+                design_data=SAMPLE_DESIGN,
+                size=rng.choice(SIZES),
+            )
+            for _ in range(designs)
+        ], batch_size=BATCH_SIZE)
+
+        order_rows = []
+        lines = []
+        for _ in range(orders):
+            picked = rng.sample(product_rows, min(items_per_order, len(product_rows)))
+            qtys = [rng.randint(1, 3) for _ in picked]
+            order = Order(
+                user=rng.choice(user_rows) if user_rows and rng.random() < 0.7 else None,
+                total_amount=sum(p.price * q for p, q in zip(picked, qtys)),
+                status=rng.choice(STATUSES),
+                **BENCH_DELIVERY,
+            )
+            order_rows.append(order)
+            lines.append(list(zip(picked, qtys)))
+        Order.objects.bulk_create(order_rows, batch_size=BATCH_SIZE)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, qty=qty, unit_price=product.price)
+            for order, order_lines in zip(order_rows, lines)
+            for product, qty in order_lines
+        ], batch_size=BATCH_SIZE)
+
+        # auto_now_add stamped everything "now"; spread it out like real history
+        for row in design_rows + order_rows:
+            row.created_at = random_past(rng, now)
+        Design.objects.bulk_update(design_rows, ["created_at"], batch_size=BATCH_SIZE)
+        Order.objects.bulk_update(order_rows, ["created_at"], batch_size=BATCH_SIZE)
+
+    refresh_derived_data()
+    return {"products": products, "users": users + 1, "designs": designs, "orders": orders}
+
+
+def bench_users():
+    # only the exact accounts seed() makes: a real "bench_alice" is left alone
+    return User.objects.filter(Q(username__startswith=BENCH_USER_PREFIX) | Q(username=BENCH_STAFF))
+
+
+def clear_bench_data():
+    """Deletes every row seed() or the benchmark flows created."""
+    design_ids = list(Design.objects.filter(user__in=bench_users()).values_list("id", flat=True))
+    # queued preview renders for bench designs (saved during the flows)
+    Job.objects.filter(kind="render_design_preview", payload__design_id__in=design_ids).delete()
+
+    Order.objects.filter(email=BENCH_DELIVERY["email"], full_name=BENCH_DELIVERY["full_name"]).delete()
+    bench_users().delete()
+    Product.objects.filter(name__startswith=BENCH_PREFIX).delete()
+    refresh_derived_data()
+
+
+def refresh_derived_data():
+    reconcile_totals()
+    today = timezone.localdate()
+    reconcile_days(today - timedelta(days=SPREAD_DAYS), today)
+    bump_catalogue_version()
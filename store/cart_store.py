@@ -0,0 +1,208 @@
+"""
+The shopping cart, kept out of the session (and so out of the database).
+
+It used to live in request.session["cart"], so every add/remove rewrote the whole
+django_session row, and the navbar count loaded the session on every page.
+Now the browser keeps it:
+- small carts (nearly all of them): a signed cookie with the lines in a compact form,
+  "12*2|12:40:M*1" (line key * qty, see order_service.line_key)
+- big carts (encoded > COOKIE_MAX_BYTES): the same text in the cache, the cookie
+  only holds a random id ("@" + token)
+The cookie is signed, so a browser can't make up lines (prices are looked up anyway).
+Anonymous browsing + adding to cart runs no INSERT/UPDATE at all.
+
+Views use request.cart (set by CartMiddleware):
+
+    request.cart.add(product_id, design_id, size)
+    request.cart.remove(key)
+    request.cart.clear()
+    request.cart.lines    # {key: {"qty": n}}, what order_service.price_cart takes
+    request.cart.count    # total qty (navbar)
+
+Async views call `await request.cart.aload()` first (a big cart is a cache read).
+"""
+import secrets
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+from store.services.order_service import line_key
+
+DEFAULTS = {
+    "COOKIE_NAME": "cart",
+    "COOKIE_MAX_BYTES": 1024,        # bigger carts move to the cache (browsers cap a cookie at ~4 KB)
+    "MAX_AGE": 60 * 60 * 24 * 14,    # seconds, same as the session cookie
+    "CACHE": "default",              # cache alias for big carts (must be shared by all workers)
+}
+
+SALT = "store.cart"
+CACHE_MARK = "@"
+MAX_LINES = 100
+MAX_QTY = 99
+
+
+def cart_setting(name):
+    return getattr(settings, "CART_STORE", {}).get(name, DEFAULTS[name])
+
+
+def cache_key(token):
+    return f"cart:{token}"
+
+
+def encode(lines):
+    return "|".join(f"{key}*{line['qty']}" for key, line in lines.items())
+
+
+def decode(text):
+    """Compact text -> {key: {"qty": n}}. Anything unreadable is dropped, not an error."""
+    lines = {}
+    for part in (text or "").split("|"):
+        key, _, qty = part.rpartition("*")
+        if key and qty.isdigit() and int(qty) > 0 and len(lines) < MAX_LINES:
+            lines[key] = {"qty": min(int(qty), MAX_QTY)}
+    return lines
+
+
+class Cart:
+    def __init__(self, request):
+        self.request = request
+        self.token = None  # set while the cart lives in the cache
+        self._lines = None
+        self.modified = False
+
+    def cookie_value(self):
+        return self.request.get_signed_cookie(
+            cart_setting("COOKIE_NAME"), default=None, salt=SALT, max_age=cart_setting("MAX_AGE"),
+        )
+
+    def load(self):
+        if self._lines is None:
+            value = self.cookie_value()
+            if value and value.startswith(CACHE_MARK):
+                self.token = value[len(CACHE_MARK):]
+                value = caches[cart_setting("CACHE")].get(cache_key(self.token))
+            self._lines = decode(value)
+        return self._lines
+
+    async def aload(self):
+        if self._lines is None:
+            value = self.cookie_value()
+            if value and value.startswith(CACHE_MARK):
+                self.token = value[len(CACHE_MARK):]
+                value = await caches[cart_setting("CACHE")].aget(cache_key(self.token))
+            self._lines = decode(value)
+        return self._lines
+
+    @property
+    def lines(self):
+        return self.load()
+
+    @property
+    def count(self):
+        return sum(line["qty"] for line in self.load().values())
+
+    def __bool__(self):
+        return bool(self.load())
+
+    # ---- changes (written back by CartMiddleware) ----
+
+    def add(self, product_id, design_id=None, size=""):
+        """Adds one of (product, design, size) and returns the line key."""
+        lines = self.load()
+        key = line_key(product_id, design_id, size)
+        if key in lines:
+            lines[key]["qty"] = min(lines[key]["qty"] + 1, MAX_QTY)
+        elif len(lines) < MAX_LINES:
+            lines[key] = {"qty": 1}
+        self.modified = True
+        return key
+
+    def remove(self, key):
+        if self.load().pop(key, None) is not None:
+            self.modified = True
+
+    def clear(self):
+        self._lines = {}
+        self.modified = True
+
+    def drop(self, keys):
+        """Removes lines whose product/design is gone (PricedCart.missing_ids)."""
+        for key in keys:
+            self.remove(key)
+
+    # ---- saving ----
+
+    def plan_save(self):
+        """
+        What saving needs: (cookie value or None to delete it, (cache key, text) to store or None,
+        cache key to delete or None). Shared by save() and asave().
+        """
+        text = encode(self._lines)
+        old_key = cache_key(self.token) if self.token else None
+
+        if not text:
+            return None, None, old_key
+        if len(text) <= cart_setting("COOKIE_MAX_BYTES"):
+            return text, None, old_key
+
+        self.token = self.token or secrets.token_urlsafe(16)
+        return CACHE_MARK + self.token, (cache_key(self.token), text), None
+
+    def set_cookie(self, response, value):
+        name = cart_setting("COOKIE_NAME")
+        if value is None:
+            response.delete_cookie(name, samesite="Lax")
+            return
+        response.set_signed_cookie(
+            name, value, salt=SALT, max_age=cart_setting("MAX_AGE"),
+            httponly=True, samesite="Lax", secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+    def save(self, response):
+        if not self.modified:
+            return
+        value, store, delete = self.plan_save()
+        cache = caches[cart_setting("CACHE")]
+        if store:
+            cache.set(*store, cart_setting("MAX_AGE"))
+        if delete:
+            cache.delete(delete)
+        self.set_cookie(response, value)
+
+    async def asave(self, response):
+        if not self.modified:
+            return
+        value, store, delete = self.plan_save()
+        cache = caches[cart_setting("CACHE")]
+        if store:
+            await cache.aset(*store, cart_setting("MAX_AGE"))
+        if delete:
+            await cache.adelete(delete)
+        self.set_cookie(response, value)
+
+
+class CartMiddleware:
+    """Puts a lazy Cart on request.cart and writes it back to the response if it changed."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.cart = Cart(request)
+        response = self.get_response(request)
+        request.cart.save(response)
+        return response
+
+    async def __acall__(self, request):
+        request.cart = Cart(request)
+        response = await self.get_response(request)
+        await request.cart.asave(response)
+        return response
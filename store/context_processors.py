@@ -1,11 +1,11 @@
 def cart_count(request):
     """
     Adds cart item count to every template.
-    Using session cart: {"product_id": {"qty": number}}
+    Reads the cart cookie (store/cart_store.py), so it needs no session/database.
     """
-    cart = request.session.get("cart", {})
+    cart = getattr(request, "cart", None)
 
     # Total quantity of items (so if qty=3 it counts as 3)
-    count = sum(item.get("qty", 0) for item in cart.values())
+    count = cart.count if cart is not None else 0
 
     return {"cart_count": count}
@@ -1,7 +1,12 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from .models import Order
+
 INPUT_CLASS = "input-field"
 
 class CheckoutForm(forms.Form):
@@ -48,4 +53,38 @@ class RegisterForm(UserCreationForm):
 
         # Make password inputs match your styling
         self.fields["password1"].widget.attrs.update({"class": INPUT_CLASS, "placeholder": "Password"})
-        self.fields["password2"].widget.attrs.update({"class": INPUT_CLASS, "placeholder": "Confirm password"})
\ No newline at end of file
+        self.fields["password2"].widget.attrs.update({"class": INPUT_CLASS, "placeholder": "Confirm password"})
+
+
+class OrderFilterForm(forms.Form):
+    """
+    Filters for the admin orders list (GET form, every field optional).
+    """
+    status = forms.ChoiceField(
+        required=False,
+        choices=[("", "All statuses")] + Order.STATUS_CHOICES,
+        widget=forms.Select(attrs={"class": INPUT_CLASS})
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"class": INPUT_CLASS, "type": "date"})
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"class": INPUT_CLASS, "type": "date"})
+    )
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data["status"]:
+            queryset = queryset.filter(status=data["status"])
+        # compare against datetimes (not created_at__date) so the index can be used
+        if data["date_from"]:
+            start = timezone.make_aware(datetime.combine(data["date_from"], time.min))
+            queryset = queryset.filter(created_at__gte=start)
+        if data["date_to"]:
+            end = timezone.make_aware(datetime.combine(data["date_to"] + timedelta(days=1), time.min))
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
@@ -0,0 +1,405 @@
+"""
+Small in-process HTTP driver for the benchmark commands.
+
+Requests go through the real WSGI or ASGI handler (every middleware, sessions, CSRF,
+templates), only without a socket in between, so the numbers compare the two handler
+paths of *this* app rather than a web server.
+
+A scenario is a generator that yields Step(...)s and gets a Response back for each,
+so one scenario runs unchanged on both drivers:
+
+    def buy(vu):
+        response = yield Step("shop", "GET", "/shop/")
+        ...
+"""
+import asyncio
+import html
+import io
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+
+HOST = "localhost"
+
+# QueryBudgetMiddleware adds this header when settings.QUERY_COUNT_HEADER is on
+QUERY_COUNT_HEADER = "x-query-count"
+
+# Rows created by the benchmark commands are marked with these, so they can be cleaned up
+BENCH_PREFIX = "[bench] "
+BENCH_DELIVERY = {
+    "full_name": "Bench Buyer",
+    "email": "bench@example.com",
+    "address_line1": "1 Load Street",
+    "city": "London",
+    "postcode": "E1 1AA",
+    "country": "UK",
+}
+
+
+class Step:
+    def __init__(self, label, method, path, data=None):
+        self.label = label
+        self.method = method
+        self.path = path
+        self.data = data
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers  # list of (name, value), names lower-case
+        self.body = body
+
+    def header(self, name):
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return None
+
+    @property
+    def location(self):
+        return self.header("location") or ""
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+
+class VirtualUser:
+    """One browser: keeps its own cookies (session + csrftoken) between requests."""
+
+    def __init__(self, number):
+        self.number = number
+        self.cookies = {}
+        self.state = {}  # scenarios keep per-user things here (logged in yet, ...)
+
+    def request_parts(self, step):
+        """(path, query_string, headers, body) for a step, headers as (name, value) str pairs."""
+        parts = urlsplit(step.path)
+        body = urlencode(step.data or {}, doseq=True).encode()
+        headers = [("host", HOST)]
+        if self.cookies:
+            headers.append(("cookie", "; ".join(f"{k}={v}" for k, v in self.cookies.items())))
+        if step.method == "POST":
+            headers.append(("content-type", "application/x-www-form-urlencoded"))
+            headers.append(("content-length", str(len(body))))
+            if "csrftoken" in self.cookies:
+                headers.append(("x-csrftoken", self.cookies["csrftoken"]))
+        return parts.path, parts.query, headers, body
+
+    def remember_cookies(self, response):
+        for name, value in response.headers:
+            if name != "set-cookie":
+                continue
+            for morsel in SimpleCookie(value).values():
+                if morsel["max-age"] == "0" or not morsel.value:
+                    self.cookies.pop(morsel.key, None)
+                else:
+                    self.cookies[morsel.key] = morsel.value
+
+
+# ----------------------------
+# DRIVERS
+# ----------------------------
+
+class WsgiDriver:
+    def __init__(self):
+        self.application = get_wsgi_application()
+
+    def send(self, vu, step):
+        path, query, headers, body = vu.request_parts(step)
+        environ = {
+            "REQUEST_METHOD": step.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": HOST,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers:
+            if name in ("content-type", "content-length"):
+                environ[name.upper().replace("-", "_")] = value
+            else:
+                environ["HTTP_" + name.upper().replace("-", "_")] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower(), v) for k, v in response_headers]
+
+        result = self.application(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            # fires request_finished (closes/recycles the DB connection like a real server)
+            if hasattr(result, "close"):
+                result.close()
+
+        return Response(started["status"], started["headers"], content)
+
+
+class AsgiDriver:
+    def __init__(self):
+        self.application = get_asgi_application()
+
+    async def send(self, vu, step):
+        path, query, headers, body = vu.request_parts(step)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": step.method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(k.encode(), v.encode()) for k, v in headers],
+            "client": ("127.0.0.1", 50000 + vu.number),
+            "server": (HOST, 80),
+        }
+
+        finished = asyncio.Event()
+        body_sent = False
+        started = {}
+        chunks = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Django listens for a disconnect while the view runs; only "disconnect" after the response
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                started["status"] = message["status"]
+                started["headers"] = [(k.decode().lower(), v.decode()) for k, v in message["headers"]]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    finished.set()
+
+        await self.application(scope, receive, send)
+        finished.set()
+        return Response(started["status"], started["headers"], b"".join(chunks))
+
+
+# ----------------------------
+# RUNNERS
+# ----------------------------
+
+class RunResult:
+    """Latencies (ms) per step label + failures, filled in by the runners."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, step, response, ms):
+        with self.lock:
+            self.latencies[step.label].append(ms)
+            count = response.header(QUERY_COUNT_HEADER)
+            if count is not None:
+                self.queries[step.label].append(int(count))
+            if not response.ok:
+                self.failures[f"{step.label}: HTTP {response.status}"] += 1
+
+    def record_error(self, step, exc):
+        with self.lock:
+            self.failures[f"{step.label}: {type(exc).__name__}"] += 1
+
+    @property
+    def all_latencies(self):
+        return [ms for values in self.latencies.values() for ms in values]
+
+
+def run_wsgi(scenario, users, iterations):
+    """`users` threads, each one a VirtualUser running `scenario` `iterations` times."""
+    driver = WsgiDriver()
+    result = RunResult()
+
+    def worker(number):
+        vu = VirtualUser(number)
+        try:
+            for _ in range(iterations):
+                flow = scenario(vu)
+                response = None
+                while True:
+                    try:
+                        step = flow.send(response)
+                    except StopIteration:
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        response = driver.send(vu, step)
+                    except Exception as exc:
+                        result.record_error(step, exc)
+                        break
+                    result.record(step, response, (time.perf_counter() - t0) * 1000)
+                    vu.remember_cookies(response)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_asgi(scenario, users, iterations):
+    """Same as run_wsgi, but `users` concurrent tasks on one event loop."""
+    driver = AsgiDriver()
+    result = RunResult()
+
+    async def worker(number):
+        vu = VirtualUser(number)
+        for _ in range(iterations):
+            flow = scenario(vu)
+            response = None
+            while True:
+                try:
+                    step = flow.send(response)
+                except StopIteration:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    response = await driver.send(vu, step)
+                except Exception as exc:
+                    result.record_error(step, exc)
+                    break
+                result.record(step, response, (time.perf_counter() - t0) * 1000)
+                vu.remember_cookies(response)
+
+    async def main():
+        await asyncio.gather(*(worker(n) for n in range(users)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+# ----------------------------
+# SCENARIOS
+# ----------------------------
+
+PAYMENT_PATH = re.compile(r"/payment/(\d+)/")
+NEXT_PAGE_LINK = re.compile(r'href="(\?[^"]*after=[^"]*)"')
+
+BENCH_PASSWORD = "bench-pass-12345"
+
+
+def login_steps(vu, username, password=BENCH_PASSWORD):
+    """Logs the virtual user in once (GET for the CSRF cookie, then POST)."""
+    if vu.state.get("logged_in"):
+        return
+    yield Step("login (form)", "GET", reverse("login"))
+    response = yield Step("login (submit)", "POST", reverse("login"), {"username": username, "password": password})
+    vu.state["logged_in"] = response.status == 302
+
+
+def shopper_scenario(product_ids):
+    """Browse -> add to cart -> checkout -> pay, like one guest shopper."""
+
+    def scenario(vu):
+        product_id = random.choice(product_ids)
+        yield Step("home", "GET", reverse("home"))
+        yield Step("shop", "GET", reverse("shop"))
+        yield Step("product_detail", "GET", reverse("product_detail", args=[product_id]))
+        yield Step("cart_add", "POST", reverse("cart_add", args=[product_id]))
+        yield Step("cart", "GET", reverse("cart"))
+        yield Step("checkout (form)", "GET", reverse("checkout"))
+
+        response = yield Step("checkout (submit)", "POST", reverse("checkout"), BENCH_DELIVERY)
+        match = PAYMENT_PATH.search(response.location)
+        if not match:
+            return
+        order_id = match.group(1)
+
+        yield Step("payment (form)", "GET", reverse("payment", args=[order_id]))
+        yield Step("payment (submit)", "POST", reverse("payment", args=[order_id]))
+        yield Step("thank_you", "GET", reverse("thank_you", args=[order_id]))
+
+    return scenario
+
+
+def designer_scenario(product_ids, design_data, username_for):
+    """Logged-in customer: customise a product, save the design, look at my designs."""
+
+    def scenario(vu):
+        yield from login_steps(vu, username_for(vu))
+        product_id = random.choice(product_ids)
+        yield Step("customise", "GET", reverse("customise", args=[product_id]))
+        yield Step("save_design", "POST", reverse("save_design", args=[product_id]), {
+            "design_data": design_data, "size": random.choice(["S", "M", "L", "XL"]),
+        })
+        yield Step("my_designs", "GET", reverse("my_designs"))
+
+    return scenario
+
+
+def staff_scenario(username):
+    """Staff member going through the admin panel lists (+ one older page of orders)."""
+
+    def scenario(vu):
+        yield from login_steps(vu, username)
+        yield Step("admin dashboard", "GET", reverse("admin_dashboard"))
+        response = yield Step("admin orders", "GET", reverse("admin_orders_list"))
+        match = NEXT_PAGE_LINK.search(response.body.decode(errors="ignore"))
+        if match:
+            yield Step("admin orders (page 2)", "GET", reverse("admin_orders_list") + html.unescape(match.group(1)))
+        yield Step("admin orders (paid)", "GET", reverse("admin_orders_list") + "?status=PAID")
+        yield Step("admin designs", "GET", reverse("admin_designs_list"))
+        yield Step("admin users", "GET", reverse("admin_users_list"))
+        yield Step("admin products", "GET", reverse("admin_products_list"))
+
+    return scenario
+
+
+def mixed_scenario(roles):
+    """
+    roles = [(name, scenario, weight), ...]. Each virtual user keeps one role for the
+    whole run, like real traffic. Roles are dealt out interleaved by weight
+    (6/3/1 -> shopper, designer, staff, shopper, ...), so even a few users cover every role.
+    """
+    slots = sorted(
+        (k / weight, i, scenario)
+        for i, (_, scenario, weight) in enumerate(roles)
+        for k in range(weight)
+    )
+    deck = [scenario for _, _, scenario in slots]
+
+    def scenario(vu):
+        return deck[vu.number % len(deck)](vu)
+
+    return scenario
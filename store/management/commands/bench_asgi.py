@@ -0,0 +1,81 @@
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.loadtest import BENCH_DELIVERY, BENCH_PREFIX, run_asgi, run_wsgi, shopper_scenario
+from store.models import Order, Product
+from store.services.latency import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the same shopper flow through the WSGI and the ASGI handler (in-process, "
+        "N concurrent shoppers) and compares requests/sec and p50/p95/p99 latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["wsgi", "asgi", "both"], default="both")
+        parser.add_argument("--users", type=int, default=16, help="Concurrent shoppers (default 16).")
+        parser.add_argument("--iterations", type=int, default=5, help="Flows per shopper (default 5).")
+        parser.add_argument("--products", type=int, default=24, help="Bench products to create (default 24).")
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+        parser.add_argument("--keep", action="store_true", help="Don't delete the bench products/orders afterwards.")
+
+    def handle(self, *args, **options):
+        products = [
+            Product.objects.create(name=f"{BENCH_PREFIX}Tee {i}", price=Decimal("12.00") + i)
+            for i in range(options["products"])
+        ]
+        scenario = shopper_scenario([p.id for p in products])
+        modes = ["wsgi", "asgi"] if options["mode"] == "both" else [options["mode"]]
+        runners = {"wsgi": run_wsgi, "asgi": run_asgi}
+
+        report = {
+            "profile": getattr(settings, "DB_PROFILE", "default"),
+            "users": options["users"],
+            "iterations": options["iterations"],
+            "modes": {},
+        }
+        try:
+            for mode in modes:
+                result = runners[mode](scenario, options["users"], options["iterations"])
+                report["modes"][mode] = {
+                    **summarize(result.all_latencies, result.elapsed),
+                    "elapsed_s": round(result.elapsed, 3),
+                    "failures": dict(result.failures),
+                    "steps": {
+                        label: summarize(values, result.elapsed)
+                        for label, values in result.latencies.items()
+                    },
+                }
+                self.print_mode(mode, report["modes"][mode])
+        finally:
+            if not options["keep"]:
+                Order.objects.filter(email=BENCH_DELIVERY["email"], full_name=BENCH_DELIVERY["full_name"]).delete()
+                Product.objects.filter(id__in=[p.id for p in products]).delete()
+
+        if len(report["modes"]) == 2:
+            wsgi, asgi = report["modes"]["wsgi"], report["modes"]["asgi"]
+            self.stdout.write(
+                f"\nASGI vs WSGI: {asgi['throughput_per_s']} vs {wsgi['throughput_per_s']} req/s, "
+                f"p99 {asgi['p99_ms']} vs {wsgi['p99_ms']} ms"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+
+    def print_mode(self, mode, data):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{mode.upper()}: {data['count']} requests in {data['elapsed_s']}s = "
+            f"{data['throughput_per_s']} req/s (p50 {data['p50_ms']} / p95 {data['p95_ms']} / p99 {data['p99_ms']} ms)"
+        ))
+        self.stdout.write(f"  {'step':<20}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for label, step in data["steps"].items():
+            self.stdout.write(
+                f"  {label:<20}{step['count']:>6}{step['p50_ms']:>10}{step['p95_ms']:>10}{step['p99_ms']:>10}"
+            )
+        for failure, count in data["failures"].items():
+            self.stdout.write(self.style.WARNING(f"  {count} x {failure}"))
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from store.loadtest import BENCH_DELIVERY as DELIVERY, BENCH_PREFIX
+from store.models import Order, Product
+from store.services.latency import summarize
+from store.services.order_service import create_order_from_cart, price_cart
+from store.services.payment_service import mark_order_paid
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests checkout (price cart -> create order -> mark paid) from several threads "
+        "against the configured database. Run it once per DB_PROFILE to compare them, e.g. "
+        "DB_PROFILE=sqlite-plain python manage.py bench_checkout"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent checkouts (default 8).")
+        parser.add_argument("--orders", type=int, default=400, help="Total orders to place (default 400).")
+        parser.add_argument("--lines", type=int, default=3, help="Cart lines per order (default 3).")
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+        parser.add_argument("--keep", action="store_true", help="Don't delete the bench products/orders afterwards.")
+
+    def handle(self, *args, **options):
+        products = [
+            Product.objects.create(name=f"{BENCH_PREFIX}Tee {i}", price=Decimal("10.00") + i)
+            for i in range(max(options["lines"], 1))
+        ]
+        cart = {str(p.id): {"qty": 1} for p in products}
+
+        remaining = [options["orders"]]
+        lock = threading.Lock()
+        latencies = []
+        errors = []
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+
+                    started = time.perf_counter()
+                    try:
+                        order = create_order_from_cart(cart, None, DELIVERY, priced_cart=price_cart(cart))
+                        mark_order_paid(order)
+                    except OperationalError as exc:
+                        # "database is locked" etc. - that's what we're measuring
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+
+                    with lock:
+                        latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "profile": getattr(settings, "DB_PROFILE", "default"),
+            "vendor": connection.vendor,
+            "threads": options["threads"],
+            "lines_per_order": len(products),
+            "errors": len(errors),
+            "elapsed_s": round(elapsed, 3),
+            **summarize(latencies, elapsed),
+        }
+
+        if not options["keep"]:
+            Order.objects.filter(email=DELIVERY["email"], full_name=DELIVERY["full_name"]).delete()
+            Product.objects.filter(id__in=[p.id for p in products]).delete()
+
+        for key, value in result.items():
+            self.stdout.write(f"{key:>18}: {value}")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"First error: {errors[0]}"))
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(result, fh, indent=2)
@@ -0,0 +1,179 @@
+import json
+import os
+import subprocess
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from store.bench_fixtures import BENCH_STAFF, SAMPLE_DESIGN, bench_username, clear_bench_data, seed
+from store.loadtest import (
+    BENCH_PREFIX,
+    designer_scenario,
+    mixed_scenario,
+    run_asgi,
+    run_wsgi,
+    shopper_scenario,
+    staff_scenario,
+)
+from store.models import Product
+from store.services.latency import summarize
+
+RESULTS_DIR = "bench-results"
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def parse_mix(value):
+    """'shopper=6,designer=3,staff=1' -> {"shopper": 6, ...}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        try:
+            mix[name.strip()] = int(weight)
+        except ValueError:
+            raise CommandError(f"Bad --mix entry: {part!r} (expected name=weight)")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds thousands of bench products/users/designs/orders, then drives the real flows "
+        "(shop -> cart -> checkout -> payment, customise -> save design -> my designs, admin lists) "
+        "with concurrent in-process clients. Reports p50/p95/p99, queries per request and throughput, "
+        "and saves the run as JSON (tagged with the git commit) so runs can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["wsgi", "asgi"], default="wsgi", help="Handler to drive (default wsgi).")
+        parser.add_argument("--users", type=int, default=12, help="Concurrent virtual users (default 12).")
+        parser.add_argument("--iterations", type=int, default=5, help="Flows per virtual user (default 5).")
+        parser.add_argument(
+            "--mix", default="shopper=6,designer=3,staff=1",
+            help="Role weights for the virtual users (default shopper=6,designer=3,staff=1).",
+        )
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--customers", type=int, default=300)
+        parser.add_argument("--designs", type=int, default=3000)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--no-seed", action="store_true", help="Reuse the bench data from the last run.")
+        parser.add_argument("--keep", action="store_true", help="Leave the bench data in place afterwards.")
+        parser.add_argument("--output", help=f"JSON file to write (default {RESULTS_DIR}/<timestamp>-<commit>.json).")
+        parser.add_argument("--compare", help="Earlier results JSON to print the differences against.")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options["mix"])
+        unknown = set(mix) - {"shopper", "designer", "staff"}
+        if unknown:
+            raise CommandError(f"Unknown roles in --mix: {', '.join(sorted(unknown))}")
+        if options["users"] > options["customers"] and mix.get("designer"):
+            raise CommandError("--customers must be at least --users (each designer logs in as its own user)")
+
+        if options["no_seed"]:
+            seeded = None
+        else:
+            self.stdout.write("Seeding bench data...")
+            seeded = seed(
+                products=options["products"], users=options["customers"],
+                designs=options["designs"], orders=options["orders"],
+            )
+
+        product_ids = list(Product.objects.filter(name__startswith=BENCH_PREFIX).values_list("id", flat=True))
+        if not product_ids:
+            raise CommandError("No bench products; run without --no-seed first.")
+
+        scenarios = {
+            "shopper": shopper_scenario(product_ids),
+            "designer": designer_scenario(product_ids, SAMPLE_DESIGN, lambda vu: bench_username(vu.number)),
+            "staff": staff_scenario(BENCH_STAFF),
+        }
+        scenario = mixed_scenario([(name, scenarios[name], weight) for name, weight in mix.items() if weight > 0])
+        runner = run_asgi if options["mode"] == "asgi" else run_wsgi
+
+        try:
+            # X-Query-Count on every response; budgets only log (we want numbers, not exceptions)
+            with override_settings(QUERY_COUNT_HEADER=True, QUERY_BUDGET_MODE="log"):
+                result = runner(scenario, options["users"], options["iterations"])
+        finally:
+            if not options["keep"]:
+                clear_bench_data()
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "mode": options["mode"],
+            "db_profile": getattr(settings, "DB_PROFILE", "default"),
+            "users": options["users"],
+            "iterations": options["iterations"],
+            "mix": mix,
+            "seeded": seeded,
+            "overall": {
+                **summarize(result.all_latencies, result.elapsed),
+                "elapsed_s": round(result.elapsed, 3),
+                "failures": dict(result.failures),
+            },
+            "steps": {},
+        }
+        for label, values in result.latencies.items():
+            queries = result.queries.get(label, [])
+            report["steps"][label] = {
+                **summarize(values, result.elapsed),
+                "queries_avg": round(sum(queries) / len(queries), 1) if queries else None,
+                "queries_max": max(queries) if queries else None,
+            }
+
+        previous = self.load_previous(options["compare"])
+        self.print_report(report, previous)
+
+        output = options["output"] or os.path.join(
+            RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'nocommit'}.json"
+        )
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nSaved {output}"))
+
+    def load_previous(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+
+    def print_report(self, report, previous):
+        overall = report["overall"]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{report['mode'].upper()} @ {report['commit']}: {overall['count']} requests in "
+            f"{overall['elapsed_s']}s = {overall['throughput_per_s']} req/s "
+            f"(p50 {overall['p50_ms']} / p95 {overall['p95_ms']} / p99 {overall['p99_ms']} ms)"
+        ))
+        if previous:
+            before = previous["overall"]
+            self.stdout.write(
+                f"  vs {previous.get('commit')}: {before['throughput_per_s']} req/s, "
+                f"p95 {before['p95_ms']} ms, p99 {before['p99_ms']} ms"
+            )
+
+        self.stdout.write(f"\n  {'step':<24}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'p95 was':>10}")
+        for label, step in report["steps"].items():
+            was = ""
+            if previous and label in previous.get("steps", {}):
+                was = previous["steps"][label]["p95_ms"]
+            self.stdout.write(
+                f"  {label:<24}{step['count']:>6}{step['p50_ms']:>9}{step['p95_ms']:>9}{step['p99_ms']:>9}"
+                f"{step['queries_avg'] if step['queries_avg'] is not None else '-':>9}{was:>10}"
+            )
+        for failure, count in overall["failures"].items():
+            self.stdout.write(self.style.WARNING(f"  {count} x {failure}"))
@@ -0,0 +1,45 @@
+import os
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from store import static_pipeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds STATIC_ROOT for production: collectstatic with minified .js/.css, content-hashed "
+        "names and .gz/.br copies (store/static_pipeline.py), then prints what each file weighs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Empty STATIC_ROOT first (drops old hashed files).")
+
+    def handle(self, *args, **options):
+        if static_pipeline.brotli is None:
+            self.stdout.write(self.style.WARNING(
+                "Brotli isn't installed, only .gz copies are written (pip install -r requirements-static.txt)."
+            ))
+
+        call_command("collectstatic", interactive=False, clear=options["clear"], verbosity=0)
+
+        self.stdout.write(f"{'file':<45} {'source':>8} {'built':>8} {'gzip':>8} {'brotli':>8}")
+        for name, hashed in sorted(staticfiles_storage.hashed_files.items()):
+            if not name.endswith(static_pipeline.COMPRESSIBLE):
+                continue
+            source = finders.find(name)
+            sizes = [
+                os.path.getsize(source) if source else None,
+                self.size(hashed), self.size(hashed + ".gz"), self.size(hashed + ".br"),
+            ]
+            cells = " ".join(f"{s if s is not None else '-':>8}" for s in sizes)
+            self.stdout.write(f"{hashed:<45} {cells}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {len(staticfiles_storage.hashed_files)} file(s) into {staticfiles_storage.location}."
+        ))
+
+    def size(self, name):
+        return staticfiles_storage.size(name) if staticfiles_storage.exists(name) else None
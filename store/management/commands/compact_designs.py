@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Design
+from store.services.design_schema import DesignDataError, dump_design, load_design, prepare_design
+
+
+class Command(BaseCommand):
+    help = (
+        "Upgrades saved designs to the current design schema: validates them, moves inline "
+        "pictures out into media files and rewrites the document compactly. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        upgraded = current = invalid = 0
+        saved_bytes = 0
+
+        for design in Design.objects.only("id", "design_data", "assets").iterator(chunk_size=200):
+            old = design.design_data
+            try:
+                document = load_design(old)
+                has_inline = any("src" in el for el in document["elements"])
+                if not has_inline and dump_design(document) == old:
+                    current += 1
+                    continue
+                if options["dry_run"]:
+                    # prepare_design would already write the pictures out
+                    upgraded += 1
+                    continue
+                design_data, assets = prepare_design(old)
+            except DesignDataError as exc:
+                invalid += 1
+                self.stdout.write(self.style.WARNING(f"Design #{design.id}: {exc} (left as is)"))
+                continue
+
+            upgraded += 1
+            saved_bytes += len(old.encode()) - len(design_data.encode())
+            design.design_data = design_data
+            design.assets = assets
+            design.save(update_fields=["design_data", "assets"])
+
+        if options["dry_run"]:
+            summary = f"Would upgrade {upgraded} design(s)"
+        else:
+            summary = f"Upgraded {upgraded} design(s) ({saved_bytes / 1024:.0f} KB less JSON)"
+        self.stdout.write(self.style.SUCCESS(f"{summary}, {current} already current, {invalid} invalid."))
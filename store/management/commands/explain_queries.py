@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.services.query_audit import audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN (QUERY PLAN) on the queries behind each storefront/admin view "
+        "and reports full table scans or unindexed sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plans", action="store_true", help="Print the full plan for every query.")
+        parser.add_argument(
+            "--fail-on-scan", action="store_true",
+            help="Exit with an error if any query (not marked as allowed) scans a whole table. For CI.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        results = audit()
+        failing = []
+
+        for result in results:
+            problems = result["problems"]
+            if not problems:
+                status = self.style.SUCCESS("ok")
+            elif result["allowed"]:
+                status = self.style.WARNING(f"allowed ({', '.join(problems)})")
+            else:
+                status = self.style.ERROR(", ".join(problems))
+                failing.append(result["label"])
+
+            self.stdout.write(f"{result['label']:<40} {status}")
+            if options["plans"] or (problems and not result["allowed"]):
+                for line in result["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if failing and options["fail_on_scan"]:
+            raise CommandError(f"{len(failing)} query(ies) scan whole tables: {', '.join(failing)}")
+
+        self.stdout.write(f"{len(results)} queries checked, {len(failing)} with problems.")
@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.models import Design
+from store.services.print_export import (
+    copy_export, export_design, export_name, export_setting, init_pool_worker, print_box,
+)
+from store.services.queries import paid_design_items
+
+
+def designs_to_print():
+    """
+    (design id, design copy, product) for every design line on a PAID order.
+    The copy taken at checkout is what gets printed, even if the design was edited since.
+    """
+    items = paid_design_items()
+    return [(item.design_id, item.design_data, item.product) for item in items if item.product]
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders print-resolution files (PRINT_EXPORT DPI, print area only) for every design "
+        "on a PAID order (the copy taken at checkout), in parallel across CPU cores. "
+        "Designs already exported in that version are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Processes to render with (default: PRINT_EXPORT['WORKERS'] or one per CPU core). 1 = no pool.",
+        )
+        parser.add_argument("--design", type=int, action="append", help="Only this design id (repeatable).")
+        parser.add_argument("--force", action="store_true", help="Re-render even if this version was exported.")
+        parser.add_argument("--output-dir", help="Also copy the files into this folder for the printer.")
+
+    def handle(self, *args, **options):
+        if options["design"]:
+            designs = Design.objects.select_related("product").filter(id__in=options["design"])
+            designs = [(d.id, d.design_data, d.product) for d in designs]
+        else:
+            designs = designs_to_print()
+
+        # plain values only: pool workers never touch the database.
+        # One task per design version (the same design on several orders is rendered once)
+        tasks = list(dict.fromkeys((design_id, data, print_box(product)) for design_id, data, product in designs))
+        done = {}  # task -> storage name
+        for task in tasks:
+            name = export_name(*task)
+            if not options["force"] and default_storage.exists(name):
+                done[task] = name
+        todo = [task for task in tasks if task not in done]
+        self.stdout.write(f"{len(tasks)} design version(s) to print, {len(done)} already exported.")
+
+        failed = 0
+        workers = options["workers"] or export_setting("WORKERS")
+        if workers == 1:
+            for task in todo:
+                try:
+                    design_id, name, _ = export_design(*task, force=options["force"])
+                except Exception as exc:
+                    failed += self.report_failure(task[0], exc)
+                    continue
+                done[task] = name
+                self.stdout.write(f"Design #{design_id} -> {name}")
+        else:
+            # forked children would otherwise inherit (and share) the open DB connection
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_pool_worker) as pool:
+                futures = {pool.submit(export_design, *task, force=options["force"]): task for task in todo}
+                for future in as_completed(futures):
+                    task = futures[future]
+                    try:
+                        design_id, name, _ = future.result()
+                    except Exception as exc:
+                        failed += self.report_failure(task[0], exc)
+                        continue
+                    done[task] = name
+                    self.stdout.write(f"Design #{design_id} -> {name}")
+
+        if options["output_dir"]:
+            for name in done.values():
+                copy_export(name, options["output_dir"])
+
+        message = f"Exported {len(todo) - failed} design(s)."
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{message} {failed} failed."))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def report_failure(self, design_id, exc):
+        self.stderr.write(f"Design #{design_id} failed: {exc}")
+        return 1
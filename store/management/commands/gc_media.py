@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from store.services.media_refs import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts references to content-addressed media blobs and deletes the ones "
+        "nothing points at any more (e.g. after products/designs were deleted)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Keep unreferenced blobs younger than this (uploads still in flight). Default 24.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only list what would be deleted.")
+
+    def handle(self, *args, **options):
+        removed = collect_garbage(
+            grace_seconds=options["grace_hours"] * 60 * 60,
+            dry_run=options["dry_run"],
+        )
+
+        for name in removed:
+            self.stdout.write(name)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(removed)} orphaned blob(s)."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Design, Product
+from store.services.image_variants import generate_variants
+from store.services.job_queue import enqueue
+
+
+class Command(BaseCommand):
+    help = "Generates thumbnail/responsive variants for existing product images and design previews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue", action="store_true",
+            help="Queue one background job per image instead of processing them here.",
+        )
+
+    def handle(self, *args, **options):
+        targets = [
+            ("product", "image", Product.objects.exclude(image="").exclude(image=None)),
+            ("design", "preview", Design.objects.exclude(preview="").exclude(preview=None).only("id", "preview")),
+        ]
+
+        count = 0
+        for model, field, queryset in targets:
+            for obj in queryset.iterator():
+                if options["queue"]:
+                    enqueue("generate_image_variants", model=model, object_id=obj.id, field=field)
+                else:
+                    try:
+                        generate_variants(getattr(obj, field))
+                    except OSError as exc:
+                        self.stderr.write(f"Skipped {model} #{obj.id}: {exc}")
+                        continue
+                count += 1
+
+        verb = "Queued" if options["queue"] else "Generated variants for"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} image(s)."))
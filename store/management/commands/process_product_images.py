@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from store.models import Product
+from store.services.job_queue import enqueue
+from store.services.product_images import process_product_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the product image job (shrink oversized uploads, canvas-sized template) for products "
+        "whose template hasn't been pre-scaled yet, e.g. ones saved before template_canvas existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue", action="store_true",
+            help="Queue one background job per product instead of processing them here.",
+        )
+
+    def handle(self, *args, **options):
+        products = (
+            Product.objects.exclude(template_image="").exclude(template_image=None)
+            .filter(Q(template_canvas="") | Q(template_canvas=None))
+        )
+
+        count = 0
+        for product in products.iterator():
+            if options["queue"]:
+                enqueue("process_product_images", product_id=product.id)
+            else:
+                try:
+                    process_product_images(product)
+                except OSError as exc:
+                    self.stderr.write(f"Skipped product #{product.id}: {exc}")
+                    continue
+            count += 1
+
+        verb = "Queued" if options["queue"] else "Processed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} product(s)."))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.services.stats import reconcile_days, reconcile_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the dashboard counters (StoreStats) and the daily rollups (DailyStats) "
+        "from the raw tables. Run it periodically (e.g. nightly cron) to correct any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="How many recent days of DailyStats to rebuild (default 30).",
+        )
+
+    def handle(self, *args, **options):
+        stats = reconcile_totals()
+        self.stdout.write(
+            f"Totals: {stats.product_count} products, {stats.order_count} orders, "
+            f"{stats.design_count} designs, {stats.user_count} users, revenue £{stats.revenue}"
+        )
+
+        end = timezone.localdate()
+        start = end - timedelta(days=max(options["days"], 1) - 1)
+        reconcile_days(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily stats for {start} to {end}."))
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from store.services.job_queue import poll, queue_setting, requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs background jobs (design previews, product image processing) from the local "
+        "database queue. Start one or more of these next to the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Worker threads in this process (default: JOB_QUEUE['WORKERS']).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=None,
+            help="Seconds to sleep when the queue is empty (default: JOB_QUEUE['POLL_INTERVAL']).",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Process everything that is due, then exit (useful for cron/tests).",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or queue_setting("WORKERS")
+        poll_interval = options["poll_interval"] or queue_setting("POLL_INTERVAL")
+
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Re-queued {requeued} stale job(s).")
+
+        if options["once"]:
+            done = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Processed {done} job(s)."))
+            return
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work_loop, args=(stop, poll_interval), name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+
+        self.stdout.write(f"Started {workers} worker(s). Press Ctrl+C to stop.")
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers (finishing current jobs)...")
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def work_loop(self, stop, poll_interval):
+        count = 1  # handle() has just re-queued stale jobs
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if not poll(count):
+                    stop.wait(poll_interval)
+                count += 1
+        finally:
+            connection.close()
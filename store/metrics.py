@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SHARED_DIR": None,          # folder for per-process snapshots (several workers), None = this process only
+    "FLUSH_INTERVAL": 10,        # seconds between snapshot writes to SHARED_DIR
+    "SLOW_REQUEST_MS": 500,      # requests slower than this can get a query trace
+    "TRACE_SAMPLE_RATE": 0.1,    # fraction of requests that collect SQL for a possible trace
+    "TRACE_KEEP": 50,            # most recent slow traces kept
+    "TRACE_MAX_QUERIES": 100,    # SQL statements kept per trace
+    "TOKEN": None,               # lets Prometheus scrape with "Authorization: Bearer <token>"
+}
+
+
+def metrics_setting(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+# ----------------------------
+# HISTOGRAMS
+# ----------------------------
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+HISTOGRAMS = {
+    "proxy_request_duration_seconds": ("Wall time per request.", SECONDS_BUCKETS),
+    "proxy_request_db_queries": ("SQL queries per request.", QUERY_BUCKETS),
+    "proxy_request_db_seconds": ("Time spent running SQL per request.", SECONDS_BUCKETS),
+    "proxy_request_template_seconds": ("Template render time per request (includes lazy queries).", SECONDS_BUCKETS),
+    "proxy_response_size_bytes": ("Response body size.", BYTES_BUCKETS),
+}
+
+
+class Registry:
+    """
+    Per-process histograms, keyed by metric name then URL name.
+    Everything is plain dicts/lists so a snapshot can be written to JSON as-is
+    (SHARED_DIR mode) and snapshots from several workers can simply be added up.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.requests = {}  # view -> {status: count}
+            self.traces = deque(maxlen=metrics_setting("TRACE_KEEP"))
+            self.last_flush = time.monotonic()
+
+    def observe(self, name, view, value):
+        buckets = HISTOGRAMS[name][1]
+        hist = self.histograms[name].get(view)
+        if hist is None:
+            hist = self.histograms[name][view] = {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+        hist["buckets"][bisect_left(buckets, value)] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+    def record(self, view, status, values, trace=None):
+        with self.lock:
+            for name, value in values.items():
+                self.observe(name, view, value)
+            by_status = self.requests.setdefault(view, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+            if trace:
+                self.traces.append(trace)
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({
+                "histograms": self.histograms,
+                "requests": self.requests,
+                "traces": list(self.traces),
+            }))
+
+    def maybe_flush(self):
+        folder = metrics_setting("SHARED_DIR")
+        if not folder or time.monotonic() - self.last_flush < metrics_setting("FLUSH_INTERVAL"):
+            return
+        self.last_flush = time.monotonic()
+        flush(folder, self.snapshot())
+
+
+registry = Registry()
+
+
+def snapshot_path(folder, pid):
+    return os.path.join(folder, f"metrics-{pid}.json")
+
+
+def flush(folder, snapshot):
+    os.makedirs(folder, exist_ok=True)
+    path = snapshot_path(folder, os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(snapshot, fh)
+    os.replace(tmp, path)  # atomic, so a scrape never reads half a file
+
+
+def merge(snapshots):
+    merged = {"histograms": {name: {} for name in HISTOGRAMS}, "requests": {}, "traces": []}
+    for snap in snapshots:
+        for name, views in snap.get("histograms", {}).items():
+            for view, hist in views.items():
+                into = merged["histograms"].setdefault(name, {}).get(view)
+                if into is None:
+                    merged["histograms"][name][view] = {"buckets": list(hist["buckets"]), "sum": hist["sum"], "count": hist["count"]}
+                    continue
+                into["buckets"] = [a + b for a, b in zip(into["buckets"], hist["buckets"])]
+                into["sum"] += hist["sum"]
+                into["count"] += hist["count"]
+        for view, by_status in snap.get("requests", {}).items():
+            into = merged["requests"].setdefault(view, {})
+            for status, count in by_status.items():
+                into[status] = into.get(status, 0) + count
+        merged["traces"].extend(snap.get("traces", []))
+
+    merged["traces"].sort(key=lambda t: t["at"])
+    merged["traces"] = merged["traces"][-metrics_setting("TRACE_KEEP"):]
+    return merged
+
+
+def collect():
+    """
+    This process's numbers, plus (SHARED_DIR mode) the last snapshot of every other worker.
+    Clear SHARED_DIR on deploy, otherwise old workers keep being added in.
+    """
+    live = registry.snapshot()
+    folder = metrics_setting("SHARED_DIR")
+    if not folder or not os.path.isdir(folder):
+        return merge([live])
+
+    snapshots = [live]
+    own = os.path.basename(snapshot_path(folder, os.getpid()))
+    for name in os.listdir(folder):
+        if not name.startswith("metrics-") or not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(folder, name)) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return merge(snapshots)
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for view, hist in sorted(snapshot["histograms"].get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], hist["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{label(view)}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{label(view)}"}} {hist["sum"]:.6f}')
+            lines.append(f'{name}_count{{view="{label(view)}"}} {hist["count"]}')
+
+    lines.append("# HELP proxy_requests_total Requests handled, by URL name and status code.")
+    lines.append("# TYPE proxy_requests_total counter")
+    for view, by_status in sorted(snapshot["requests"].items()):
+        for status, count in sorted(by_status.items()):
+            lines.append(f'proxy_requests_total{{view="{label(view)}",status="{status}"}} {count}')
+
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------
+# PER-REQUEST MEASUREMENT
+# ----------------------------
+
+class RequestSample:
+    """What one request spent its time on. Lives in a ContextVar, so it follows the
+    request into sync_to_async threads (async views) as well."""
+
+    def __init__(self, trace):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.trace = [] if trace else None
+
+
+current_sample = ContextVar("proxy_request_sample", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        sample.queries += 1
+        sample.db_time += elapsed
+        if sample.trace is not None and len(sample.trace) < metrics_setting("TRACE_MAX_QUERIES"):
+            sample.trace.append({"sql": sql, "ms": round(elapsed * 1000, 2)})
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # insert at the front: execute_wrapper() (QueryBudgetMiddleware) pops the *last* wrapper
+    # when it exits, and a connection opened inside that block would otherwise lose ours
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+_original_render = Template.render
+
+
+def timed_render(self, context):
+    sample = current_sample.get()
+    # only the outermost template is timed ({% extends %}/{% include %} render inside it)
+    if sample is None or sample.template_depth:
+        return _original_render(self, context)
+
+    sample.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        sample.template_time += time.perf_counter() - started
+        sample.template_depth -= 1
+
+
+def connect_metrics():
+    """Called from StoreConfig.ready(): hooks the DB + template timers in."""
+    if not metrics_setting("ENABLED"):
+        return
+    connection_created.connect(install_query_recorder, dispatch_uid="store.metrics.query_recorder")
+    Template.render = timed_render
+
+
+class PerformanceMiddleware:
+    """
+    Records wall time, SQL count/time, template time and response size per URL name
+    into the in-process registry (see /admin-panel/metrics/). A sampled share of
+    requests also collects their SQL, and is kept as a trace if it turns out slow.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_setting("ENABLED"):
+            return self.get_response(request)
+
+        sample, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.finish(request, response, sample, started)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_setting("ENABLED"):
+            return await self.get_response(request)
+
+        sample, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.finish(request, response, sample, started)
+        return response
+
+    def start(self):
+        sample = RequestSample(trace=random.random() < metrics_setting("TRACE_SAMPLE_RATE"))
+        return sample, current_sample.set(sample), time.perf_counter()
+
+    def finish(self, request, response, sample, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+
+        values = {
+            "proxy_request_duration_seconds": elapsed,
+            "proxy_request_db_queries": sample.queries,
+            "proxy_request_db_seconds": sample.db_time,
+            "proxy_request_template_seconds": sample.template_time,
+        }
+        if not response.streaming:
+            values["proxy_response_size_bytes"] = len(response.content)
+
+        trace = None
+        if sample.trace is not None and elapsed * 1000 >= metrics_setting("SLOW_REQUEST_MS"):
+            trace = {
+                "at": time.time(),
+                "view": view,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 1),
+                "db_ms": round(sample.db_time * 1000, 1),
+                "template_ms": round(sample.template_time * 1000, 1),
+                "queries": sample.trace,
+            }
+            logger.warning("Slow request %s %s: %.0f ms, %d queries", request.method, request.path,
+                           elapsed * 1000, sample.queries)
+
+        registry.record(view, response.status_code, values, trace)
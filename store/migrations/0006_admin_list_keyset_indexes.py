@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_mediablob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='design',
+            index=models.Index(fields=['created_at', 'id'], name='design_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+        ),
+        # auth_user belongs to django.contrib.auth, so its index for the
+        # admin users list (keyset on date_joined, id) is added with plain SQL
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS "store_user_date_joined_idx" ON "auth_user" ("date_joined", "id");',
+            reverse_sql='DROP INDEX IF EXISTS "store_user_date_joined_idx";',
+        ),
+    ]
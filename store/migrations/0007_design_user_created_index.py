@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_admin_list_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='design',
+            index=models.Index(fields=['user', 'created_at'], name='design_user_created_idx'),
+        ),
+    ]
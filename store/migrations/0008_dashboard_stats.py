@@ -0,0 +1,82 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+PAID_STATUSES = ("PAID", "SHIPPED")
+
+
+def build_initial_stats(apps, schema_editor):
+    """Fills StoreStats + DailyStats from the existing rows (signals keep them up to date after this)."""
+    Product = apps.get_model("store", "Product")
+    Design = apps.get_model("store", "Design")
+    Order = apps.get_model("store", "Order")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    StoreStats = apps.get_model("store", "StoreStats")
+    DailyStats = apps.get_model("store", "DailyStats")
+
+    by_status = dict(Order.objects.values_list("status").annotate(n=Count("id")))
+    revenue = Order.objects.filter(status__in=PAID_STATUSES).aggregate(total=Sum("total_amount"))["total"]
+    StoreStats.objects.create(
+        id=1,
+        product_count=Product.objects.count(),
+        order_count=sum(by_status.values()),
+        design_count=Design.objects.count(),
+        user_count=User.objects.count(),
+        pending_count=by_status.get("PENDING", 0),
+        paid_count=by_status.get("PAID", 0),
+        shipped_count=by_status.get("SHIPPED", 0),
+        revenue=revenue or 0,
+    )
+
+    days = {}
+    for row in (Order.objects.annotate(day=TruncDate("created_at")).values("day")
+                .annotate(n=Count("id"), revenue=Sum("total_amount", filter=Q(status__in=PAID_STATUSES)))):
+        days.setdefault(row["day"], {}).update(orders=row["n"], revenue=row["revenue"] or 0)
+    for row in Design.objects.annotate(day=TruncDate("created_at")).values("day").annotate(n=Count("id")):
+        days.setdefault(row["day"], {})["designs"] = row["n"]
+    for row in User.objects.annotate(day=TruncDate("date_joined")).values("day").annotate(n=Count("id")):
+        days.setdefault(row["day"], {})["new_users"] = row["n"]
+
+    DailyStats.objects.bulk_create([DailyStats(date=day, **values) for day, values in days.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0007_design_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('designs', models.IntegerField(default=0)),
+                ('new_users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StoreStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_count', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+                ('design_count', models.IntegerField(default=0)),
+                ('user_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('shipped_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_initial_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+import store.fields
+
+
+def copy_design_data(apps, schema_editor):
+    """Copies the text into the new compressed column (assets are moved out by `manage.py compact_designs`)."""
+    Design = apps.get_model("store", "Design")
+    batch = []
+    for design in Design.objects.only("id", "design_data").iterator(chunk_size=500):
+        design.design_data_compressed = design.design_data
+        batch.append(design)
+        if len(batch) == 500:
+            Design.objects.bulk_update(batch, ["design_data_compressed"])
+            batch = []
+    Design.objects.bulk_update(batch, ["design_data_compressed"])
+
+
+def copy_back(apps, schema_editor):
+    Design = apps.get_model("store", "Design")
+    batch = []
+    for design in Design.objects.only("id", "design_data_compressed").iterator(chunk_size=500):
+        design.design_data = design.design_data_compressed
+        batch.append(design)
+        if len(batch) == 500:
+            Design.objects.bulk_update(batch, ["design_data"])
+            batch = []
+    Design.objects.bulk_update(batch, ["design_data"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='assets',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='design',
+            name='design_data_compressed',
+            field=store.fields.CompressedTextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_design_data, copy_back),
+        # only so the migration can be reversed (re-adding the old column needs a default)
+        migrations.AlterField(
+            model_name='design',
+            name='design_data',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='design',
+            name='design_data',
+        ),
+        migrations.RenameField(
+            model_name='design',
+            old_name='design_data_compressed',
+            new_name='design_data',
+        ),
+    ]
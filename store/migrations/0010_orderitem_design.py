@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:10
+
+import django.db.models.deletion
+import store.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_compressed_design_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='design',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='store.design'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='design_assets',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='design_data',
+            field=store.fields.CompressedTextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='size',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
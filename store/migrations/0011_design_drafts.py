@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_orderitem_design'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='is_draft',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='design',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
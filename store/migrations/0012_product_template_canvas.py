@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_design_drafts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='template_canvas',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='templates/canvas/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='template_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='template_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_product_template_canvas'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='template_height',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='template_width',
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from .fields import CompressedTextField
+
 
 class Product(models.Model):
     """
@@ -8,6 +10,8 @@ class Product(models.Model):
     - image = normal product image for shop display
     - template_image = transparent PNG used inside the customiser canvas
     - print_* = printable area (box) inside the template image
+    - template_canvas = template_image pre-scaled to the customiser canvas (made by the
+      process_product_images job, see services/product_images.py)
     """
     name = models.CharField(max_length=120)
     price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -19,7 +23,11 @@ class Product(models.Model):
     # Transparent PNG used for the customiser (important)
     template_image = models.ImageField(upload_to="templates/", blank=True, null=True)
 
-    # Printable area inside template image (pixels)
+    # template_image already at canvas size (empty until the job has run)
+    template_canvas = models.ImageField(upload_to="templates/canvas/", blank=True, null=True, editable=False)
+
+    # Printable area inside template image (canvas pixels: the template is always
+    # stretched to CANVAS_W x CANVAS_H, whatever size was uploaded)
     print_x = models.IntegerField(default=150)
     print_y = models.IntegerField(default=200)
     print_w = models.IntegerField(default=300)
@@ -27,6 +35,12 @@ class Product(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # newest-first listings (shop, home, admin list keyset pagination)
+            models.Index(fields=["created_at", "id"], name="product_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -34,8 +48,12 @@ class Product(models.Model):
 class Design(models.Model):
     """
     Saved custom design made by a user for a product.
-    - design_data stores the design JSON (text, positions, colours, etc.)
+    - design_data stores the design document (see services/design_schema.py), compressed;
+      uploaded pictures are separate media files listed in `assets`
     - preview stores a PNG screenshot so cart/order pages can show it easily
+    - is_draft: autosaved from the customiser (changed by deltas, revision counts them);
+      becomes a normal design when the user presses Save. Drafts have no preview and
+      don't show up in my designs / the admin list / the stats
     """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -48,16 +66,43 @@ class Design(models.Model):
         related_name="designs"
     )
 
-    design_data = models.TextField()
+    PREVIEW_STATUS_CHOICES = [
+        ("PENDING", "Waiting to render"),
+        ("RENDERING", "Rendering"),
+        ("READY", "Ready"),
+        ("FAILED", "Failed"),
+    ]
+
+    design_data = CompressedTextField()
+    # storage names of the pictures design_data points at (kept for media refcounts / GC)
+    assets = models.JSONField(default=list, blank=True)
     preview = models.ImageField(upload_to="design_previews/", blank=True, null=True)
 
+    # preview is rendered by a background job (see store/tasks.py)
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default="READY")
+
     # size chosen (S/M/L/XL)
     size = models.CharField(max_length=10, blank=True)
 
+    is_draft = models.BooleanField(default=False)
+    # bumped by every autosave delta; a delta names the revision it was made against
+    revision = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # admin designs list (keyset pagination on created_at, id)
+            models.Index(fields=["created_at", "id"], name="design_created_idx"),
+            # my_designs: one user's designs, newest first
+            models.Index(fields=["user", "created_at"], name="design_user_created_idx"),
+        ]
+
     def __str__(self):
-        return f"Design #{self.id} - {self.product.name}"
+        # only use product.name if it's already loaded (no hidden query per design)
+        if Design.product.is_cached(self):
+            return f"Design #{self.id} - {self.product.name}"
+        return f"Design #{self.id} - product #{self.product_id}"
 
 
 class Order(models.Model):
@@ -93,6 +138,13 @@ class Order(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # admin orders list: unfiltered, and filtered by status (keyset on created_at, id)
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+            models.Index(fields=["status", "created_at", "id"], name="order_status_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.full_name}"
 
@@ -100,7 +152,7 @@ class Order(models.Model):
 class OrderItem(models.Model):
     """
     Each row is one item in an order.
-    Stores product + qty + unit_price at time of purchase.
+    Stores product + qty + unit_price at time of purchase (+ the design, for custom prints).
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
 
@@ -110,8 +162,106 @@ class OrderItem(models.Model):
     qty = models.PositiveIntegerField(default=1)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Custom design printed on this line (None = plain product).
+    # design_data/design_assets are a copy taken at checkout, so editing or deleting
+    # the design later doesn't change what was ordered (production prints the copy).
+    design = models.ForeignKey(Design, on_delete=models.SET_NULL, null=True, blank=True, related_name="order_items")
+    size = models.CharField(max_length=10, blank=True)
+    design_data = CompressedTextField(blank=True)
+    design_assets = models.JSONField(default=list, blank=True)
+
     def subtotal(self):
         return self.qty * self.unit_price
 
     def __str__(self):
-        return f"OrderItem #{self.id} (Order #{self.order.id})"
+        return f"OrderItem #{self.id} (Order #{self.order_id})"
+
+
+class Job(models.Model):
+    """
+    One background task in the local job queue (no external broker needed).
+    - kind = name of the registered task function (see store/tasks.py)
+    - payload = JSON kwargs passed to that function
+    Workers started with `manage.py run_workers` claim QUEUED jobs whose run_after has passed.
+    """
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=60)
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers poll for "QUEUED and due", oldest first
+            models.Index(fields=["status", "run_after"], name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """
+    Reference count for one content-addressed file in MEDIA_ROOT (see store/storage.py).
+    refcount = how many ImageField values currently point at this blob.
+    Blobs that drop to 0 are removed later by `manage.py gc_media`.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class StoreStats(models.Model):
+    """
+    Single row (id=1) of running totals for the admin dashboard, so it doesn't
+    COUNT(*) four tables on every load. Kept up to date by signals
+    (store/signals.py -> store/services/stats.py) and rebuilt by `manage.py reconcile_stats`.
+    revenue = total_amount of orders that are PAID or SHIPPED.
+    """
+    product_count = models.IntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+    design_count = models.IntegerField(default=0)
+    user_count = models.IntegerField(default=0)
+
+    pending_count = models.IntegerField(default=0)
+    paid_count = models.IntegerField(default=0)
+    shipped_count = models.IntegerField(default=0)
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Store stats ({self.order_count} orders)"
+
+
+class DailyStats(models.Model):
+    """
+    One row per day (by order/design/user created_at) for the dashboard chart.
+    """
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    designs = models.IntegerField(default=0)
+    new_users = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders"
@@ -0,0 +1,113 @@
+import logging
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised (in "raise" mode, e.g. tests) when a view runs more queries than it declared."""
+
+
+def query_budget(max_queries):
+    """
+    Declares how many SQL queries a view may run per request, e.g.
+
+        @query_budget(3)
+        def shop(request): ...
+
+    The count includes session/auth lookups. QueryBudgetMiddleware checks it;
+    `manage.py test` runs with QUERY_BUDGET_MODE = "raise" (store/test_runner.py),
+    so a new N+1 fails whichever test hits that view.
+    """
+    def wrap(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return wrap
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts queries for every request and compares them with the view's @query_budget.
+    QUERY_BUDGET_MODE: "raise" (tests), "log" (default: warning in the log) or "off".
+    With QUERY_COUNT_HEADER = True the count is also sent back as X-Query-Count
+    (the benchmark commands turn this on to report queries per request).
+    Works under WSGI and ASGI (async-capable, so it doesn't force async views back into a thread).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        mode = getattr(settings, "QUERY_BUDGET_MODE", "log")
+        if mode == "off":
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with self.install(counter):
+            response = self.get_response(request)
+
+        self.check(request, response, counter, mode)
+        return response
+
+    async def __acall__(self, request):
+        mode = getattr(settings, "QUERY_BUDGET_MODE", "log")
+        if mode == "off":
+            return await self.get_response(request)
+
+        # The async ORM runs queries in the request's sync worker thread and connections
+        # are per thread, so the wrappers go on (and come off) the connections of that thread
+        counter = QueryCounter()
+        stack = await sync_to_async(self.install)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+
+        self.check(request, response, counter, mode)
+        return response
+
+    def install(self, counter):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        return stack
+
+    def check(self, request, response, counter, mode):
+        if getattr(settings, "QUERY_COUNT_HEADER", False):
+            response["X-Query-Count"] = str(counter.count)
+
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {counter.count} queries "
+                f"(budget {budget}, view {request.query_budget_view})"
+            )
+            if mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
+        request.query_budget_view = getattr(view_func, "__name__", repr(view_func))
+        return None
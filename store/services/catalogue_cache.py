@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from store.models import Product
+
+VERSION_KEY = "catalogue:version"
+
+
+def cache_timeout():
+    return getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 600)
+
+
+def catalogue_version():
+    """
+    Current catalogue "generation". Every cached catalogue fragment/object has it
+    in its key, so bumping it invalidates all of them at once (no key scanning,
+    works on locmem + file caches which can't delete by pattern).
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+async def acatalogue_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = 1
+        await cache.aadd(VERSION_KEY, version, None)
+    return version
+
+
+def bump_catalogue_version():
+    """Called whenever a Product changes (see store/signals.py)."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # key missing/evicted: any new value works as long as old keys stop matching
+        cache.set(VERSION_KEY, 2, None)
+
+
+def get_product(product_id):
+    """Product by id, cached per catalogue version. 404s like get_object_or_404."""
+    key = f"catalogue:{catalogue_version()}:product:{product_id}"
+    product = cache.get(key)
+    if product is None:
+        product = get_object_or_404(Product, id=product_id)
+        cache.set(key, product, cache_timeout())
+    return product
+
+
+async def aget_product(product_id):
+    """Async version of get_product."""
+    key = f"catalogue:{await acatalogue_version()}:product:{product_id}"
+    product = await cache.aget(key)
+    if product is None:
+        product = await aget_object_or_404(Product, id=product_id)
+        await cache.aset(key, product, cache_timeout())
+    return product
+
+
+async def aget_product_list(name, queryset):
+    """
+    Evaluated queryset (as a list), cached per catalogue version under `name`.
+    Async views can't hand a lazy queryset to the template (it would query from
+    the event loop), so the list is loaded here with the async ORM instead.
+    """
+    key = f"catalogue:{await acatalogue_version()}:list:{name}"
+    products = await cache.aget(key)
+    if products is None:
+        products = [product async for product in queryset]
+        await cache.aset(key, products, cache_timeout())
+    return products
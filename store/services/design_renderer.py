@@ -0,0 +1,168 @@
+import base64
+import io
+import json
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.storage import default_storage
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from store.services.design_schema import upgrade
+
+# Same size as the <canvas> in customise.html (the JS draws in these units)
+CANVAS_W = 900
+CANVAS_H = 650
+
+# Matches TEXT_PAD in customise.js (text is drawn inset inside its box)
+TEXT_PAD = 8
+
+# Fonts to try for text layers; first one that exists wins
+FONT_CANDIDATES = ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf"]
+
+
+class DesignRenderError(Exception):
+    """Raised when design JSON can't be turned into a preview image."""
+
+
+def parse_design_data(design_json):
+    """
+    Parses a saved design document (any version, upgraded to the current one).
+    Returns the dict, or raises DesignRenderError.
+    Lenient on purpose: new designs are validated on save (design_schema.load_design),
+    and older rows saved before that should still render what they can.
+    """
+    try:
+        data = json.loads(design_json)
+    except (TypeError, ValueError) as exc:
+        raise DesignRenderError("design_data is not valid JSON") from exc
+
+    if not isinstance(data, dict) or not isinstance(data.get("elements", []), list):
+        raise DesignRenderError("design_data must be an object with an elements list")
+
+    return upgrade(data)
+
+
+def load_font(size):
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def open_asset(name):
+    """
+    Opens an uploaded design asset (storage name, see design_schema.extract_assets).
+    None if it's missing, or if the name points outside MEDIA_ROOT (documents saved before
+    asset names were checked): the caller skips that layer like any other broken one.
+    """
+    try:
+        if not name or not default_storage.exists(name):
+            return None
+    except SuspiciousOperation:
+        return None
+    with default_storage.open(name) as fh:
+        img = Image.open(fh)
+        img.load()
+        return img
+
+
+def open_element_image(src):
+    """
+    Opens the image behind an old-style image layer ("src").
+    - data URLs (what the customiser used to embed)
+    - our own MEDIA_URL paths
+    Anything else (remote URLs) is ignored; we never fetch over the network here.
+    """
+    if not src:
+        return None
+
+    if src.startswith("data:"):
+        try:
+            _, data = src.split(";base64,", 1)
+            return Image.open(io.BytesIO(base64.b64decode(data)))
+        except (ValueError, OSError):
+            return None
+
+    media_url = settings.MEDIA_URL
+    if src.startswith(media_url):
+        return open_asset(src[len(media_url):])
+
+    return None
+
+
+def draw_text_element(canvas, el):
+    font_size = int(el.get("fontSize") or 48)
+    try:
+        color = ImageColor.getrgb(el.get("color") or "#111111")
+    except ValueError:
+        color = (17, 17, 17)
+
+    draw = ImageDraw.Draw(canvas)
+    draw.text(
+        (float(el.get("x", 0)) + TEXT_PAD, float(el.get("y", 0)) + TEXT_PAD),
+        str(el.get("text") or ""),
+        font=load_font(font_size),
+        fill=color,
+    )
+
+
+def draw_image_element(canvas, el):
+    img = open_asset(el["asset"]) if el.get("asset") else open_element_image(el.get("src"))
+    if img is None:
+        return
+
+    w = max(1, int(round(float(el.get("w", 0)))))
+    h = max(1, int(round(float(el.get("h", 0)))))
+    layer = img.convert("RGBA").resize((w, h), Image.LANCZOS)
+    canvas.alpha_composite(layer, (int(round(float(el.get("x", 0)))), int(round(float(el.get("y", 0))))))
+
+
+def render_design_preview(product, design_data):
+    """
+    Rebuilds the design preview on the server:
+    product template at canvas size, then every element on top (in order).
+    Only elements inside the product's print_* box are drawn, same rule as the JS.
+    Returns PNG bytes.
+    """
+    if isinstance(design_data, str):
+        design_data = parse_design_data(design_data)
+
+    canvas = Image.new("RGBA", (CANVAS_W, CANVAS_H), (242, 242, 242, 255))
+
+    # template_canvas is already canvas-sized (product_images job); older rows only have the upload
+    template_file = product.template_canvas or product.template_image
+    if template_file:
+        with template_file.open("rb") as fh:
+            template = Image.open(fh).convert("RGBA")
+        if template.size != (CANVAS_W, CANVAS_H):
+            template = template.resize((CANVAS_W, CANVAS_H), Image.LANCZOS)
+        canvas.alpha_composite(template)
+
+    # crop element drawing to the print area so nothing leaks outside it
+    box = (product.print_x, product.print_y,
+           product.print_x + product.print_w, product.print_y + product.print_h)
+    layer = Image.new("RGBA", (CANVAS_W, CANVAS_H), (0, 0, 0, 0))
+
+    for el in design_data.get("elements", []):
+        if not isinstance(el, dict):
+            continue
+        try:
+            if el.get("type") == "text":
+                draw_text_element(layer, el)
+            elif el.get("type") == "image":
+                draw_image_element(layer, el)
+        except (TypeError, ValueError, OSError):
+            # one broken layer shouldn't kill the whole preview
+            continue
+
+    mask = Image.new("L", (CANVAS_W, CANVAS_H), 0)
+    ImageDraw.Draw(mask).rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=255)
+    clipped = Image.new("RGBA", (CANVAS_W, CANVAS_H), (0, 0, 0, 0))
+    clipped.paste(layer, (0, 0), mask)
+    canvas.alpha_composite(clipped)
+
+    out = io.BytesIO()
+    canvas.convert("RGB").save(out, format="PNG", optimize=True)
+    return out.getvalue()
@@ -0,0 +1,294 @@
+"""
+The design document saved in Design.design_data.
+
+Version 2 (current):
+    {
+      "version": 2,
+      "printArea": {"x": .., "y": .., "w": .., "h": ..},
+      "elements": [
+        {"id": "..", "type": "text", "x": .., "y": .., "w": .., "h": ..,
+         "text": "Hello", "fontSize": 48, "color": "#111111"},
+        {"id": "..", "type": "image", "x": .., "y": .., "w": .., "h": .., "asset": "cas/ab/cd/abcd....png"}
+      ]
+    }
+
+Version 1 (no "version" key) is what customise.js used to post: image layers carried the
+whole picture inline as a data: URL in "src". Those still load (upgrade() fills in the
+version), and save_design moves the pictures out into media files (extract_assets),
+so a saved v2 document only holds storage names and stays a few hundred bytes.
+
+Drafts (autosave from customise.js) are changed with deltas instead of whole documents,
+see apply_delta():
+    {
+      "base": 7,                                     # revision the browser last saw
+      "elements": {"<id>": {..element..}, "<id>": null},   # added/changed, null = removed
+      "order": ["<id>", ...]                         # optional: new stacking order (every id)
+    }
+"""
+import base64
+import binascii
+import io
+import json
+import math
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+from store.storage import is_blob_name
+
+SCHEMA_VERSION = 2
+
+MAX_POST_BYTES = 8 * 1024 * 1024       # raw JSON as posted (before images are moved out)
+MAX_DELTA_BYTES = 64 * 1024            # one autosave delta (pictures are uploaded separately)
+MAX_DOCUMENT_BYTES = 32 * 1024         # what's saved, images already moved out
+MAX_ELEMENTS = 50
+MAX_TEXT_LENGTH = 200
+MAX_ASSET_BYTES = 4 * 1024 * 1024
+MAX_ASSET_PIXELS = 4096 * 4096
+FONT_SIZE_RANGE = (6, 400)
+# generous: elements may hang off the 900x650 canvas a bit while being dragged
+COORD_RANGE = (-2000, 4000)
+
+ASSET_UPLOAD_NAME = "design_assets/upload"
+ASSET_FORMATS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp", "GIF": "gif"}
+
+HEX_COLOR = re.compile(r"^#[0-9a-fA-F]{6}$")
+DATA_URL = re.compile(r"^data:image/[a-z0-9.+-]+;base64,", re.IGNORECASE)
+
+
+class DesignDataError(ValueError):
+    """The posted design document is malformed or breaks one of the limits above."""
+
+
+# ----------------------------
+# PARSING + VALIDATION
+# ----------------------------
+
+def upgrade(data):
+    """Brings an older document up to SCHEMA_VERSION (v1 -> v2 only adds the version)."""
+    if "version" not in data:
+        data = {**data, "version": 1}
+    if data["version"] == 1:
+        data = {**data, "version": 2}
+    return data
+
+
+def number(value, what, low=COORD_RANGE[0], high=COORD_RANGE[1]):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise DesignDataError(f"{what} must be a number")
+    if not low <= value <= high:
+        raise DesignDataError(f"{what} is out of range")
+    return round(value, 2)
+
+
+def clean_box(raw, what):
+    if not isinstance(raw, dict):
+        raise DesignDataError(f"{what} must be an object")
+    box = {key: number(raw.get(key), f"{what}.{key}") for key in ("x", "y", "w", "h")}
+    if box["w"] <= 0 or box["h"] <= 0:
+        raise DesignDataError(f"{what} must have a positive size")
+    return box
+
+
+def clean_element(raw, index):
+    what = f"elements[{index}]"
+    if not isinstance(raw, dict):
+        raise DesignDataError(f"{what} must be an object")
+
+    element = {"type": raw.get("type")}
+    if isinstance(raw.get("id"), str) and raw["id"]:
+        element["id"] = raw["id"][:64]
+    element.update(clean_box(raw, what))
+
+    if element["type"] == "text":
+        text = raw.get("text")
+        if not isinstance(text, str) or len(text) > MAX_TEXT_LENGTH:
+            raise DesignDataError(f"{what}.text must be a string of up to {MAX_TEXT_LENGTH} characters")
+        element["text"] = text
+        element["fontSize"] = int(number(raw.get("fontSize") or 48, f"{what}.fontSize", *FONT_SIZE_RANGE))
+        color = raw.get("color") or "#111111"
+        if not isinstance(color, str) or not HEX_COLOR.match(color):
+            raise DesignDataError(f"{what}.color must look like #rrggbb")
+        element["color"] = color.lower()
+
+    elif element["type"] == "image":
+        asset, src = raw.get("asset"), raw.get("src")
+        if asset is not None:
+            # only names of pictures that were really uploaded (upload_design_asset)
+            if not is_blob_name(asset) or not default_storage.exists(asset):
+                raise DesignDataError(f"{what}.asset does not exist")
+            element["asset"] = asset
+        elif isinstance(src, str) and (DATA_URL.match(src) or src.startswith(settings.MEDIA_URL)):
+            element["src"] = src  # extract_assets() turns this into an asset
+        else:
+            raise DesignDataError(f"{what} needs an uploaded asset")
+
+    else:
+        raise DesignDataError(f"{what}.type must be text or image")
+
+    return element
+
+
+def validate(data):
+    """Checks a (version 2) document and returns a normalised copy with only the known keys."""
+    if not isinstance(data, dict):
+        raise DesignDataError("design_data must be a JSON object")
+
+    version = data.get("version")
+    if version != SCHEMA_VERSION:
+        raise DesignDataError(f"Unsupported design version: {version!r}")
+
+    elements = data.get("elements", [])
+    if not isinstance(elements, list):
+        raise DesignDataError("elements must be a list")
+    if len(elements) > MAX_ELEMENTS:
+        raise DesignDataError(f"A design can have at most {MAX_ELEMENTS} elements")
+
+    document = {"version": SCHEMA_VERSION}
+    if data.get("printArea") is not None:
+        document["printArea"] = clean_box(data["printArea"], "printArea")
+    document["elements"] = [clean_element(el, i) for i, el in enumerate(elements)]
+    return document
+
+
+def load_design(design_json):
+    """Posted JSON -> validated, current-version document (raises DesignDataError)."""
+    if not isinstance(design_json, str) or len(design_json) > MAX_POST_BYTES:
+        raise DesignDataError("design_data is missing or too big")
+    try:
+        data = json.loads(design_json)
+    except ValueError as exc:
+        raise DesignDataError("design_data is not valid JSON") from exc
+    if not isinstance(data, dict):
+        raise DesignDataError("design_data must be a JSON object")
+    return validate(upgrade(data))
+
+
+def dump_design(document):
+    """Compact JSON for storage (no whitespace; the column is compressed on top of that)."""
+    text = json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+    if len(text.encode()) > MAX_DOCUMENT_BYTES:
+        raise DesignDataError("design_data is too big")
+    return text
+
+
+# ----------------------------
+# ASSETS
+# ----------------------------
+
+def save_asset(raw_bytes, storage=default_storage):
+    """Checks uploaded image bytes and stores them (content-addressed). Returns the storage name."""
+    if len(raw_bytes) > MAX_ASSET_BYTES:
+        raise DesignDataError("Image is too big")
+    try:
+        with Image.open(io.BytesIO(raw_bytes)) as img:
+            fmt = img.format
+            width, height = img.size
+            img.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise DesignDataError("Not a valid image") from exc
+
+    if fmt not in ASSET_FORMATS:
+        raise DesignDataError("Images must be PNG, JPEG, WebP or GIF")
+    if width * height > MAX_ASSET_PIXELS:
+        raise DesignDataError("Image has too many pixels")
+
+    return storage.save(f"{ASSET_UPLOAD_NAME}.{ASSET_FORMATS[fmt]}", ContentFile(raw_bytes))
+
+
+def extract_assets(document, storage=default_storage):
+    """
+    Moves inline data: URL images out of the document into media files and points the
+    elements at them instead ("asset"). Existing MEDIA_URL paths are turned into assets too.
+    Returns (document, [asset names]). Identical pictures share one file (the storage is CAS).
+    """
+    assets = []
+    for element in document["elements"]:
+        if element["type"] != "image":
+            continue
+
+        src = element.pop("src", None)
+        if src is not None:
+            if DATA_URL.match(src):
+                try:
+                    raw_bytes = base64.b64decode(src.split(",", 1)[1], validate=True)
+                except (binascii.Error, ValueError) as exc:
+                    raise DesignDataError("Image data is not valid base64") from exc
+                element["asset"] = save_asset(raw_bytes, storage)
+            else:
+                name = src[len(settings.MEDIA_URL):]
+                if not is_blob_name(name) or not storage.exists(name):
+                    raise DesignDataError("Image does not exist")
+                element["asset"] = name
+
+        assets.append(element["asset"])
+    return document, assets
+
+
+# ----------------------------
+# DELTAS (drafts)
+# ----------------------------
+
+def load_delta(delta_json):
+    """Posted delta JSON -> dict with "base", "elements" and maybe "order" (raises DesignDataError)."""
+    if not isinstance(delta_json, str) or len(delta_json) > MAX_DELTA_BYTES:
+        raise DesignDataError("Delta is missing or too big")
+    try:
+        delta = json.loads(delta_json)
+    except ValueError as exc:
+        raise DesignDataError("Delta is not valid JSON") from exc
+
+    if not isinstance(delta, dict):
+        raise DesignDataError("Delta must be a JSON object")
+    if isinstance(delta.get("base"), bool) or not isinstance(delta.get("base"), int):
+        raise DesignDataError("Delta needs the base revision")
+    if not isinstance(delta.get("elements", {}), dict):
+        raise DesignDataError("Delta elements must be an object keyed by element id")
+    order = delta.get("order")
+    if order is not None and (not isinstance(order, list) or not all(isinstance(i, str) for i in order)):
+        raise DesignDataError("Delta order must be a list of element ids")
+    return delta
+
+
+def apply_delta(document, delta):
+    """
+    Applies a delta (see the module docstring) to a current-version document and returns
+    the new, validated document. Elements are matched by id; changed ones are replaced
+    whole (they're small, pictures are only asset names). Without "order", new elements
+    go on top; with it, the elements are put in that order and any not listed are dropped.
+    """
+    by_id = {el["id"]: el for el in document["elements"] if "id" in el}
+    ids = [el["id"] for el in document["elements"] if "id" in el]
+    # elements without an id can't be addressed; they stay at the bottom (until an "order")
+    unnamed = [el for el in document["elements"] if "id" not in el]
+
+    for element_id, element in delta.get("elements", {}).items():
+        if element is None:
+            by_id.pop(element_id, None)
+            continue
+        if not isinstance(element, dict):
+            raise DesignDataError(f"elements[{element_id!r}] must be an object or null")
+        if element_id not in by_id:
+            ids.append(element_id)
+        by_id[element_id] = {**element, "id": element_id}
+
+    if delta.get("order") is not None:
+        missing = [i for i in delta["order"] if i not in by_id]
+        if missing:
+            raise DesignDataError(f"order names unknown elements: {missing[:3]}")
+        ids, unnamed = delta["order"], []
+
+    elements = unnamed + [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+    return validate({**document, "elements": elements})
+
+
+def prepare_design(design_json, storage=default_storage):
+    """
+    Everything save_design needs: validate, upgrade, move images out, serialise.
+    Returns (design_data text, [asset names]).
+    """
+    document, assets = extract_assets(load_design(design_json), storage)
+    return dump_design(document), assets
@@ -0,0 +1,153 @@
+import io
+import json
+import os
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+# Widths (px) generated for grid cards / detail pages. Never upscaled.
+VARIANT_WIDTHS = (240, 480, 960)
+
+VARIANT_ROOT = "variants"
+MANIFEST_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def has_codec(name):
+    try:
+        return bool(features.check(name))
+    except (ValueError, KeyError):
+        return False
+
+
+def modern_formats():
+    """Next-gen formats this Pillow build can actually write, best first."""
+    formats = []
+    if has_codec("avif"):
+        formats.append("avif")
+    if has_codec("webp"):
+        formats.append("webp")
+    return formats
+
+
+SAVE_OPTIONS = {
+    "avif": {"format": "AVIF", "quality": 55},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+    "png": {"format": "PNG", "optimize": True},
+}
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpg": "image/jpeg", "png": "image/png"}
+
+
+def variant_dir(source_name):
+    stem, _ = os.path.splitext(source_name)
+    return f"{VARIANT_ROOT}/{stem}"
+
+
+def variant_name(source_name, width, ext):
+    return f"{variant_dir(source_name)}/{width}w.{ext}"
+
+
+def manifest_name(source_name):
+    return f"{variant_dir(source_name)}/manifest.json"
+
+
+def manifest_cache_key(source_name):
+    return f"imgvariants:{source_name}"
+
+
+def generate_variants(field, widths=VARIANT_WIDTHS):
+    """
+    Writes resized copies of an ImageField's file (AVIF/WebP where supported
+    + a JPEG/PNG fallback) and a small manifest.json describing them.
+    Re-running overwrites the old variants, so it's safe after a re-upload.
+    Returns the manifest dict (or None if the field is empty).
+    """
+    if not field:
+        return None
+
+    with field.open("rb") as fh:
+        img = Image.open(fh)
+        img.load()
+
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    fallback = "png" if has_alpha else "jpg"
+    img = img.convert("RGBA" if has_alpha else "RGB")
+
+    source_w, source_h = img.size
+    formats = modern_formats() + [fallback]
+    manifest = {"width": source_w, "height": source_h, "fallback": fallback, "variants": {}}
+
+    for ext in formats:
+        done = []
+        for width in widths:
+            if width >= source_w:
+                continue
+            height = max(1, round(source_h * width / source_w))
+            resized = img.resize((width, height), Image.LANCZOS)
+
+            out = io.BytesIO()
+            resized.save(out, **SAVE_OPTIONS[ext])
+
+            name = variant_name(field.name, width, ext)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(out.getvalue()))
+            done.append(width)
+        manifest["variants"][ext] = done
+
+    name = manifest_name(field.name)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(json.dumps(manifest).encode()))
+
+    cache.set(manifest_cache_key(field.name), manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def get_manifest(source_name):
+    """
+    Manifest for a source file, or None if variants haven't been generated yet.
+    Cached so templates don't hit the disk on every render.
+    """
+    key = manifest_cache_key(source_name)
+    manifest = cache.get(key)
+    if manifest is not None:
+        return manifest or None
+
+    manifest = {}
+    name = manifest_name(source_name)
+    try:
+        if default_storage.exists(name):
+            with default_storage.open(name) as fh:
+                manifest = json.loads(fh.read())
+    except (OSError, ValueError):
+        manifest = {}
+
+    # cache misses too ({}), so pages with un-processed images stay cheap
+    cache.set(key, manifest, MANIFEST_CACHE_TIMEOUT if manifest else 60)
+    return manifest or None
+
+
+def build_srcset(field, ext, manifest):
+    """'url 240w, url 480w, ...' for one format (original appended for the fallback)."""
+    parts = [
+        f"{default_storage.url(variant_name(field.name, width, ext))} {width}w"
+        for width in manifest["variants"].get(ext, [])
+    ]
+    if ext == manifest["fallback"]:
+        parts.append(f"{field.url} {manifest['width']}w")
+    return ", ".join(parts)
+
+
+def delete_variants(source_name):
+    """Removes the thumbnails + manifest generated for a source file."""
+    folder = variant_dir(source_name)
+    if not default_storage.exists(folder):
+        return
+    _, files = default_storage.listdir(folder)
+    for f in files:
+        default_storage.delete(f"{folder}/{f}")
+    cache.delete(manifest_cache_key(source_name))
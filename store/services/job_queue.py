@@ -0,0 +1,171 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from store.models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "WORKERS": 2,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_DELAY": 30,
+    "POLL_INTERVAL": 1.0,
+    "STALE_AFTER": 600,
+    "STALE_CHECK_EVERY": 60,
+    "EAGER": False,
+}
+
+# kind -> (function, on_failure)
+_registry = {}
+
+
+def queue_setting(name):
+    return getattr(settings, "JOB_QUEUE", {}).get(name, DEFAULTS[name])
+
+
+def register(kind, on_failure=None):
+    """
+    Decorator that makes a function runnable as a job:
+
+        @register("render_design_preview")
+        def render_design_preview(design_id): ...
+
+    on_failure(**payload) is called once a job has used up all its attempts.
+    """
+    def wrap(func):
+        _registry[kind] = (func, on_failure)
+        return func
+    return wrap
+
+
+def enqueue(kind, max_attempts=None, delay=0, **payload):
+    """
+    Adds a job to the queue and returns it.
+    The row is written in the caller's transaction, so workers only see it after commit.
+    With JOB_QUEUE["EAGER"] the job runs straight away instead (no worker needed).
+    """
+    if kind not in _registry:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts or queue_setting("MAX_ATTEMPTS"),
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+    if queue_setting("EAGER"):
+        if claim(job):
+            run_job(job)
+
+    return job
+
+
+def claim(job):
+    """
+    Marks a QUEUED job as RUNNING.
+    Uses a conditional UPDATE so two workers can never both win the same job
+    (works the same on SQLite and PostgreSQL, no row locks needed).
+    """
+    now = timezone.now()
+    won = Job.objects.filter(id=job.id, status="QUEUED").update(
+        status="RUNNING",
+        locked_at=now,
+        attempts=job.attempts + 1,
+    )
+    if won:
+        job.status = "RUNNING"
+        job.locked_at = now
+        job.attempts += 1
+    return bool(won)
+
+
+def due_jobs(now):
+    """A few of the oldest jobs that are due (a couple, in case another worker wins the first)."""
+    return Job.objects.filter(status="QUEUED", run_after__lte=now).order_by("run_after", "id")[:5]
+
+
+def claim_next():
+    """Claims the oldest due job, or returns None if there is nothing to do."""
+    candidates = due_jobs(timezone.now())
+
+    for job in candidates:
+        if claim(job):
+            return job
+    return None
+
+
+def requeue_stale():
+    """Puts RUNNING jobs whose worker died back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=queue_setting("STALE_AFTER"))
+    return Job.objects.filter(status="RUNNING", locked_at__lt=cutoff).update(status="QUEUED", locked_at=None)
+
+
+def run_job(job):
+    """
+    Runs one claimed job and records the outcome.
+    Failures are retried with a growing delay until max_attempts is reached.
+    """
+    func, on_failure = _registry.get(job.kind, (None, None))
+
+    try:
+        if func is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+
+        if job.attempts < job.max_attempts:
+            job.status = "QUEUED"
+            job.locked_at = None
+            job.run_after = timezone.now() + timedelta(seconds=queue_setting("RETRY_DELAY") * job.attempts)
+            job.save(update_fields=["status", "locked_at", "run_after", "last_error"])
+            return False
+
+        job.status = "FAILED"
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "finished_at", "last_error"])
+
+        if on_failure is not None:
+            try:
+                on_failure(**job.payload)
+            except Exception:
+                logger.exception("on_failure hook for job %s failed", job.id)
+        return False
+
+    job.status = "DONE"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    return True
+
+
+def run_pending(limit=None):
+    """
+    Runs due jobs in this thread until the queue is empty (or limit is hit).
+    Returns how many jobs were processed. Used by the worker loop and by tests.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def poll(count):
+    """
+    One pass of a worker loop (count = passes so far): runs at most one due job and,
+    every STALE_CHECK_EVERY passes, re-queues jobs whose worker thread died without the
+    process exiting (otherwise they'd stay RUNNING until the next restart).
+    Returns True if a job ran.
+    """
+    if count % queue_setting("STALE_CHECK_EVERY") == 0:
+        requeue_stale()
+    return bool(run_pending(limit=1))
@@ -0,0 +1,90 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 25
+
+
+class KeysetPage:
+    """
+    One page of a keyset (cursor) paginated list, newest first.
+    - items = rows on this page
+    - next_cursor / prev_cursor = opaque strings for ?after= / ?before= (None at the ends)
+    Unlike OFFSET paging, every page costs the same no matter how deep you go:
+    the database seeks straight into the (field, id) index.
+    """
+
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (datetime, pk) or None for a missing/garbled cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_query(queryset, field="created_at", after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    The query keyset_page() runs (per_page + 1 rows, the extra one says if there's more).
+    after/before are decoded cursors, (value, pk). Separate so query_audit can EXPLAIN it.
+    """
+    if before and not after:
+        value, pk = before
+        return (
+            queryset.filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk}))
+            .order_by(field, "pk")[:per_page + 1]
+        )
+    if after:
+        value, pk = after
+        queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk}))
+    return queryset.order_by(f"-{field}", "-pk")[:per_page + 1]
+
+
+def keyset_page(queryset, field="created_at", after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Newest-first page of queryset ordered by (field, id).
+    after = cursor of the last row already seen (older rows),
+    before = cursor of the first row already seen (newer rows).
+    Needs an index on (field, id) (plus any filter columns in front) to stay fast.
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    rows = list(page_query(queryset, field, after, before, per_page))
+
+    if before and not after:
+        has_more_newer = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_more_older = True
+    else:
+        has_more_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_more_newer = after is not None
+
+    next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].pk) if rows and has_more_older else None
+    prev_cursor = encode_cursor(getattr(rows[0], field), rows[0].pk) if rows and has_more_newer else None
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,23 @@
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct 0-100). 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms, elapsed_s):
+    """p50/p95/p99/max latency (ms) + throughput (per second) for one benchmark run."""
+    count = len(latencies_ms)
+    return {
+        "count": count,
+        "throughput_per_s": round(count / elapsed_s, 2) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
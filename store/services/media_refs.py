@@ -0,0 +1,168 @@
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from store.models import Design, MediaBlob, OrderItem
+from store.services.image_variants import delete_variants
+from store.storage import CAS_PREFIX, ContentAddressedStorage, is_blob
+
+
+def tracked_fields():
+    """(model, field_name) for every store FileField/ImageField that stores blobs."""
+    found = []
+    for model in apps.get_app_config("store").get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage):
+                found.append((model, field.name))
+    return found
+
+
+def incref(name):
+    if not is_blob(name):
+        return
+    if MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        # someone else created the row first
+        MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1)
+
+
+def blob_counts(names):
+    """{blob name: how many times it's in names} (non-blob names are skipped)."""
+    return Counter(name for name in names if is_blob(name))
+
+
+def by_name(counts):
+    """refcount delta per row as one CASE, so a whole batch is a single UPDATE."""
+    return Case(
+        *[When(name=name, then=Value(n)) for name, n in counts.items()],
+        default=Value(0), output_field=models.PositiveIntegerField(),
+    )
+
+
+def incref_many(names):
+    """
+    incref() for a batch of names (duplicates count several times) in a fixed number of
+    queries: one UPDATE when every blob already has a row (a design being copied, pictures
+    uploaded before the design was saved), + SELECT, INSERT and UPDATE for brand-new ones.
+    """
+    counts = blob_counts(names)
+    if not counts:
+        return
+    if MediaBlob.objects.filter(name__in=counts).update(refcount=F("refcount") + by_name(counts)) == len(counts):
+        return
+
+    known = set(MediaBlob.objects.filter(name__in=counts).values_list("name", flat=True))
+    missing = {name: n for name, n in counts.items() if name not in known}
+    # rows start at 0 and are counted by the UPDATE, so a row someone else inserted
+    # in the meantime (ignore_conflicts) still gets our references
+    MediaBlob.objects.bulk_create([MediaBlob(name=name, refcount=0) for name in missing], ignore_conflicts=True)
+    MediaBlob.objects.filter(name__in=missing).update(refcount=F("refcount") + by_name(missing))
+
+
+def decref(name):
+    if not is_blob(name):
+        return
+    MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F("refcount") - 1)
+
+
+def decref_many(names):
+    """decref() for a batch of names, as one UPDATE (counts never go below 0)."""
+    counts = blob_counts(names)
+    if counts:
+        MediaBlob.objects.filter(name__in=counts, refcount__gt=0).update(
+            refcount=Greatest(F("refcount") - by_name(counts), 0),
+        )
+
+
+def replace(old_name, new_name):
+    """Moves one reference from old_name to new_name (no-op if they're the same)."""
+    if old_name == new_name:
+        return
+    incref(new_name)
+    decref(old_name)
+
+
+def recount():
+    """
+    Rebuilds every refcount from the actual ImageField values + design assets (the "mark" phase).
+    Fixes drift from writes that skipped signals (queryset.update(), raw SQL, ...).
+    Returns {blob_name: count}.
+    """
+    counts = Counter()
+    for model, field_name in tracked_fields():
+        names = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+        for name in names.values_list(field_name, flat=True).iterator():
+            if is_blob(name):
+                counts[name] += 1
+
+    # pictures used inside design documents (+ the copies ordered designs keep)
+    for queryset in (Design.objects.values_list("assets", flat=True),
+                     OrderItem.objects.exclude(design_assets=[]).values_list("design_assets", flat=True)):
+        for names in queryset.iterator():
+            for name in names or []:
+                if is_blob(name):
+                    counts[name] += 1
+
+    with transaction.atomic():
+        existing = {blob.name: blob for blob in MediaBlob.objects.all()}
+        changed = []
+        for name, blob in existing.items():
+            if blob.refcount != counts.get(name, 0):
+                blob.refcount = counts.get(name, 0)
+                changed.append(blob)
+        MediaBlob.objects.bulk_update(changed, ["refcount"], batch_size=500)
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, refcount=n) for name, n in counts.items() if name not in existing],
+            batch_size=500,
+        )
+
+    return counts
+
+
+def iter_blob_files(storage=default_storage, root=CAS_PREFIX.rstrip("/")):
+    dirs, files = storage.listdir(root)
+    for f in files:
+        yield f"{root}/{f}"
+    for d in dirs:
+        yield from iter_blob_files(storage, f"{root}/{d}")
+
+
+def collect_garbage(grace_seconds=24 * 60 * 60, dry_run=False, storage=default_storage):
+    """
+    Deletes blobs that nothing references (the "sweep" phase), plus their thumbnails.
+    Blobs younger than grace_seconds are kept: they may belong to an upload whose
+    model row hasn't been saved yet.
+    Returns the list of deleted (or, with dry_run, deletable) names.
+    """
+    live = recount()
+    if not storage.exists(CAS_PREFIX.rstrip("/")):
+        return []
+
+    cutoff = time.time() - grace_seconds
+    removed = []
+
+    for name in iter_blob_files(storage):
+        if live.get(name):
+            continue
+        if os.path.getmtime(storage.path(name)) > cutoff:
+            continue
+
+        removed.append(name)
+        if not dry_run:
+            storage.force_delete(name)
+            delete_variants(name)
+
+    if removed and not dry_run:
+        MediaBlob.objects.filter(name__in=removed, refcount=0).delete()
+
+    return removed
@@ -1,50 +1,202 @@
 from decimal import Decimal
-from django.shortcuts import get_object_or_404
-from store.models import Order, OrderItem, Product
 
-def build_cart_summary(cart):
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from store.models import Design, Order, OrderItem, Product
+from store.services import media_refs
+
+
+# ----------------------------
+# CART LINES
+# ----------------------------
+# A cart is {line key: {"qty": n}} (stored by store/cart_store.py). One line per
+# (product, design, size), and the key says which:
+#   plain product:  "12"
+#   custom design:  "12:40:M"   (product 12, design 40, size M)
+# Plain lines keep the old product-id-only key.
+
+SIZES = ("S", "M", "L", "XL")
+
+
+def line_key(product_id, design_id=None, size=""):
+    if design_id is None and not size:
+        return str(product_id)
+    return f"{product_id}:{design_id or ''}:{size}"
+
+
+def parse_line(key, data):
+    """(product_id, design_id or None, size, qty) for one cart line, or None if it's garbage."""
+    try:
+        parts = str(key).split(":")
+        product_id = int(parts[0])
+        design_id = int(parts[1]) if len(parts) > 1 and parts[1] else None
+        size = parts[2] if len(parts) > 2 else ""
+        qty = int(data.get("qty", 1))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return product_id, design_id, size, qty
+
+
+# ----------------------------
+# PRICING
+# ----------------------------
+
+class PricedCart:
     """
-    Turns the session cart into a list of items + a total.
-    Keeping this outside views makes it reusable + testable.
+    Result of pricing the cart once.
+    - items = list of {"key", "product", "design", "size", "qty", "subtotal"} dicts
+    - total = sum of all subtotals
+    - missing_ids = cart keys whose product (or design) no longer exists (deleted by staff etc.)
+    Pass this around instead of re-pricing the same cart again in one request.
+    """
+
+    def __init__(self, items, total, missing_ids):
+        self.items = items
+        self.total = total
+        self.missing_ids = missing_ids
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def cart_designs():
+    # the document isn't needed to price or show a line (checkout copies it separately)
+    return Design.objects.defer("design_data", "assets")
+
+
+def price_cart(cart):
     """
+    Prices the whole cart with ONE query (id__in) instead of one per line,
+    plus one for the designs if any line has one.
+    Products/designs that were deleted are skipped (and reported in missing_ids)
+    so a stale cart doesn't 404 the cart/checkout pages.
+    """
+    lines = cart_lines(cart)
+    products = Product.objects.in_bulk({line[1] for line in lines})
+    design_ids = {line[2] for line in lines if line[2]}
+    designs = cart_designs().in_bulk(design_ids) if design_ids else {}
+    return _build_priced_cart(lines, products, designs)
+
+
+async def aprice_cart(cart):
+    """Async version of price_cart for the async views (same id__in queries)."""
+    lines = cart_lines(cart)
+    products = await Product.objects.ain_bulk({line[1] for line in lines})
+    design_ids = {line[2] for line in lines if line[2]}
+    designs = await cart_designs().ain_bulk(design_ids) if design_ids else {}
+    return _build_priced_cart(lines, products, designs)
+
+
+def cart_lines(cart):
+    """[(key, product_id, design_id, size, qty)]; unreadable lines get product_id None."""
+    lines = []
+    for key, data in cart.items():
+        parsed = parse_line(key, data)
+        lines.append((key, *parsed) if parsed else (key, None, None, "", 0))
+    return lines
+
+
+def _build_priced_cart(lines, products, designs):
     items = []
+    missing_ids = []
     total = Decimal("0.00")
 
-    for product_id_str, data in cart.items():
-        product = get_object_or_404(Product, id=int(product_id_str))
-        qty = int(data.get("qty", 1))
+    for key, product_id, design_id, size, qty in lines:
+        product = products.get(product_id)
+        design = designs.get(design_id) if design_id else None
+
+        # a design line only counts if the design still exists and is for this product
+        if product is None or (design_id and (design is None or design.product_id != product.id)):
+            missing_ids.append(key)
+            continue
 
         subtotal = Decimal(str(product.price)) * qty
         total += subtotal
 
         items.append({
+            "key": key,
             "product": product,
+            "design": design,
+            "size": size,
             "qty": qty,
             "subtotal": subtotal
         })
 
-    return items, total
+    return PricedCart(items, total, missing_ids)
+
+
+def build_cart_summary(cart):
+    """
+    Turns the cart into a list of items + a total.
+    Keeping this outside views makes it reusable + testable.
+    """
+    priced = price_cart(cart)
+    return priced.items, priced.total
 
 
-def create_order_from_cart(cart, user, delivery_data):
+def create_order_from_cart(cart, user, delivery_data, priced_cart=None):
     """
-    Creates an Order + OrderItems using cart session data.
+    Creates an Order + OrderItems from the cart lines.
+    If the view already priced the cart, pass it in so we don't price it twice.
+
+    Everything runs in one transaction: either the order and all of its items
+    are written, or nothing is (no half-written orders if something fails).
+    Items go in with a single bulk insert instead of one INSERT per line,
+    which keeps the SQLite write lock short during busy checkouts.
     """
-    items, total = build_cart_summary(cart)
+    if priced_cart is None:
+        priced_cart = price_cart(cart)
 
-    order = Order.objects.create(
-        user=user,
-        total_amount=total,
-        status="PENDING",
-        **delivery_data
-    )
+    # snapshot of every design being ordered (one query, only if there are any)
+    design_ids = [item["design"].id for item in priced_cart.items if item["design"]]
+    snapshots = {}
+    if design_ids:
+        snapshots = {
+            design_id: (data, assets)
+            for design_id, data, assets in Design.objects.filter(id__in=design_ids)
+            .values_list("id", "design_data", "assets")
+        }
 
-    for item in items:
-        OrderItem.objects.create(
-            order=order,
-            product=item["product"],
-            qty=item["qty"],
-            unit_price=item["product"].price
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            total_amount=priced_cart.total,
+            status="PENDING",
+            **delivery_data
         )
 
+        rows = []
+        for item in priced_cart.items:
+            design = item["design"]
+            design_data, design_assets = snapshots.get(design.id, ("", [])) if design else ("", [])
+            rows.append(OrderItem(
+                order=order,
+                product=item["product"],
+                qty=item["qty"],
+                unit_price=item["product"].price,
+                design=design,
+                size=item["size"],
+                design_data=design_data,
+                design_assets=design_assets,
+            ))
+        OrderItem.objects.bulk_create(rows)
+
+        # bulk_create skips signals: the copied pictures need their references counted here
+        media_refs.incref_many(name for row in rows for name in row.design_assets)
+
     return order
+
+
+async def acreate_order_from_cart(cart, user, delivery_data, priced_cart=None):
+    """
+    create_order_from_cart for async views.
+    transaction.atomic() doesn't work in async code yet, so the whole write
+    (order + items, one transaction) runs in a worker thread.
+    """
+    return await sync_to_async(create_order_from_cart)(cart, user, delivery_data, priced_cart)
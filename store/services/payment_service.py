@@ -6,3 +6,10 @@ def mark_order_paid(order, method="SIMULATED_CARD"):
     order.status = "PAID"
     order.save()
     return order
+
+
+async def amark_order_paid(order, method="SIMULATED_CARD"):
+    """Async version of mark_order_paid (used by the async payment view)."""
+    order.status = "PAID"
+    await order.asave()
+    return order
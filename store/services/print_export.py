@@ -0,0 +1,252 @@
+"""
+Print-ready exports of a design (what production actually prints).
+
+Design.preview is the 900x650 canvas screenshot, fine for the shop but far too small
+to print. Here the same document is rendered again at print DPI, covering only the
+product's print_* box (transparent background, no garment template):
+
+    print_w canvas units -> PRINT_EXPORT["PRINT_WIDTH_IN"] inches at PRINT_EXPORT["DPI"]
+
+With the defaults that's 3600 px wide, so the whole image can be ~70 MB as RGBA.
+It is never held in memory at once: the output is rendered in full-width strips of
+STRIP_HEIGHT rows, each strip only draws the part of each element that falls inside
+it, and the strips are streamed straight into a PNG (write_png) on a temp file.
+
+Exports are cached per design version: the file name is a hash of everything that
+changes the pixels (document, print box, DPI, EXPORT_VERSION), so re-exporting an
+unchanged design just returns the existing file. Older versions are kept (an order
+prints the copy of the design taken at checkout) until the design is deleted.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageColor, ImageDraw
+
+from store.services.design_renderer import (
+    TEXT_PAD, load_font, open_asset, open_element_image, parse_design_data,
+)
+
+DEFAULTS = {
+    "DPI": 300,
+    "PRINT_WIDTH_IN": 12,        # physical width of the print area (print_w) on the garment
+    "STRIP_HEIGHT": 512,         # output rows rendered at a time (memory ~ width * this * 4 bytes)
+    "WORKERS": None,             # export_print_files processes, None = one per CPU core
+}
+
+# bump when the renderer changes what it draws, so cached exports get redone
+EXPORT_VERSION = 1
+
+EXPORT_ROOT = "print_exports"
+
+
+def export_setting(name):
+    return getattr(settings, "PRINT_EXPORT", {}).get(name, DEFAULTS[name])
+
+
+def print_box(product):
+    """The product's print area as a plain tuple (x, y, w, h); what the pool workers get."""
+    return (product.print_x, product.print_y, product.print_w, product.print_h)
+
+
+def print_size(box):
+    """Pixel size of the print file for a print box (x, y, w, h), plus the canvas -> pixels scale."""
+    scale = export_setting("DPI") * export_setting("PRINT_WIDTH_IN") / box[2]
+    return round(box[2] * scale), round(box[3] * scale), scale
+
+
+def export_dir(design_id):
+    return f"{EXPORT_ROOT}/design_{design_id}"
+
+
+def export_name(design_id, design_data, box):
+    """Storage name of the export for this version of the design."""
+    dpi, width_in = export_setting("DPI"), export_setting("PRINT_WIDTH_IN")
+    key = hashlib.sha256(
+        json.dumps([EXPORT_VERSION, design_data, list(box), dpi, width_in]).encode()
+    ).hexdigest()[:16]
+    return f"{export_dir(design_id)}/{key}.png"
+
+
+def delete_exports(design_id):
+    """Removes every export file of a design."""
+    folder = export_dir(design_id)
+    if not default_storage.exists(folder):
+        return
+    _, files = default_storage.listdir(folder)
+    for f in files:
+        default_storage.delete(f"{folder}/{f}")
+
+
+# ----------------------------
+# RENDERING
+# ----------------------------
+
+class TextLayer:
+    def __init__(self, el, scale, origin):
+        self.text = str(el.get("text") or "")
+        self.font = load_font(max(1, round(int(el.get("fontSize") or 48) * scale)))
+        try:
+            self.color = ImageColor.getrgb(el.get("color") or "#111111")
+        except ValueError:
+            self.color = (17, 17, 17)
+        self.x = (float(el.get("x", 0)) + TEXT_PAD - origin[0]) * scale
+        self.y = (float(el.get("y", 0)) + TEXT_PAD - origin[1]) * scale
+        left, top, right, bottom = self.font.getbbox(self.text)
+        self.top, self.bottom = self.y + top, self.y + bottom
+
+    def draw(self, strip, strip_top):
+        if self.bottom < strip_top or self.top > strip_top + strip.height:
+            return
+        ImageDraw.Draw(strip).text((self.x, self.y - strip_top), self.text, font=self.font, fill=self.color)
+
+
+class ImageLayer:
+    def __init__(self, el, scale, origin, img):
+        self.x = (float(el.get("x", 0)) - origin[0]) * scale
+        self.y = (float(el.get("y", 0)) - origin[1]) * scale
+        self.w = max(1.0, float(el.get("w", 0)) * scale)
+        self.h = max(1.0, float(el.get("h", 0)) * scale)
+
+        # Every layer is kept for the whole export, so don't keep more source pixels than
+        # it prints: shrink by a whole factor right away (still >= the output size, the
+        # strips do the exact LANCZOS resize from there).
+        img = img.convert("RGBA")
+        factor = min(img.width // math.ceil(self.w), img.height // math.ceil(self.h))
+        self.img = img.reduce(factor) if factor > 1 else img
+
+    def draw(self, strip, strip_top):
+        # output pixels of this element that land inside the strip (and the image)
+        left = max(0, math.floor(self.x))
+        right = min(strip.width, math.ceil(self.x + self.w))
+        top = max(strip_top, math.floor(self.y))
+        bottom = min(strip_top + strip.height, math.ceil(self.y + self.h))
+        if left >= right or top >= bottom:
+            return
+
+        # ...and the matching region of the source picture, so only that part gets resized
+        sx, sy = self.img.width / self.w, self.img.height / self.h
+        source = (
+            max(0.0, (left - self.x) * sx),
+            max(0.0, (top - self.y) * sy),
+            min(self.img.width, (right - self.x) * sx),
+            min(self.img.height, (bottom - self.y) * sy),
+        )
+        piece = self.img.resize((right - left, bottom - top), Image.LANCZOS, box=source)
+        strip.alpha_composite(piece, (left, top - strip_top))
+
+
+def build_layers(design_data, box, scale):
+    layers = []
+    for el in design_data.get("elements", []):
+        if not isinstance(el, dict):
+            continue
+        try:
+            if el.get("type") == "text":
+                layers.append(TextLayer(el, scale, box))
+            elif el.get("type") == "image":
+                img = open_asset(el["asset"]) if el.get("asset") else open_element_image(el.get("src"))
+                if img is not None:
+                    layers.append(ImageLayer(el, scale, box, img))
+        except (TypeError, ValueError, OSError):
+            # same as the preview: skip a broken layer, print the rest
+            continue
+    return layers
+
+
+def render_strips(design_data, box):
+    """
+    Yields the export as RGBA strips (top to bottom), plus the full size first:
+    (width, height), strip, strip, ...
+    """
+    if isinstance(design_data, str):
+        design_data = parse_design_data(design_data)
+
+    width, height, scale = print_size(box)
+    layers = build_layers(design_data, box, scale)
+    yield width, height
+
+    strip_height = export_setting("STRIP_HEIGHT")
+    for strip_top in range(0, height, strip_height):
+        strip = Image.new("RGBA", (width, min(strip_height, height - strip_top)), (0, 0, 0, 0))
+        for layer in layers:
+            layer.draw(strip, strip_top)
+        yield strip
+
+
+def png_chunk(fh, kind, data):
+    fh.write(struct.pack(">I", len(data)))
+    fh.write(kind)
+    fh.write(data)
+    fh.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+
+def write_png(fh, width, height, strips, dpi):
+    """
+    Streams RGBA strips into an 8-bit RGBA PNG (Pillow can only save a whole image).
+    The pHYs chunk carries the DPI so print software picks up the physical size.
+    """
+    fh.write(b"\x89PNG\r\n\x1a\n")
+    png_chunk(fh, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    pixels_per_metre = round(dpi / 0.0254)
+    png_chunk(fh, b"pHYs", struct.pack(">IIB", pixels_per_metre, pixels_per_metre, 1))
+
+    compressor = zlib.compressobj(6)
+    row_bytes = width * 4
+    for strip in strips:
+        raw = strip.tobytes()
+        # every scanline starts with its filter type (0 = none)
+        data = b"".join(b"\x00" + raw[i:i + row_bytes] for i in range(0, len(raw), row_bytes))
+        compressed = compressor.compress(data)
+        if compressed:
+            png_chunk(fh, b"IDAT", compressed)
+    png_chunk(fh, b"IDAT", compressor.flush())
+    png_chunk(fh, b"IEND", b"")
+
+
+def export_design(design_id, design_data, box, force=False):
+    """
+    Renders one design's print file into storage (unless this version already exists).
+    Takes plain values, not model instances, so it can run in a pool worker without
+    touching the database. Returns (design_id, storage name, rendered?).
+    """
+    name = export_name(design_id, design_data, box)
+    if not force and default_storage.exists(name):
+        return design_id, name, False
+
+    strips = render_strips(design_data, box)
+    width, height = next(strips)
+    with tempfile.TemporaryFile() as tmp:
+        write_png(tmp, width, height, strips, export_setting("DPI"))
+        tmp.seek(0)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, File(tmp, name=os.path.basename(name)))
+
+    return design_id, name, True
+
+
+def init_pool_worker():
+    """ProcessPoolExecutor initializer: with the spawn start method (macOS/Windows)
+    the child starts without Django set up."""
+    if not apps.ready:
+        django.setup()
+
+
+def copy_export(name, folder):
+    """Copies an export out of storage into a plain folder (for handing to the printer)."""
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, name[len(EXPORT_ROOT) + 1:].replace("/", "_"))
+    with default_storage.open(name, "rb") as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return target
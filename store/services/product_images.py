@@ -0,0 +1,124 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from store.models import Product
+from store.services import media_refs
+from store.services.design_renderer import CANVAS_H, CANVAS_W
+
+# Staff sometimes upload straight-off-the-camera photos; nothing on the site
+# is ever shown bigger than this, so anything larger is shrunk once in the background.
+MAX_ORIGINAL_EDGE = 2000
+
+
+def shrink_oversized(field, max_edge=MAX_ORIGINAL_EDGE):
+    """
+    Re-encodes the file behind an ImageField if its longest side is over max_edge.
+    Keeps the original format (PNG stays PNG so template transparency survives).
+    Returns (old_name, new_name), or None if nothing had to change.
+    """
+    if not field:
+        return None
+
+    with field.open("rb") as fh:
+        img = Image.open(fh)
+        img.load()
+
+    if max(img.size) <= max_edge:
+        return None
+
+    fmt = img.format or "PNG"
+    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    out = io.BytesIO()
+    img.save(out, format=fmt, optimize=True)
+
+    old_name = field.name
+    field.save(os.path.basename(old_name), ContentFile(out.getvalue()), save=False)
+    # content-addressed blobs are never deleted here (gc_media does it once unreferenced)
+    field.storage.delete(old_name)
+    return old_name, field.name
+
+
+def canvas_template_png(field):
+    """
+    The template image at exactly CANVAS_W x CANVAS_H, as an optimized PNG (bytes).
+    Same stretch the customiser's drawImage used to do in the browser, so print_* boxes
+    keep meaning the same pixels. Templates without any see-through pixels lose the alpha channel.
+    """
+    with field.open("rb") as fh:
+        img = Image.open(fh)
+        img.load()
+
+    img = img.convert("RGBA")
+    if img.size != (CANVAS_W, CANVAS_H):
+        img = img.resize((CANVAS_W, CANVAS_H), Image.LANCZOS)
+    if img.getchannel("A").getextrema()[0] == 255:
+        img = img.convert("RGB")
+
+    out = io.BytesIO()
+    img.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def update_canvas_template(product):
+    """
+    (Re)builds product.template_canvas from template_image. Returns the changed columns.
+    Content-addressed, so re-running it for the same template lands on the same blob.
+    """
+    field = product.template_canvas
+    old_name = field.name or ""
+
+    if not product.template_image:
+        if not old_name:
+            return {}
+        media_refs.decref(old_name)
+        return {"template_canvas": None}
+
+    field.save("canvas.png", ContentFile(canvas_template_png(product.template_image)), save=False)
+    media_refs.replace(old_name, field.name)
+    return {"template_canvas": field.name}
+
+
+def print_box_error(x, y, w, h):
+    """
+    Why a print_* box doesn't fit the CANVAS_W x CANVAS_H canvas, or None if it's fine.
+    Every template is stretched to the canvas, so its uploaded size doesn't matter here.
+    """
+    if w <= 0 or h <= 0:
+        return "Print area width and height must be more than 0."
+    if x < 0 or y < 0 or x + w > CANVAS_W or y + h > CANVAS_H:
+        return (
+            f"Print area ({x}, {y}, {w} x {h}) must fit inside the {CANVAS_W} x {CANVAS_H} canvas: "
+            f"print_x + print_w <= {CANVAS_W}, print_y + print_h <= {CANVAS_H}."
+        )
+    return None
+
+
+def process_product_images(product):
+    """
+    Post-upload work for a product's image + template_image (shrinks oversized uploads
+    and builds template_canvas, so the customiser never has to scale the template).
+    Only the changed columns are written (update(), not save()) so a staff edit
+    happening at the same time isn't overwritten by the background job.
+    update() skips signals, so blob reference counts are moved here by hand.
+    """
+    changes = {}
+
+    for field_name in ("image", "template_image"):
+        renamed = shrink_oversized(getattr(product, field_name))
+        if renamed:
+            old_name, new_name = renamed
+            changes[field_name] = new_name
+            media_refs.replace(old_name, new_name)
+
+    changes.update(update_canvas_template(product))
+
+    if changes:
+        Product.objects.filter(id=product.id).update(**changes)
+
+    return changes
@@ -0,0 +1,88 @@
+"""
+The querysets views run on every hit, in one place.
+query_audit EXPLAINs these same functions (not copies of them), so a view that
+changes its query changes what `manage.py explain_queries` checks too.
+Querysets owned by a service live there instead (order_service.cart_designs,
+stats.daily_rows, job_queue.due_jobs, keyset.page_query).
+"""
+from django.contrib.auth.models import User
+
+from store.models import Design, Order, OrderItem, Product
+
+
+# ---- storefront ----
+
+def featured_products():
+    return Product.objects.order_by("-created_at")[:4]
+
+
+def shop_products():
+    return Product.objects.order_by("-created_at")
+
+
+def user_designs(user_id):
+    # the design documents aren't shown in lists, so don't load (and decompress) them
+    return (
+        Design.objects.filter(user_id=user_id, is_draft=False)
+        .select_related("product")
+        .defer("design_data")
+        .order_by("-created_at")
+    )
+
+
+def open_draft(user_id, product_id):
+    """Newest autosaved draft of a product (the view takes .first())."""
+    return (
+        Design.objects.filter(user_id=user_id, product_id=product_id, is_draft=True)
+        .only("id", "revision", "design_data")
+        .order_by("-created_at")
+    )
+
+
+# ---- admin ----
+# (lists are paged with services/keyset.py on top of these)
+
+def admin_products():
+    return Product.objects.all()
+
+
+def admin_orders():
+    return Order.objects.all()
+
+
+def recent_orders():
+    return Order.objects.order_by("-created_at")[:5]
+
+
+def order_items(order_id):
+    # the design copies aren't shown, only the design's preview
+    return (
+        OrderItem.objects.filter(order_id=order_id)
+        .select_related("product", "design")
+        .defer("design_data", "design__design_data")
+    )
+
+
+def admin_designs():
+    return Design.objects.filter(is_draft=False).select_related("user", "product").defer("design_data")
+
+
+def admin_users():
+    return User.objects.all()
+
+
+# ---- print files (manage.py export_print_files) ----
+
+def paid_design_items():
+    """
+    Design lines on PAID orders, with the product's print box. One join (order status
+    index -> order lines -> design/product); the copy taken at checkout is what gets printed.
+    Not sorted: export_print_files de-duplicates the designs itself, and sorting by
+    design would need a temp B-tree over every paid line.
+    """
+    return (
+        OrderItem.objects
+        .filter(order__status="PAID", design__isnull=False)
+        .select_related("product")
+        .only("design_id", "design_data", "product__print_x", "product__print_y", "product__print_w", "product__print_h")
+    )
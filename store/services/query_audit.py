@@ -0,0 +1,101 @@
+import re
+from datetime import timedelta
+
+from django.utils import timezone
+
+from store.forms import OrderFilterForm
+from store.models import Product
+from store.services import queries
+from store.services.job_queue import due_jobs
+from store.services.keyset import page_query
+from store.services.order_service import cart_designs
+from store.services.stats import daily_rows, stats_row
+
+# Plan lines that mean "reads the whole table" (SQLite / PostgreSQL).
+# SQLite prints "SCAN t USING [COVERING] INDEX ..." for an index walk, which is fine.
+FULL_SCAN_PATTERNS = [
+    re.compile(r"\bSCAN (?!.*\bUSING\b.*\bINDEX\b)(\S+)"),
+    re.compile(r"\bSeq Scan on (\S+)"),
+]
+# Sorting rows after reading them (no index provides the order)
+SORT_PATTERNS = [
+    re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+]
+
+
+def hot_queries():
+    """
+    The queries each view runs on every hit, from the same helpers the views call
+    (services/queries.py and friends), so this can't drift from what really runs.
+    (label, queryset, allow_scan) - allow_scan marks queries that read everything on
+    purpose (e.g. the full shop list), so they aren't reported.
+    The ids/dates are placeholders; EXPLAIN only cares about the shape of the query.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    cursor = (now, 1)  # ?after=<cursor>: the next page of a list
+    orders_by_status = OrderFilterForm({"status": "PAID"}).filter(queries.admin_orders())
+    orders_by_status_and_dates = OrderFilterForm({
+        "status": "PAID", "date_from": today - timedelta(days=30), "date_to": today,
+    }).filter(queries.admin_orders())
+
+    return [
+        ("home: featured products", queries.featured_products(), False),
+        ("shop: product grid", queries.shop_products(), True),
+        ("product_detail", Product.objects.filter(id=1), False),
+        # price_cart uses in_bulk(), which is this query
+        ("cart/checkout: price cart", Product.objects.filter(id__in=[1, 2, 3]), False),
+        ("cart/checkout: price designs", cart_designs().filter(id__in=[1, 2]), False),
+        ("my_designs", queries.user_designs(1), False),
+        ("customise: open draft", queries.open_draft(1, 1)[:1], False),
+
+        ("admin dashboard: counters", stats_row(), False),
+        ("admin dashboard: daily chart", daily_rows(today - timedelta(days=13), today), False),
+        ("admin dashboard: recent orders", queries.recent_orders(), False),
+        ("admin orders list", page_query(queries.admin_orders()), False),
+        ("admin orders list: next page", page_query(queries.admin_orders(), after=cursor), False),
+        ("admin orders list: by status", page_query(orders_by_status), False),
+        ("admin orders list: status + dates", page_query(orders_by_status_and_dates), False),
+        ("admin order detail: items", queries.order_items(1), False),
+        ("admin products list", page_query(queries.admin_products()), False),
+        ("admin designs list", page_query(queries.admin_designs()), False),
+        ("admin users list", page_query(queries.admin_users(), field="date_joined"), False),
+
+        ("print export: designs on paid orders", queries.paid_design_items(), False),
+        ("job worker: claim next", due_jobs(now), False),
+    ]
+
+
+def explain(queryset):
+    """Query plan text (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL)."""
+    return queryset.explain()
+
+
+def find_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        for pattern in FULL_SCAN_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                problems.append(f"full scan of {match.group(1)}")
+        for pattern in SORT_PATTERNS:
+            if pattern.search(line):
+                problems.append("sorts rows without an index")
+    return problems
+
+
+def audit():
+    """
+    Runs EXPLAIN on every hot query.
+    Returns a list of {"label", "plan", "problems", "allowed"} dicts.
+    """
+    results = []
+    for label, queryset, allow_scan in hot_queries():
+        plan = explain(queryset)
+        results.append({
+            "label": label,
+            "plan": plan,
+            "problems": find_problems(plan),
+            "allowed": allow_scan,
+        })
+    return results
@@ -0,0 +1,199 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store.models import DailyStats, Design, Order, Product, StoreStats
+
+# Orders in these statuses count towards revenue
+PAID_STATUSES = ("PAID", "SHIPPED")
+
+STATUS_FIELDS = {
+    "PENDING": "pending_count",
+    "PAID": "paid_count",
+    "SHIPPED": "shipped_count",
+}
+
+STATS_ID = 1
+
+
+# ----------------------------
+# INCREMENTAL UPDATES
+# ----------------------------
+
+def bump(**deltas):
+    """
+    Adds deltas to the StoreStats row in a single UPDATE (F() so concurrent
+    requests can't lose each other's increments).
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    updated = StoreStats.objects.filter(id=STATS_ID).update(**{k: F(k) + v for k, v in deltas.items()})
+    if not updated:
+        # row missing (fresh database): rebuild it from the real tables instead
+        reconcile_totals()
+
+
+def bump_day(day, **deltas):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    changes = {k: F(k) + v for k, v in deltas.items()}
+    if not DailyStats.objects.filter(date=day).update(**changes):
+        # first event of the day: start the bucket at zero (ignore_conflicts = no race
+        # with another request doing the same), then apply the change
+        DailyStats.objects.bulk_create([DailyStats(date=day)], ignore_conflicts=True)
+        DailyStats.objects.filter(date=day).update(**changes)
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def revenue_of(status, amount):
+    return Decimal(amount or 0) if status in PAID_STATUSES else Decimal("0")
+
+
+def order_created(order):
+    revenue = revenue_of(order.status, order.total_amount)
+    deltas = {"order_count": 1, "revenue": revenue}
+    if order.status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[order.status]] = 1
+    bump(**deltas)
+    bump_day(order_day(order), orders=1, revenue=revenue)
+
+
+def order_status_changed(order, old_status):
+    if old_status == order.status:
+        return
+    revenue = revenue_of(order.status, order.total_amount) - revenue_of(old_status, order.total_amount)
+    deltas = {"revenue": revenue}
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] = -1
+    if order.status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[order.status]] = deltas.get(STATUS_FIELDS[order.status], 0) + 1
+    bump(**deltas)
+    bump_day(order_day(order), revenue=revenue)
+
+
+def order_deleted(order, status):
+    revenue = revenue_of(status, order.total_amount)
+    deltas = {"order_count": -1, "revenue": -revenue}
+    if status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[status]] = -1
+    bump(**deltas)
+    bump_day(order_day(order), orders=-1, revenue=-revenue)
+
+
+def design_created(design):
+    bump(design_count=1)
+    bump_day(timezone.localdate(design.created_at), designs=1)
+
+
+def design_deleted(design):
+    bump(design_count=-1)
+    bump_day(timezone.localdate(design.created_at), designs=-1)
+
+
+def user_created(user):
+    bump(user_count=1)
+    bump_day(timezone.localdate(user.date_joined), new_users=1)
+
+
+def user_deleted(user):
+    bump(user_count=-1)
+    bump_day(timezone.localdate(user.date_joined), new_users=-1)
+
+
+# ----------------------------
+# READING
+# ----------------------------
+
+def stats_row():
+    return StoreStats.objects.filter(id=STATS_ID)
+
+
+def daily_rows(start, end):
+    return DailyStats.objects.filter(date__gte=start, date__lte=end)
+
+
+def get_stats():
+    stats = stats_row().first()
+    return stats or reconcile_totals()
+
+
+def daily_series(days=14):
+    """Last `days` days (oldest first), with zero rows filled in for quiet days."""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {row.date: row for row in daily_rows(start, today)}
+
+    series = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        series.append(rows.get(day) or DailyStats(date=day))
+    return series
+
+
+# ----------------------------
+# RECONCILIATION (the source of truth is always the raw tables)
+# ----------------------------
+
+def reconcile_totals():
+    """Recomputes StoreStats from the raw tables (a few full scans - run it off-peak)."""
+    by_status = dict(Order.objects.values_list("status").annotate(n=Count("id")))
+    revenue = Order.objects.filter(status__in=PAID_STATUSES).aggregate(total=Sum("total_amount"))["total"]
+
+    values = {
+        "product_count": Product.objects.count(),
+        "order_count": sum(by_status.values()),
+        "design_count": Design.objects.filter(is_draft=False).count(),
+        "user_count": User.objects.count(),
+        "revenue": revenue or Decimal("0"),
+        "reconciled_at": timezone.now(),
+    }
+    for status, field in STATUS_FIELDS.items():
+        values[field] = by_status.get(status, 0)
+
+    stats, _ = StoreStats.objects.update_or_create(id=STATS_ID, defaults=values)
+    return stats
+
+
+def reconcile_days(start, end):
+    """Rebuilds the DailyStats rows for start..end (inclusive)."""
+    # datetime bounds (not __date) so the created_at/date_joined indexes are used
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+    def per_day(queryset, date_field, **aggregates):
+        return {
+            row["day"]: row
+            for row in queryset.filter(**{f"{date_field}__gte": since, f"{date_field}__lt": until})
+            .annotate(day=TruncDate(date_field))
+            .values("day")
+            .annotate(**aggregates)
+        }
+
+    orders = per_day(
+        Order.objects.all(), "created_at",
+        n=Count("id"),
+        revenue=Sum("total_amount", filter=Q(status__in=PAID_STATUSES)),
+    )
+    designs = per_day(Design.objects.filter(is_draft=False), "created_at", n=Count("id"))
+    users = per_day(User.objects.all(), "date_joined", n=Count("id"))
+
+    with transaction.atomic():
+        day = start
+        while day <= end:
+            DailyStats.objects.update_or_create(date=day, defaults={
+                "orders": orders.get(day, {}).get("n", 0),
+                "revenue": orders.get(day, {}).get("revenue") or Decimal("0"),
+                "designs": designs.get(day, {}).get("n", 0),
+                "new_users": users.get(day, {}).get("n", 0),
+            })
+            day += timedelta(days=1)
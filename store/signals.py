@@ -0,0 +1,180 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .models import Design, Order, OrderItem, Product
+from .services import media_refs, stats
+from .services.catalogue_cache import bump_catalogue_version
+from .services.print_export import delete_exports
+
+
+# ----------------------------
+# MEDIA REFERENCE COUNTS
+# ----------------------------
+# Every model with a content-addressed ImageField keeps MediaBlob.refcount in sync,
+# so `manage.py gc_media` knows which blobs are safe to remove.
+
+def remember_file_names(sender, instance, **kwargs):
+    # read __dict__ directly so deferred fields aren't loaded just for this
+    instance._media_names = {}
+    for name in sender._media_fields:
+        if name in instance.__dict__:
+            value = instance.__dict__[name]
+            instance._media_names[name] = getattr(value, "name", value) or ""
+
+
+def update_file_refs(sender, instance, update_fields=None, **kwargs):
+    old_names = getattr(instance, "_media_names", {})
+    for name in sender._media_fields:
+        if update_fields is not None and name not in update_fields:
+            continue
+        new_name = getattr(instance, name).name or ""
+        media_refs.replace(old_names.get(name, ""), new_name)
+    remember_file_names(sender, instance)
+
+
+def release_file_refs(sender, instance, **kwargs):
+    for name in sender._media_fields:
+        media_refs.decref(getattr(instance, name).name or "")
+
+
+def connect_media_signals():
+    by_model = {}
+    for model, field_name in media_refs.tracked_fields():
+        by_model.setdefault(model, []).append(field_name)
+
+    for model, field_names in by_model.items():
+        model._media_fields = field_names
+        post_init.connect(remember_file_names, sender=model, dispatch_uid=f"media_init_{model.__name__}")
+        post_save.connect(update_file_refs, sender=model, dispatch_uid=f"media_save_{model.__name__}")
+        post_delete.connect(release_file_refs, sender=model, dispatch_uid=f"media_delete_{model.__name__}")
+
+
+# Pictures inside design documents aren't ImageFields: Design.assets lists them instead.
+
+def remember_design_assets(sender, instance, **kwargs):
+    instance._asset_names = list(instance.__dict__.get("assets") or [])
+
+
+def update_design_assets(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and "assets" not in update_fields:
+        return
+    # a new row starts with no references (post_init already saw the assets passed in)
+    old = Counter() if created else Counter(instance._asset_names)
+    new = Counter(instance.assets)
+    # batched, so a design with many pictures costs the same few queries as one with one
+    media_refs.incref_many((new - old).elements())
+    media_refs.decref_many((old - new).elements())
+    instance._asset_names = list(instance.assets)
+
+
+def release_design_assets(sender, instance, **kwargs):
+    media_refs.decref_many(instance._asset_names)
+
+
+post_init.connect(remember_design_assets, sender=Design, dispatch_uid="media_init_design_assets")
+post_save.connect(update_design_assets, sender=Design, dispatch_uid="media_save_design_assets")
+post_delete.connect(release_design_assets, sender=Design, dispatch_uid="media_delete_design_assets")
+
+
+# Ordered lines keep their own copy of the design (OrderItem.design_assets). They're
+# created with bulk_create (order_service counts those references), only deletes come here.
+
+def release_order_item_assets(sender, instance, **kwargs):
+    media_refs.decref_many(instance.design_assets)
+
+
+post_delete.connect(release_order_item_assets, sender=OrderItem, dispatch_uid="media_delete_order_item_assets")
+
+
+# Print exports (manage.py export_print_files) aren't CAS blobs, they belong to one design.
+
+def delete_print_exports(sender, instance, **kwargs):
+    delete_exports(instance.id)
+
+
+post_delete.connect(delete_print_exports, sender=Design, dispatch_uid="media_delete_print_exports")
+
+
+# ----------------------------
+# CATALOGUE CACHE
+# ----------------------------
+# home/shop/product_detail fragments are cached per catalogue version;
+# any product change bumps the version so every cached fragment goes stale at once.
+
+def invalidate_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+
+
+post_save.connect(invalidate_catalogue, sender=Product, dispatch_uid="catalogue_product_save")
+post_delete.connect(invalidate_catalogue, sender=Product, dispatch_uid="catalogue_product_delete")
+
+
+# ----------------------------
+# DASHBOARD STATS
+# ----------------------------
+# StoreStats/DailyStats are updated in the same transaction as the change itself;
+# `manage.py reconcile_stats` rebuilds them from the raw tables if they ever drift.
+
+def remember_order_status(sender, instance, **kwargs):
+    instance._stats_status = instance.__dict__.get("status")
+
+
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.order_created(instance)
+    else:
+        stats.order_status_changed(instance, getattr(instance, "_stats_status", instance.status))
+    instance._stats_status = instance.status
+
+
+def order_deleted(sender, instance, **kwargs):
+    stats.order_deleted(instance, getattr(instance, "_stats_status", instance.status))
+
+
+def product_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(product_count=1)
+
+
+def product_deleted(sender, instance, **kwargs):
+    stats.bump(product_count=-1)
+
+
+# drafts aren't counted until they're saved for real (is_draft True -> False)
+def remember_design_draft(sender, instance, **kwargs):
+    instance._stats_draft = instance.__dict__.get("is_draft", False)
+
+
+def design_saved(sender, instance, created, **kwargs):
+    was_draft = True if created else getattr(instance, "_stats_draft", False)
+    if was_draft and not instance.is_draft:
+        stats.design_created(instance)
+    instance._stats_draft = instance.is_draft
+
+
+def design_deleted(sender, instance, **kwargs):
+    if not instance.__dict__.get("is_draft", False):
+        stats.design_deleted(instance)
+
+
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.user_created(instance)
+
+
+def user_deleted(sender, instance, **kwargs):
+    stats.user_deleted(instance)
+
+
+post_init.connect(remember_order_status, sender=Order, dispatch_uid="stats_order_init")
+post_save.connect(order_saved, sender=Order, dispatch_uid="stats_order_save")
+post_delete.connect(order_deleted, sender=Order, dispatch_uid="stats_order_delete")
+post_save.connect(product_saved, sender=Product, dispatch_uid="stats_product_save")
+post_delete.connect(product_deleted, sender=Product, dispatch_uid="stats_product_delete")
+post_init.connect(remember_design_draft, sender=Design, dispatch_uid="stats_design_init")
+post_save.connect(design_saved, sender=Design, dispatch_uid="stats_design_save")
+post_delete.connect(design_deleted, sender=Design, dispatch_uid="stats_design_delete")
+post_save.connect(user_saved, sender=User, dispatch_uid="stats_user_save")
+post_delete.connect(user_deleted, sender=User, dispatch_uid="stats_user_delete")
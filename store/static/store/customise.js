@@ -19,12 +19,14 @@ const bringFrontBtn = document.getElementById("bringFrontBtn");
 
 const saveForm = document.getElementById("saveForm");
 const designDataField = document.getElementById("designData");
-const previewField = document.getElementById("previewDataUrl");
 const sizeSelect = document.getElementById("sizeSelect");
 const sizeField = document.getElementById("sizeField");
 
-// Elements on canvas
+const { hitResizeHandle, SpatialGrid, TextFitter } = window.DesignGeometry; // geometry.js
+
+// Elements on canvas (in drawing order; the grid finds them by position)
 const elements = [];
+const grid = new SpatialGrid();
 let selectedId = null;
 
 // Drag / resize state
@@ -42,7 +44,8 @@ const templateImg = new Image();
 templateImg.src = templateUrl;
 
 templateImg.onload = () => {
-  draw();
+  renderBackground();
+  invalidateAll();
 };
 
 // -------------------------
@@ -73,37 +76,29 @@ function clampToPrintArea(el) {
   el.y = clamp(el.y, printArea.y, printArea.y + printArea.h - el.h);
 }
 
-// checks if point is inside element box
-function hitTest(el, x, y) {
-  return x >= el.x && x <= el.x + el.w && y >= el.y && y <= el.y + el.h;
-}
-
-// resize handle = bottom-right corner square
-function hitResizeHandle(el, x, y) {
-  const size = 14;
-  const hx = el.x + el.w - size;
-  const hy = el.y + el.h - size;
-  return x >= hx && x <= hx + size && y >= hy && y <= hy + size;
-}
-
-// Measure text properly (Django-level “realistic” sizing)
-function measureTextBox(el) {
+// Size of the text alone at a font size (TextFitter caches these)
+function measureText(text, size) {
   ctx.save();
-  ctx.font = `${el.fontSize}px Arial`;
+  ctx.font = `${size}px Arial`;
 
   // Width is safe from measureText
-  const metrics = ctx.measureText(el.text);
-  const textW = metrics.width;
+  const metrics = ctx.measureText(text);
 
   // Height is trickier; use actual bounding box if available
-  const ascent = metrics.actualBoundingBoxAscent ?? el.fontSize * 0.8;
-  const descent = metrics.actualBoundingBoxDescent ?? el.fontSize * 0.2;
-  const textH = ascent + descent;
-
-  el.w = Math.max(60, Math.ceil(textW + TEXT_PAD * 2));
-  el.h = Math.max(40, Math.ceil(textH + TEXT_PAD * 2));
+  const ascent = metrics.actualBoundingBoxAscent ?? size * 0.8;
+  const descent = metrics.actualBoundingBoxDescent ?? size * 0.2;
 
   ctx.restore();
+  return { w: metrics.width, h: ascent + descent };
+}
+
+const textFitter = new TextFitter(measureText, { pad: TEXT_PAD, minSize: 10, maxSize: 160 });
+
+// Measure text properly (Django-level “realistic” sizing)
+function measureTextBox(el) {
+  const box = textFitter.box(el.text, el.fontSize);
+  el.w = Math.max(60, Math.ceil(box.w));
+  el.h = Math.max(40, Math.ceil(box.h));
 
   // Keep it inside after measurement
   clampToPrintArea(el);
@@ -116,40 +111,51 @@ function centreInPrintArea(el) {
   clampToPrintArea(el);
 }
 
-// Maximum font size that still fits print area width
+// Maximum font size that still fits the print area (binary search, cached measurements)
 function maxFontSizeForText(text) {
-  // We do a quick search from big -> small
-  const maxTry = 160;
-  const minTry = 10;
-
-  for (let size = maxTry; size >= minTry; size--) {
-    ctx.save();
-    ctx.font = `${size}px Arial`;
-    const m = ctx.measureText(text);
-    const w = m.width + TEXT_PAD * 2;
-
-    const ascent = m.actualBoundingBoxAscent ?? size * 0.8;
-    const descent = m.actualBoundingBoxDescent ?? size * 0.2;
-    const h = (ascent + descent) + TEXT_PAD * 2;
-
-    ctx.restore();
-
-    if (w <= printArea.w && h <= printArea.h) return size;
-  }
-
-  return minTry;
+  return textFitter.maxFontSize(text, printArea.w, printArea.h);
 }
 
 // -------------------------
-// Drawing
+// Drawing (two layers + dirty rectangles)
 // -------------------------
-function drawPrintArea() {
-  ctx.save();
-  ctx.setLineDash([8, 6]);
-  ctx.strokeStyle = "#2b67ff";
-  ctx.lineWidth = 2;
-  ctx.strokeRect(printArea.x, printArea.y, printArea.w, printArea.h);
-  ctx.restore();
+// The template and print-area guide never change while editing, so they're drawn
+// once onto an offscreen canvas (backgroundLayer) and copied back from there.
+// Changes don't draw straight away: they mark a rectangle dirty and the next
+// animation frame repaints only that rectangle (background copy + the elements
+// that overlap it). Ten mousemoves between two frames = one repaint.
+const backgroundLayer = document.createElement("canvas");
+backgroundLayer.width = canvas.width;
+backgroundLayer.height = canvas.height;
+const backgroundCtx = backgroundLayer.getContext("2d");
+
+// room around an element's box for the selection outline / text that pokes out
+const DIRTY_PAD = 4;
+
+let dirtyRect = null;       // {x, y, w, h} to repaint on the next frame
+let frameRequested = false;
+
+function drawPrintArea(c) {
+  c.save();
+  c.setLineDash([8, 6]);
+  c.strokeStyle = "#2b67ff";
+  c.lineWidth = 2;
+  c.strokeRect(printArea.x, printArea.y, printArea.w, printArea.h);
+  c.restore();
+}
+
+function renderBackground() {
+  backgroundCtx.clearRect(0, 0, backgroundLayer.width, backgroundLayer.height);
+  if (templateImg.complete && templateImg.naturalWidth) {
+    // the server hands out a canvas-sized copy (Product.template_canvas): drawn 1:1.
+    // Only a template uploaded moments ago (not processed yet) still needs scaling.
+    if (templateImg.naturalWidth === backgroundLayer.width && templateImg.naturalHeight === backgroundLayer.height) {
+      backgroundCtx.drawImage(templateImg, 0, 0);
+    } else {
+      backgroundCtx.drawImage(templateImg, 0, 0, backgroundLayer.width, backgroundLayer.height);
+    }
+  }
+  drawPrintArea(backgroundCtx);
 }
 
 function drawElement(el) {
@@ -182,21 +188,92 @@ function drawElement(el) {
   }
 }
 
-function draw() {
-  ctx.clearRect(0, 0, canvas.width, canvas.height);
+// Whole-pixel rectangle an element can paint into, clipped to the canvas
+function elementBounds(el) {
+  const x = Math.max(0, Math.floor(el.x - DIRTY_PAD));
+  const y = Math.max(0, Math.floor(el.y - DIRTY_PAD));
+  const right = Math.min(canvas.width, Math.ceil(el.x + el.w + DIRTY_PAD));
+  const bottom = Math.min(canvas.height, Math.ceil(el.y + el.h + DIRTY_PAD));
+  return { x, y, w: Math.max(0, right - x), h: Math.max(0, bottom - y) };
+}
+
+function unionRect(a, b) {
+  if (!a) return b;
+  const x = Math.min(a.x, b.x);
+  const y = Math.min(a.y, b.y);
+  return {
+    x, y,
+    w: Math.max(a.x + a.w, b.x + b.w) - x,
+    h: Math.max(a.y + a.h, b.y + b.h) - y,
+  };
+}
+
+function rectsOverlap(a, b) {
+  return a.x < b.x + b.w && b.x < a.x + a.w && a.y < b.y + b.h && b.y < a.y + a.h;
+}
+
+function requestFrame() {
+  if (frameRequested) return;
+  frameRequested = true;
+  requestAnimationFrame(renderFrame);
+}
+
+function invalidateRect(rect) {
+  if (rect.w <= 0 || rect.h <= 0) return;
+  dirtyRect = unionRect(dirtyRect, rect);
+  requestFrame();
+}
+
+// Call before AND after moving/resizing an element (old spot + new spot)
+function invalidateElement(el) {
+  if (el) invalidateRect(elementBounds(el));
+}
 
-  // background (template image)
-  ctx.drawImage(templateImg, 0, 0, canvas.width, canvas.height);
+function invalidateAll() {
+  invalidateRect({ x: 0, y: 0, w: canvas.width, h: canvas.height });
+}
+
+function renderFrame() {
+  frameRequested = false;
+  const rect = dirtyRect;
+  dirtyRect = null;
+  if (!rect) return;
+
+  ctx.save();
+  ctx.beginPath();
+  ctx.rect(rect.x, rect.y, rect.w, rect.h);
+  ctx.clip();
 
-  // print area guide
-  drawPrintArea();
+  ctx.clearRect(rect.x, rect.y, rect.w, rect.h);
+  ctx.drawImage(backgroundLayer, rect.x, rect.y, rect.w, rect.h, rect.x, rect.y, rect.w, rect.h);
 
-  // elements (in order)
+  // elements (in order), skipping the ones nowhere near the dirty area
   for (const el of elements) {
-    drawElement(el);
+    if (rectsOverlap(elementBounds(el), rect)) drawElement(el);
   }
+  ctx.restore();
 }
 
+// New element: on top of the others, selected
+function addElement(el) {
+  elements.push(el);
+  grid.insert(el);
+  select(el.id);
+  invalidateElement(el);
+  scheduleAutosave();
+}
+
+// Changes the selection, repainting the old and new selected element (their outlines)
+function select(id) {
+  if (id === selectedId) return;
+  invalidateElement(getSelected());
+  selectedId = id;
+  invalidateElement(getSelected());
+}
+
+renderBackground();
+invalidateAll();
+
 // -------------------------
 // Add Text
 // -------------------------
@@ -227,55 +304,151 @@ addTextBtn.addEventListener("click", () => {
   measureTextBox(el);
   centreInPrintArea(el);
 
-  selectedId = el.id;
-  elements.push(el);
-  draw();
+  addElement(el);
 });
 
 // -------------------------
 // Upload Image
 // -------------------------
-imageInput.addEventListener("change", (e) => {
+// A phone photo is 12+ MP, but the print file never needs more than the whole print
+// area at print DPI (upload.printWidth x printHeight) and the canvas only ever
+// shows it at print-area size. So the photo is decoded once, shrunk to those two
+// sizes and the full-size decode is dropped:
+// - el.img: the canvas-sized copy (what gets drawn)
+// - the print-sized copy is compressed and uploaded on its own straight away;
+//   the element only keeps the asset name the server returns (el.asset)
+const upload = JSON.parse(document.getElementById("designUpload").textContent); // {url, printWidth, printHeight, maxBytes, maxPixels, mediaUrl}
+const csrfToken = saveForm.querySelector("[name=csrfmiddlewaretoken]").value;
+
+// tried in order until one fits maxBytes (browsers that can't encode WebP give a PNG)
+const UPLOAD_ENCODINGS = [
+  ["image/webp", 0.9],
+  ["image/webp", 0.75],
+  ["image/jpeg", 0.85],
+  ["image/jpeg", 0.7],
+];
+
+// Size that fits inside maxW x maxH (and maxPixels), never bigger than the original
+function fitSize(w, h, maxW, maxH, maxPixels = Infinity) {
+  let scale = Math.min(1, maxW / w, maxH / h);
+  if (w * h * scale * scale > maxPixels) scale = Math.sqrt(maxPixels / (w * h));
+  return { w: Math.max(1, Math.floor(w * scale)), h: Math.max(1, Math.floor(h * scale)) };
+}
+
+async function decodeImage(file) {
+  if (window.createImageBitmap) {
+    return createImageBitmap(file, { imageOrientation: "from-image" });
+  }
+  // older browsers: decode through an <img>
+  const img = new Image();
+  img.src = URL.createObjectURL(file);
+  try {
+    await img.decode();
+  } finally {
+    URL.revokeObjectURL(img.src);
+  }
+  return img;
+}
+
+function scaledCopy(source, w, h) {
+  const copy = document.createElement("canvas");
+  copy.width = w;
+  copy.height = h;
+  const c = copy.getContext("2d");
+  c.imageSmoothingQuality = "high";
+  c.drawImage(source, 0, 0, w, h);
+  return copy;
+}
+
+function canvasToBlob(c, type, quality) {
+  return new Promise(resolve => c.toBlob(resolve, type, quality));
+}
+
+async function compressForUpload(c) {
+  try {
+    for (const [type, quality] of UPLOAD_ENCODINGS) {
+      const blob = await canvasToBlob(c, type, quality);
+      if (blob && blob.size <= upload.maxBytes) return blob;
+    }
+    throw new Error("Image is too big");
+  } finally {
+    // a print-sized canvas holds ~70 MB of pixels; let it go as soon as we're done
+    c.width = c.height = 0;
+  }
+}
+
+async function uploadAsset(blob) {
+  const body = new FormData();
+  body.append("image", blob, "upload");
+  const response = await fetch(upload.url, {
+    method: "POST",
+    body,
+    headers: { "X-CSRFToken": csrfToken },
+    credentials: "same-origin",
+  });
+  const data = await response.json().catch(() => ({}));
+  if (!response.ok || !data.asset) throw new Error(data.error || "Upload failed");
+  return data.asset;
+}
+
+function removeElement(el) {
+  const idx = elements.indexOf(el);
+  if (idx < 0) return;
+  invalidateElement(el);
+  elements.splice(idx, 1);
+  grid.remove(el);
+  if (selectedId === el.id) selectedId = null;
+  scheduleAutosave();
+}
+
+imageInput.addEventListener("change", async (e) => {
   const file = e.target.files?.[0];
+  // reset input so uploading same file again still triggers change
+  e.target.value = "";
   if (!file) return;
 
-  const reader = new FileReader();
-  reader.onload = () => {
-    const img = new Image();
-    img.onload = () => {
-      // Start size: fit nicely inside print area
-      const maxW = printArea.w * 0.9;
-      const maxH = printArea.h * 0.9;
-
-      // keep aspect ratio
-      let w = img.width;
-      let h = img.height;
-      const scale = Math.min(maxW / w, maxH / h, 1);
-      w = Math.max(MIN_BOX, Math.floor(w * scale));
-      h = Math.max(MIN_BOX, Math.floor(h * scale));
-
-      const el = {
-        id: crypto.randomUUID(),
-        type: "image",
-        img,
-        x: printArea.x + 20,
-        y: printArea.y + 20,
-        w,
-        h,
-      };
+  let source;
+  try {
+    source = await decodeImage(file);
+  } catch {
+    alert("Sorry, that file couldn't be read as an image.");
+    return;
+  }
+
+  const printSize = fitSize(source.width, source.height, upload.printWidth, upload.printHeight, upload.maxPixels);
+  const screenSize = fitSize(source.width, source.height, printArea.w, printArea.h);
+  const printCopy = scaledCopy(source, printSize.w, printSize.h);
+  const img = scaledCopy(source, screenSize.w, screenSize.h);
 
-      centreInPrintArea(el);
+  // Start size: fit nicely inside print area (keeps aspect ratio)
+  const start = fitSize(source.width, source.height, printArea.w * 0.9, printArea.h * 0.9);
+  source.close?.(); // frees the full-size bitmap now rather than at the next GC
 
-      selectedId = el.id;
-      elements.push(el);
-      draw();
-    };
-    img.src = reader.result;
+  const el = {
+    id: crypto.randomUUID(),
+    type: "image",
+    img,
+    asset: null,
+    x: printArea.x + 20,
+    y: printArea.y + 20,
+    w: Math.max(MIN_BOX, start.w),
+    h: Math.max(MIN_BOX, start.h),
   };
-  reader.readAsDataURL(file);
+  // saving waits for this (see the submit handler)
+  el.upload = compressForUpload(printCopy)
+    .then(uploadAsset)
+    .then(asset => {
+      el.asset = asset;
+      scheduleAutosave(); // pictures join the draft once they're uploaded
+    })
+    .catch(err => {
+      removeElement(el);
+      alert(`Sorry, that picture couldn't be uploaded (${err.message}).`);
+    });
 
-  // reset input so uploading same file again still triggers change
-  e.target.value = "";
+  centreInPrintArea(el);
+
+  addElement(el);
 });
 
 // -------------------------
@@ -284,43 +457,38 @@ imageInput.addEventListener("change", (e) => {
 canvas.addEventListener("mousedown", (evt) => {
   const { x, y } = getMousePos(evt);
 
-  for (let i = elements.length - 1; i >= 0; i--) {
-    const el = elements[i];
-
-    // Resize handle only works on selected element
-    if (el.id === selectedId && hitResizeHandle(el, x, y)) {
-      isResizing = true;
-      return;
-    }
-
-    if (hitTest(el, x, y)) {
-      selectedId = el.id;
-
-      isDragging = true;
-      dragOffsetX = x - el.x;
-      dragOffsetY = y - el.y;
+  // topmost element under the pointer (the grid only checks the ones in this cell)
+  const el = grid.topmostAt(x, y);
+  if (!el) {
+    select(null);
+    return;
+  }
 
-      draw();
-      return;
-    }
+  // Resize handle only works on selected element
+  if (el.id === selectedId && hitResizeHandle(el, x, y)) {
+    isResizing = true;
+    return;
   }
 
-  selectedId = null;
-  draw();
+  select(el.id);
+
+  isDragging = true;
+  dragOffsetX = x - el.x;
+  dragOffsetY = y - el.y;
 });
 
 canvas.addEventListener("mousemove", (evt) => {
   const el = getSelected();
-  if (!el) return;
+  if (!el || !(isDragging || isResizing)) return;
 
   const { x, y } = getMousePos(evt);
+  invalidateElement(el); // where it was
 
   if (isDragging) {
     el.x = x - dragOffsetX;
     el.y = y - dragOffsetY;
 
     clampToPrintArea(el);
-    draw();
   }
 
   if (isResizing) {
@@ -343,11 +511,14 @@ canvas.addEventListener("mousemove", (evt) => {
     }
 
     clampToPrintArea(el);
-    draw();
   }
+
+  grid.update(el);
+  invalidateElement(el); // where it is now
 });
 
 window.addEventListener("mouseup", () => {
+  if (isDragging || isResizing) scheduleAutosave();
   isDragging = false;
   isResizing = false;
 });
@@ -356,11 +527,8 @@ window.addEventListener("mouseup", () => {
 // Buttons: delete / bring to front
 // -------------------------
 deleteBtn.addEventListener("click", () => {
-  if (!selectedId) return;
-  const idx = elements.findIndex(e => e.id === selectedId);
-  if (idx >= 0) elements.splice(idx, 1);
-  selectedId = null;
-  draw();
+  const el = getSelected();
+  if (el) removeElement(el);
 });
 
 bringFrontBtn.addEventListener("click", () => {
@@ -370,29 +538,187 @@ bringFrontBtn.addEventListener("click", () => {
 
   const [picked] = elements.splice(idx, 1);
   elements.push(picked);
-  draw();
+  grid.raise(picked);
+  invalidateElement(picked);
+  scheduleAutosave();
 });
 
 // -------------------------
-// Save design (JSON + preview PNG)
+// Autosave (drafts)
 // -------------------------
-saveForm.addEventListener("submit", () => {
-  sizeField.value = sizeSelect.value;
-
-  const safeElements = elements.map(e => ({
+// A little after the last edit, the changes go to the server as a delta: only the
+// elements that changed since the last autosave (null = removed) plus the stacking
+// order if that changed. The first autosave creates the draft with the whole document.
+// Reloading the page carries on with the draft; Save turns it into the design.
+const drafts = JSON.parse(document.getElementById("designDrafts").textContent); // {createUrl, draft}
+const draftField = document.getElementById("draftField");
+const autosaveStatus = document.getElementById("autosaveStatus");
+const AUTOSAVE_DELAY = 1500; // ms after the last change
+
+let draft = null;         // {id, revision, url} once there is one
+let synced = new Map();   // element id -> JSON of it the server has
+let syncedOrder = "";     // JSON of the element order the server has
+let autosaveTimer = null;
+let autosaving = false;
+let autosaveAgain = false;
+
+function serializeElement(e) {
+  return {
     id: e.id,
     type: e.type,
     x: e.x, y: e.y, w: e.w, h: e.h,
     text: e.type === "text" ? e.text : null,
     fontSize: e.type === "text" ? e.fontSize : null,
     color: e.type === "text" ? e.color : null,
-    src: e.type === "image" ? e.img.src : null,
-  }));
+    asset: e.type === "image" ? e.asset : null,
+  };
+}
+
+// pictures only count once they're uploaded
+function savableElements() {
+  return elements.filter(e => e.type !== "image" || e.asset);
+}
+
+function setDraft(info) {
+  draft = info;
+  draftField.value = info ? info.id : "";
+}
+
+function scheduleAutosave() {
+  clearTimeout(autosaveTimer);
+  autosaveTimer = setTimeout(autosave, AUTOSAVE_DELAY);
+}
+
+// {changed: {id: json or null}, order: json}, compared with what the server has
+function pendingChanges() {
+  const current = savableElements();
+  const changed = {};
+  for (const e of current) {
+    const json = JSON.stringify(serializeElement(e));
+    if (synced.get(e.id) !== json) changed[e.id] = json;
+  }
+  const ids = new Set(current.map(e => e.id));
+  for (const id of synced.keys()) {
+    if (!ids.has(id)) changed[id] = null;
+  }
+  return { changed, order: JSON.stringify(current.map(e => e.id)) };
+}
+
+async function sendJSON(url, method, body) {
+  const response = await fetch(url, {
+    method,
+    body: JSON.stringify(body),
+    headers: { "Content-Type": "application/json", "X-CSRFToken": csrfToken },
+    credentials: "same-origin",
+  });
+  const data = await response.json().catch(() => ({}));
+  return { status: response.status, ok: response.ok, data };
+}
+
+async function autosave() {
+  autosaveTimer = null;
+  if (autosaving) {
+    autosaveAgain = true; // one request at a time
+    return;
+  }
+  const { changed, order } = pendingChanges();
+  if (!Object.keys(changed).length && order === syncedOrder) return;
+
+  autosaving = true;
+  autosaveStatus.textContent = "Saving draft…";
+  try {
+    await pushChanges(changed, order);
+  } catch (err) {
+    autosaveStatus.textContent = "Couldn't save the draft, will try again after your next change.";
+  } finally {
+    autosaving = false;
+    if (autosaveAgain) {
+      autosaveAgain = false;
+      autosave();
+    }
+  }
+}
+
+async function pushChanges(changed, order) {
+  let result;
+  if (!draft) {
+    const els = JSON.parse(order).map(id => JSON.parse(changed[id]));
+    result = await sendJSON(drafts.createUrl, "POST", { version: 2, printArea, elements: els });
+    if (!result.ok) throw new Error(result.data.error || "Autosave failed");
+    setDraft(result.data);
+  } else {
+    const delta = { base: draft.revision, elements: {} };
+    for (const [id, json] of Object.entries(changed)) delta.elements[id] = json && JSON.parse(json);
+    if (order !== syncedOrder) delta.order = JSON.parse(order);
+
+    result = await sendJSON(draft.url, "PATCH", delta);
+    if (result.status === 409 || result.status === 404) {
+      // changed (or saved) in another tab: send everything again, on top of what's there
+      if (result.status === 409) draft.revision = result.data.revision;
+      else setDraft(null);
+      synced = new Map();
+      syncedOrder = "";
+      autosaveAgain = true;
+      return;
+    }
+    if (!result.ok) throw new Error(result.data.error || "Autosave failed");
+    draft.revision = result.data.revision;
+  }
+
+  for (const [id, json] of Object.entries(changed)) {
+    if (json === null) synced.delete(id);
+    else synced.set(id, json);
+  }
+  syncedOrder = order;
+  autosaveStatus.textContent = "Draft saved";
+}
+
+// Puts an autosaved draft back on the canvas (pictures come from their uploaded assets)
+function restoreDraft(saved) {
+  for (const data of saved.document.elements) {
+    const el = { ...data, id: data.id || crypto.randomUUID() };
+    if (el.type === "image") {
+      el.img = null;
+      const img = new Image();
+      img.onload = () => {
+        const size = fitSize(img.width, img.height, printArea.w, printArea.h);
+        el.img = scaledCopy(img, size.w, size.h);
+        invalidateElement(el);
+      };
+      img.src = upload.mediaUrl + el.asset;
+    }
+    elements.push(el);
+    grid.insert(el);
+    invalidateElement(el);
+  }
+  setDraft({ id: saved.id, revision: saved.revision, url: saved.url });
+  for (const el of savableElements()) synced.set(el.id, JSON.stringify(serializeElement(el)));
+  syncedOrder = JSON.stringify(savableElements().map(e => e.id));
+  autosaveStatus.textContent = "Carrying on with your autosaved draft.";
+}
+
+if (drafts.draft) restoreDraft(drafts.draft);
+
+// -------------------------
+// Save design (JSON only - the server renders the preview)
+// -------------------------
+saveForm.addEventListener("submit", async (evt) => {
+  // pictures still uploading: wait for them, then submit again
+  const uploading = elements.filter(e => e.type === "image" && !e.asset).map(e => e.upload);
+  if (uploading.length) {
+    evt.preventDefault();
+    await Promise.all(uploading);
+    saveForm.requestSubmit();
+    return;
+  }
+
+  // the whole document goes with the form, so a pending autosave isn't needed any more
+  clearTimeout(autosaveTimer);
+  sizeField.value = sizeSelect.value;
 
   designDataField.value = JSON.stringify({
+    version: 2,
     printArea,
-    elements: safeElements,
+    elements: elements.map(serializeElement),
   });
-
-  previewField.value = canvas.toDataURL("image/png");
 });
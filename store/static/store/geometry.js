@@ -0,0 +1,171 @@
+// -------------------------
+// Customiser geometry: hit-testing + text fitting
+// -------------------------
+// No DOM in here (text is measured through a function that's passed in), so the same
+// code runs in the page and in node for bench/customise_geometry.js.
+(function (root) {
+  const HANDLE_SIZE = 14;
+
+  // checks if point is inside element box
+  function hitTest(el, x, y) {
+    return x >= el.x && x <= el.x + el.w && y >= el.y && y <= el.y + el.h;
+  }
+
+  // resize handle = bottom-right corner square
+  function hitResizeHandle(el, x, y) {
+    const hx = el.x + el.w - HANDLE_SIZE;
+    const hy = el.y + el.h - HANDLE_SIZE;
+    return x >= hx && x <= hx + HANDLE_SIZE && y >= hy && y <= hy + HANDLE_SIZE;
+  }
+
+  // -------------------------
+  // Spatial index
+  // -------------------------
+  // Uniform grid over the canvas: every cell lists the elements whose box touches it,
+  // so a click only looks at the few elements in that cell instead of all of them.
+  // Elements carry a z number (higher = drawn later = on top) and each cell is kept
+  // sorted topmost first, so a click stops at the first hit like the old reverse scan.
+  class SpatialGrid {
+    constructor(cellSize = 64) {
+      this.cellSize = cellSize;
+      this.cells = new Map();   // cellKey(cx, cy) -> [elements], highest z first
+      this.ranges = new Map();  // element -> [cx0, cy0, cx1, cy1] it's filed under
+      this.z = 0;
+    }
+
+    nextZ() {
+      this.z += 1;
+      return this.z;
+    }
+
+    // Bring to front: new top z, re-filed so the cells stay sorted
+    raise(el) {
+      this.remove(el);
+      el.z = this.nextZ();
+      this.insert(el);
+    }
+
+    // one number per cell (cheaper to hash than "cx,cy"); fine for +-32k cells either way
+    cellKey(cx, cy) {
+      return (cx + 32768) * 65536 + (cy + 32768);
+    }
+
+    cellRange(el) {
+      const s = this.cellSize;
+      return [
+        Math.floor(el.x / s), Math.floor(el.y / s),
+        Math.floor((el.x + el.w) / s), Math.floor((el.y + el.h) / s),
+      ];
+    }
+
+    insert(el) {
+      if (el.z === undefined) el.z = this.nextZ();
+      const range = this.cellRange(el);
+      const [cx0, cy0, cx1, cy1] = range;
+      for (let cx = cx0; cx <= cx1; cx++) {
+        for (let cy = cy0; cy <= cy1; cy++) {
+          const key = this.cellKey(cx, cy);
+          const cell = this.cells.get(key);
+          if (!cell) {
+            this.cells.set(key, [el]);
+            continue;
+          }
+          let i = 0;
+          while (i < cell.length && cell[i].z > el.z) i++;
+          cell.splice(i, 0, el);
+        }
+      }
+      this.ranges.set(el, range);
+    }
+
+    remove(el) {
+      const range = this.ranges.get(el);
+      if (!range) return;
+      const [cx0, cy0, cx1, cy1] = range;
+      for (let cx = cx0; cx <= cx1; cx++) {
+        for (let cy = cy0; cy <= cy1; cy++) {
+          const key = this.cellKey(cx, cy);
+          const cell = this.cells.get(key);
+          cell.splice(cell.indexOf(el), 1);
+          if (!cell.length) this.cells.delete(key);
+        }
+      }
+      this.ranges.delete(el);
+    }
+
+    // Call after an element moved/resized (cheap when it stayed in the same cells)
+    update(el) {
+      const old = this.ranges.get(el);
+      const range = this.cellRange(el);
+      if (old && old.every((v, i) => v === range[i])) return;
+      this.remove(el);
+      this.insert(el);
+    }
+
+    // Topmost element whose box contains (x, y), or null
+    topmostAt(x, y) {
+      const cell = this.cells.get(this.cellKey(Math.floor(x / this.cellSize), Math.floor(y / this.cellSize)));
+      if (!cell) return null;
+      for (const el of cell) {
+        if (hitTest(el, x, y)) return el;
+      }
+      return null;
+    }
+  }
+
+  // -------------------------
+  // Text fitting
+  // -------------------------
+  // measure(text, size) -> {w, h} of the text alone (canvas measureText in the page).
+  // Measurements are cached per (size, text), and the largest size that fits a box is
+  // found by binary search: ~8 measurements instead of one per font size, and none at
+  // all while resizing the same text again.
+  class TextFitter {
+    constructor(measure, { pad = 0, minSize = 10, maxSize = 160, cacheSize = 500 } = {}) {
+      this.measure = measure;
+      this.pad = pad;
+      this.minSize = minSize;
+      this.maxSize = maxSize;
+      this.cacheSize = cacheSize;
+      this.cache = new Map();
+    }
+
+    // {w, h} of the text's box (padding included) at a font size
+    box(text, size) {
+      const key = `${size}|${text}`;
+      let m = this.cache.get(key);
+      if (!m) {
+        m = this.measure(text, size);
+        this.cache.set(key, m);
+        // Map keeps insertion order, so the first key is the oldest
+        if (this.cache.size > this.cacheSize) this.cache.delete(this.cache.keys().next().value);
+      }
+      return { w: m.w + this.pad * 2, h: m.h + this.pad * 2 };
+    }
+
+    fits(text, size, maxW, maxH) {
+      const b = this.box(text, size);
+      return b.w <= maxW && b.h <= maxH;
+    }
+
+    // Biggest font size (minSize..maxSize) whose box fits in maxW x maxH; minSize if none does
+    maxFontSize(text, maxW, maxH) {
+      let lo = this.minSize;
+      let hi = this.maxSize;
+      if (!this.fits(text, lo, maxW, maxH)) return this.minSize;
+      while (lo < hi) {
+        const mid = Math.ceil((lo + hi) / 2);
+        if (this.fits(text, mid, maxW, maxH)) lo = mid;
+        else hi = mid - 1;
+      }
+      return lo;
+    }
+  }
+
+  const api = { HANDLE_SIZE, hitTest, hitResizeHandle, SpatialGrid, TextFitter };
+  if (typeof module !== "undefined" && module.exports) {
+    module.exports = api;
+  } else {
+    root.DesignGeometry = api;
+  }
+})(typeof window !== "undefined" ? window : globalThis);
@@ -0,0 +1,306 @@
+"""
+Static files build + serving (customise.js, styles.css, ...).
+
+`manage.py build_static` (= collectstatic with the storage below) writes STATIC_ROOT:
+1. .js/.css are minified (comments + whitespace only, nothing is renamed)
+2. every file gets a content hash in its name (Django's ManifestStaticFilesStorage),
+   e.g. store/customise.3f2a9c1b7d4e.js, and {% static %} links to that name
+3. text files get .gz (and .br, if the Brotli package is installed) copies next to them
+
+Hashed names never change meaning, so they're sent with a one-year "immutable"
+Cache-Control: a repeat visit to /customise/<id>/ doesn't even ask for the JS.
+serve_static does that (plus picking .br/.gz by Accept-Encoding) when Django serves
+STATIC_URL itself (SERVE_STATIC); behind nginx use `gzip_static on; brotli_static on;`
+and the same header for /static/ instead.
+"""
+import functools
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from store.query_budget import query_budget
+from store.storage import IMMUTABLE_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:  # optional: pip install -r requirements-static.txt
+    brotli = None
+
+# Files worth compressing (images/fonts are compressed already)
+COMPRESSIBLE = (".js", ".css", ".svg", ".json", ".txt", ".html", ".map", ".xml")
+# Only keep a compressed copy if it saves at least this much
+MIN_SAVING = 0.05
+
+# Unhashed names (e.g. store/customise.js) may change on the next deploy
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+# ----------------------------
+# MINIFYING
+# ----------------------------
+# Deliberately simple: strip comments and collapse whitespace, never rewrite code.
+# Strings, template literals and regex literals are copied through untouched.
+
+JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^") | {""}
+JS_REGEX_KEYWORDS = ("return", "typeof", "case", "do", "else", "in", "of", "void", "yield", "await")
+# spaces next to these can go (never next to + or -: "a - -b" must stay)
+JS_TIGHT = set("{}()[];,:=<>?|&!*%")
+# a line break can't end a statement after/before these, so it can go too
+JS_NO_END = set("{([,;=:?&|!<>%")
+JS_NO_START = set(")]}.,;?:=&|")
+CSS_TIGHT = set("{};,>")
+
+
+def scan_string(source, i):
+    """Index just past the string/template literal starting at source[i]."""
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        if source[i] == "\\":
+            i += 2
+            continue
+        if source[i] == quote:
+            return i + 1
+        if quote != "`" and source[i] == "\n":
+            break  # unterminated; leave the rest alone
+        i += 1
+    return i
+
+
+def scan_regex(source, i):
+    """Index just past the regex literal starting at source[i] ("/")."""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != "\n":
+        c = source[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] == "_"):
+                i += 1  # flags
+            return i
+        i += 1
+    return i
+
+
+def last_token(out):
+    """The previous non-space character (or the word, if it ends in a letter)."""
+    text = "".join(out[-3:]).rstrip()
+    if not text:
+        return ""
+    match = re.search(r"[A-Za-z_$][\w$]*$", text)
+    return match.group(0) if match else text[-1]
+
+
+def join_js(out, gap, next_char):
+    """Appends what's left of a run of whitespace/comments between two tokens."""
+    prev = out[-1][-1:] if out else ""
+    if not prev or not next_char or next_char.isspace():
+        return
+    if "\n" in gap:
+        # line breaks may end a statement (automatic semicolons); only drop the safe ones
+        if prev not in JS_NO_END and next_char not in JS_NO_START:
+            out.append("\n")
+    elif prev not in JS_TIGHT and next_char not in JS_TIGHT:
+        out.append(" ")
+
+
+def minify_js(source):
+    out = []
+    gap = ""  # whitespace/comments skipped since the last token
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c.isspace():
+            gap += c
+            i += 1
+            continue
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            gap += "\n" if "\n" in source[i:end] else " "
+            i = end
+            continue
+
+        if gap:
+            join_js(out, gap, c)
+            gap = ""
+
+        if c in "\"'`":
+            end = scan_string(source, i)
+        elif c == "/" and (last_token(out) in JS_REGEX_AFTER or last_token(out) in JS_REGEX_KEYWORDS):
+            end = scan_regex(source, i)
+        else:
+            end = i + 1
+        out.append(source[i:end])
+        i = end
+    return "".join(out) + "\n"
+
+
+def minify_css(source):
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in "\"'":
+            end = scan_string(source, i)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif c.isspace():
+            while i < n and source[i].isspace():
+                i += 1
+            prev = out[-1][-1:] if out else ""
+            # "a :hover" and "a:hover" are different selectors, so only drop spaces that can't matter
+            if prev and i < n and prev not in CSS_TIGHT and prev != ":" and source[i] not in CSS_TIGHT:
+                out.append(" ")
+        else:
+            if c == "}" and out and out[-1] == ";":
+                out.pop()
+            out.append(c)
+            i += 1
+    return "".join(out).strip() + "\n"
+
+
+MINIFIERS = {".js": minify_js, ".css": minify_css}
+
+
+# ----------------------------
+# BUILD (collectstatic)
+# ----------------------------
+
+def compress_copies(storage, name):
+    """Writes name.gz / name.br next to a collected file if they're worth it. Returns their names."""
+    if not name.endswith(COMPRESSIBLE):
+        return []
+    with storage.open(name) as fh:
+        raw = fh.read()
+
+    variants = [(".gz", gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(raw, quality=11)))
+
+    written = []
+    for ext, data in variants:
+        if len(data) > len(raw) * (1 - MIN_SAVING):
+            continue
+        if storage.exists(name + ext):
+            storage.delete(name + ext)
+        written.append(storage.save(name + ext, ContentFile(data)))
+    return written
+
+
+class PrecompressedManifestStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that minifies .js/.css before they're hashed and leaves
+    gzip/brotli copies of every text file. Falls back to plain names for files that
+    haven't been collected (dev server, tests), so nothing breaks before the first build.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+
+        # minify the collected copies in place, and hash/compress those instead of the originals
+        # (paths maps each name to the finder's storage it came from)
+        paths = dict(paths)
+        for name, (source_storage, path) in list(paths.items()):
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            if minify is None or name.endswith((".min.js", ".min.css")):
+                continue
+            with source_storage.open(path) as fh:
+                source = fh.read().decode()
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(minify(source).encode()))
+            paths[name] = (self, name)
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            yield name, hashed_name, processed
+
+        # compressed copies of the final files (hashed + plain names)
+        for name in list(paths) + list(self.hashed_files.values()):
+            compress_copies(self, name)
+
+
+# ----------------------------
+# SERVING
+# ----------------------------
+
+@functools.lru_cache(maxsize=1)
+def hashed_names(manifest_hash):
+    """Every hashed name in the manifest, built once per manifest (not once per request)."""
+    return frozenset(staticfiles_storage.hashed_files.values())
+
+
+def is_hashed(path):
+    # manifest_hash changes when the manifest does (build_static in this process)
+    return path in hashed_names(staticfiles_storage.manifest_hash)
+
+
+@query_budget(0)
+def serve_static(request, path):
+    """
+    Serves a file from STATIC_ROOT, preferring a .br/.gz copy the browser accepts.
+    Hashed names get a far-future immutable Cache-Control, others must revalidate.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404("Not found")
+    if not os.path.isfile(fullpath):
+        raise Http404("Not found")
+
+    accepted = request.headers.get("Accept-Encoding", "")
+    encoding, served = None, fullpath
+    for ext, name in ((".br", "br"), (".gz", "gzip")):
+        if name in accepted and os.path.isfile(fullpath + ext):
+            encoding, served = name, fullpath + ext
+            break
+
+    stat = os.stat(served)
+    if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(open(served, "rb"), content_type=content_type or "application/octet-stream")
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+            response["Content-Length"] = str(stat.st_size)
+
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if is_hashed(path) else REVALIDATE_CACHE_CONTROL
+    return response
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+# Content-addressed blobs live here: cas/ab/cd/abcd1234....png
+CAS_PREFIX = "cas/"
+
+# Files written under these prefixes keep the name they were given
+# (their names are derived from a CAS blob or a content hash, so they're immutable anyway).
+PASSTHROUGH_PREFIXES = ("variants/", "print_exports/")
+
+# Exactly what blob_name() below writes (so no "..", no made-up paths)
+BLOB_NAME = re.compile(r"^cas/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(\.[a-z0-9]+)?$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def content_hash(content):
+    """sha256 of a Django File, read in chunks so big uploads don't sit in memory."""
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+def is_blob_name(name):
+    """Stricter is_blob() for names that come from outside (design documents)."""
+    return isinstance(name, str) and BLOB_NAME.match(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    MEDIA_ROOT storage where every upload is stored under the hash of its bytes.
+    - saving identical bytes twice stores them once (design previews saved over and over,
+      the same artwork uploaded for several products, ...)
+    - a blob's URL never changes meaning, so it can be cached forever
+    - blobs are never deleted on the spot; references are counted in MediaBlob and
+      `manage.py gc_media` removes the ones nothing points at any more
+    Files that already existed before this storage (plain names) keep working as normal.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Names are content hashes, so re-writing an existing name is harmless
+        # (and avoids the "pick another name" loop if two requests race on one blob)
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(*args, **kwargs)
+
+    def blob_name(self, name, digest):
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(CAS_PREFIX.rstrip("/"), digest[:2], digest[2:4], f"{digest}{ext}")
+
+    def _save(self, name, content):
+        if name.startswith(PASSTHROUGH_PREFIXES):
+            return super()._save(name, content)
+
+        name = self.blob_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def delete(self, name):
+        # Shared blobs must only be removed by gc_media (someone else may use them)
+        if is_blob(name):
+            return
+        super().delete(name)
+
+    def force_delete(self, name):
+        super().delete(name)
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    DEBUG-only MEDIA_URL view (see config/urls.py).
+    Same as django.views.static.serve but marks content-addressed blobs as immutable.
+    In production the web server should send the same header for /media/cas/ and /media/variants/cas/.
+    """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if path.startswith(CAS_PREFIX) or path.startswith(f"variants/{CAS_PREFIX}"):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
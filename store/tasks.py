@@ -0,0 +1,58 @@
+from django.core.files.base import ContentFile
+
+from .models import Design, Product
+from .services.catalogue_cache import bump_catalogue_version
+from .services.design_renderer import render_design_preview as render_preview_png
+from .services.image_variants import generate_variants
+from .services.job_queue import register
+from .services.product_images import process_product_images
+
+
+# ----------------------------
+# DESIGN PREVIEWS
+# ----------------------------
+
+def mark_preview_failed(design_id):
+    Design.objects.filter(id=design_id).update(preview_status="FAILED")
+
+
+@register("render_design_preview", on_failure=mark_preview_failed)
+def render_design_preview(design_id):
+    design = Design.objects.select_related("product").filter(id=design_id).first()
+    if design is None:
+        # design was deleted before the worker got to it
+        return
+
+    Design.objects.filter(id=design.id).update(preview_status="RENDERING")
+
+    png = render_preview_png(design.product, design.design_data)
+    design.preview.save(f"design_{design.id}.png", ContentFile(png), save=False)
+    generate_variants(design.preview)
+    design.preview_status = "READY"
+    design.save(update_fields=["preview", "preview_status"])
+
+
+# ----------------------------
+# PRODUCT UPLOADS
+# ----------------------------
+
+@register("process_product_images")
+def process_product_images_job(product_id):
+    product = Product.objects.filter(id=product_id).first()
+    if product is None:
+        return
+    process_product_images(product)
+    product.refresh_from_db(fields=["image"])
+    generate_variants(product.image)
+    # process_product_images writes with update() (no signals) and the new
+    # variants change the <picture> markup, so refresh the catalogue cache by hand
+    bump_catalogue_version()
+
+
+@register("generate_image_variants")
+def generate_image_variants_job(model, object_id, field):
+    """Backfill job queued by `manage.py generate_image_variants`."""
+    model_class = {"product": Product, "design": Design}[model]
+    obj = model_class.objects.filter(id=object_id).first()
+    if obj is not None:
+        generate_variants(getattr(obj, field))
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from store.services.image_variants import MIME_TYPES, build_srcset, get_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field, alt="", sizes="100vw", css_class=""):
+    """
+    Emits a <picture> with AVIF/WebP <source>s + an <img srcset> fallback.
+    If the variants haven't been generated yet it's just a normal <img>.
+
+        {% load image_tags %}
+        {% responsive_image p.image alt=p.name sizes="(max-width: 600px) 100vw, 260px" %}
+    """
+    if not field:
+        return ""
+
+    manifest = get_manifest(field.name)
+    if not manifest:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', field.url, alt, css_class)
+
+    sources = [
+        (MIME_TYPES[ext], build_srcset(field, ext, manifest), sizes)
+        for ext, widths in manifest["variants"].items()
+        if ext != manifest["fallback"] and widths
+    ]
+
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        format_html_join("", '<source type="{}" srcset="{}" sizes="{}">', sources),
+        field.url,
+        build_srcset(field, manifest["fallback"], manifest),
+        sizes,
+        manifest["width"],
+        manifest["height"],
+        alt,
+        css_class,
+    )
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    `manage.py test` with QUERY_BUDGET_MODE = "raise" for the whole run (settings say "log"),
+    so any view going over its @query_budget fails the test that hit it instead of
+    leaving a warning in the output of a green run.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.saved_budget_mode = settings.QUERY_BUDGET_MODE
+        settings.QUERY_BUDGET_MODE = "raise"
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_BUDGET_MODE = self.saved_budget_mode
+        super().teardown_test_environment(**kwargs)
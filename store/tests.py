@@ -1,3 +1,1007 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .bench_fixtures import clear_bench_data, seed
+from .cart_store import Cart, decode, encode
+from .loadtest import mixed_scenario
+from .metrics import merge, registry
+from .models import DailyStats, Design, Job, MediaBlob, Order, OrderItem, Product, StoreStats
+from .services import queries
+from .services.design_renderer import render_design_preview as render_preview_png
+from .services.design_schema import save_asset
+from .services.image_variants import generate_variants
+from .services.job_queue import enqueue, poll, run_pending
+from .services.keyset import page_query
+from .services.media_refs import collect_garbage
+from .services.order_service import create_order_from_cart, price_cart
+from .services.query_audit import audit, find_problems
+from .services.payment_service import mark_order_paid
+from .services.print_export import build_layers, export_design, print_box, render_strips
+from .services.stats import get_stats, reconcile_totals
+from .static_pipeline import minify_css, minify_js
+
+
+def png_bytes(size=(90, 65), color=(255, 255, 255, 255)):
+    out = io.BytesIO()
+    Image.new("RGBA", size, color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def set_cart(client, lines):
+    """Puts a cart into the test client's cookies, the way CartMiddleware would."""
+    cart = Cart(HttpRequest())
+    cart._lines, cart.modified = lines, True
+    response = HttpResponse()
+    cart.save(response)
+    client.cookies.update(response.cookies)
+
+
+def client_cart(client):
+    """The cart lines the test client's cookies hold."""
+    request = HttpRequest()
+    request.COOKIES = {name: morsel.value for name, morsel in client.cookies.items()}
+    return Cart(request).lines
+
+
+def make_products(n):
+    return [
+        Product.objects.create(name=f"Tee {i}", price=Decimal("10.00") + i)
+        for i in range(n)
+    ]
+
+
+class CartPricingTests(TestCase):
+    def test_price_cart_skips_deleted_products(self):
+        kept, gone = make_products(2)
+        gone_key = str(gone.id)
+        cart = {str(kept.id): {"qty": 3}, gone_key: {"qty": 1}}
+        gone.delete()
+
+        priced = price_cart(cart)
+
+        self.assertEqual(len(priced), 1)
+        self.assertEqual(priced.total, kept.price * 3)
+        self.assertEqual(priced.missing_ids, [gone_key])
+
+    def test_cart_page_query_count_is_constant(self):
+        # one product fetch, however many lines are in the cart (the cart itself is a cookie)
+        for size in (1, 30):
+            products = make_products(size)
+            set_cart(self.client, {str(p.id): {"qty": 2} for p in products})
+
+            with self.assertNumQueries(1):
+                self.client.get(reverse("cart"))
+            with self.assertNumQueries(1):
+                self.client.get(reverse("checkout"))
+
+    def test_cart_page_drops_deleted_products(self):
+        product = make_products(1)[0]
+        set_cart(self.client, {str(product.id): {"qty": 1}, "999999": {"qty": 1}})
+
+        response = self.client.get(reverse("cart"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(client_cart(self.client)), [str(product.id)])
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_shopping_writes_nothing_to_the_database(self):
+        product = make_products(1)[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("product_detail", args=[product.id]))
+            self.client.post(reverse("cart_add", args=[product.id]))
+            self.client.post(reverse("cart_add", args=[product.id]))
+            response = self.client.get(reverse("cart"))
+
+        self.assertContains(response, "Cart (2)")
+        writes = [q["sql"] for q in queries if not q["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertEqual(writes, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_tampered_cookie_is_ignored(self):
+        set_cart(self.client, {"1": {"qty": 1}})
+        morsel = self.client.cookies["cart"]
+        morsel.set("cart", morsel.value.replace("1*1", "1*9"), morsel.coded_value)
+
+        self.assertEqual(client_cart(self.client), {})
+
+    @override_settings(CART_STORE={"COOKIE_MAX_BYTES": 20})
+    def test_big_carts_move_to_the_cache_and_back(self):
+        products = make_products(8)
+        for p in products:
+            self.client.post(reverse("cart_add", args=[p.id]))
+
+        self.assertTrue(self.client.cookies["cart"].value.startswith("@"))
+        self.assertEqual(list(client_cart(self.client)), [str(p.id) for p in products])
+
+        for p in products[2:]:
+            self.client.get(reverse("cart_remove", args=[str(p.id)]))
+        self.assertFalse(self.client.cookies["cart"].value.startswith("@"))
+        self.assertEqual(len(client_cart(self.client)), 2)
+
+    def test_encoding_is_compact_and_forgiving(self):
+        lines = {"12": {"qty": 2}, "12:40:M": {"qty": 1}}
+        self.assertEqual(encode(lines), "12*2|12:40:M*1")
+        self.assertEqual(decode(encode(lines)), lines)
+        self.assertEqual(decode("12*x|*3|7*0|9*1000"), {"9": {"qty": 99}})
+
+
+DELIVERY = {
+    "full_name": "Test Buyer",
+    "email": "buyer@example.com",
+    "address_line1": "1 High Street",
+    "city": "London",
+    "postcode": "E1 1AA",
+    "country": "UK",
+}
+
+
+class OrderCreationTests(TestCase):
+    def test_order_items_are_bulk_inserted(self):
+        products = make_products(25)
+        cart = {str(p.id): {"qty": 1} for p in products}
+        priced = price_cart(cart)
+        DailyStats.objects.create(date=timezone.localdate())
+
+        # savepoint + order insert + dashboard stats/daily bucket + one bulk insert + release
+        with self.assertNumQueries(6):
+            order = create_order_from_cart(cart, None, DELIVERY, priced_cart=priced)
+
+        self.assertEqual(order.items.count(), 25)
+        self.assertEqual(order.total_amount, priced.total)
+
+    def test_failed_item_insert_leaves_no_order(self):
+        products = make_products(3)
+        cart = {str(p.id): {"qty": 1} for p in products}
+
+        with mock.patch.object(OrderItem.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                create_order_from_cart(cart, None, DELIVERY)
+
+        self.assertFalse(Order.objects.exists())
+
+
+class MediaTestCase(TestCase):
+    """Points MEDIA_ROOT at a temp folder so tests never touch real uploads."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        cache.clear()
+
+
+class SaveDesignTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("designer", password="pw-12345-long")
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(
+            name="Tee",
+            price=Decimal("15.00"),
+            template_image=SimpleUploadedFile("tee.png", png_bytes(), content_type="image/png"),
+        )
+
+    def test_preview_is_rendered_from_design_json(self):
+        design_json = json.dumps({"elements": [{
+            "type": "text", "text": "Hi", "fontSize": 40, "color": "#ff0000",
+            "x": 200, "y": 250, "w": 120, "h": 60,
+        }]})
+
+        response = self.client.post(
+            reverse("save_design", args=[self.product.id]),
+            {"design_data": design_json, "size": "M"},
+        )
+
+        self.assertRedirects(response, reverse("my_designs"))
+        design = Design.objects.get()
+        self.assertEqual(design.preview_status, "PENDING")
+        self.assertFalse(design.preview)
+
+        self.assertEqual(run_pending(), 1)
+
+        design.refresh_from_db()
+        self.assertEqual(design.preview_status, "READY")
+        with design.preview.open("rb") as fh:
+            preview = Image.open(fh)
+            self.assertEqual(preview.size, (900, 650))
+
+    def test_invalid_json_is_rejected(self):
+        response = self.client.post(
+            reverse("save_design", args=[self.product.id]),
+            {"design_data": "not json", "size": "M"},
+        )
+
+        self.assertRedirects(response, reverse("customise", args=[self.product.id]))
+        self.assertFalse(Design.objects.exists())
+
+    def test_documents_breaking_the_schema_are_rejected(self):
+        text = {"type": "text", "text": "Hi", "x": 1, "y": 1, "w": 50, "h": 20}
+        image = {"type": "image", "x": 1, "y": 1, "w": 50, "h": 50}
+        bad_documents = [
+            {"elements": [{**text, "color": "red; background: url(x)"}]},
+            {"elements": [{**text, "type": "script"}]},
+            {"elements": [{**text, "w": float("inf")}]},
+            {"elements": [text] * 51},
+            {"version": 99, "elements": []},
+            # asset names must be real uploads: no traversal, no made-up blobs
+            {"elements": [{**image, "asset": "cas/../../../etc/passwd"}]},
+            {"elements": [{**image, "asset": f"cas/ab/cd/abcd{'0' * 60}.png"}]},
+        ]
+        for doc in bad_documents:
+            with self.subTest(doc=str(doc)[:60]):
+                self.client.post(reverse("save_design", args=[self.product.id]), {"design_data": json.dumps(doc)})
+                self.assertFalse(Design.objects.exists())
+
+    def test_inline_pictures_are_moved_out_and_stored_compressed(self):
+        picture = "data:image/png;base64," + base64.b64encode(png_bytes((200, 200), (0, 128, 0, 255))).decode()
+        image = {"type": "image", "src": picture, "x": 320, "y": 200, "w": 100, "h": 100}
+        text = {"type": "text", "text": "Hi " * 30, "fontSize": 30, "x": 320, "y": 320, "w": 200, "h": 40}
+        design_json = json.dumps({"elements": [image, dict(image), text]})
+
+        self.client.post(reverse("save_design", args=[self.product.id]), {"design_data": design_json})
+
+        design = Design.objects.get()
+        doc = json.loads(design.design_data)
+        self.assertEqual(doc["version"], 2)
+        self.assertNotIn("data:", design.design_data)
+        self.assertEqual(doc["elements"][0]["asset"], design.assets[0])
+        # same picture twice = one file, referenced twice
+        self.assertEqual(len(set(design.assets)), 1)
+        self.assertEqual(MediaBlob.objects.get(name=design.assets[0]).refcount, 2)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT design_data FROM store_design WHERE id = %s", [design.id])
+            stored = bytes(cursor.fetchone()[0])
+        self.assertTrue(stored.startswith(b"z"))
+        self.assertLess(len(stored), len(design.design_data))
+
+        self.assertEqual(run_pending(), 1)
+        design.refresh_from_db()
+        self.assertEqual(design.preview_status, "READY")
+
+        design.delete()
+        self.assertEqual(MediaBlob.objects.get(name=doc["elements"][0]["asset"]).refcount, 0)
+
+    def test_pictures_are_uploaded_on_their_own_and_referenced_by_name(self):
+        webp = io.BytesIO()
+        Image.new("RGB", (120, 80), (200, 10, 10)).save(webp, "WEBP")
+        response = self.client.post(
+            reverse("upload_design_asset"), {"image": SimpleUploadedFile("upload", webp.getvalue())},
+        )
+        asset = response.json()["asset"]
+        self.assertTrue(asset.endswith(".webp"))
+
+        bad = self.client.post(reverse("upload_design_asset"), {"image": SimpleUploadedFile("upload", b"<svg/>")})
+        self.assertEqual(bad.status_code, 400)
+
+        image = {"type": "image", "asset": asset, "x": 320, "y": 200, "w": 120, "h": 80}
+        self.client.post(
+            reverse("save_design", args=[self.product.id]),
+            {"design_data": json.dumps({"version": 2, "elements": [image]})},
+        )
+        design = Design.objects.get()
+        self.assertEqual(design.assets, [asset])
+        self.assertEqual(MediaBlob.objects.get(name=asset).refcount, 1)
+
+    def test_design_lists_defer_the_document(self):
+        Design.objects.create(user=self.user, product=self.product, design_data="{}")
+        response = self.client.get(reverse("my_designs"))
+        self.assertIn("design_data", response.context["designs"][0].get_deferred_fields())
+
+    def test_compact_designs_upgrades_old_rows(self):
+        picture = "data:image/png;base64," + base64.b64encode(png_bytes(color=(9, 9, 9, 255))).decode()
+        old = json.dumps({"elements": [{"type": "image", "src": picture, "x": 1, "y": 1, "w": 90, "h": 65}]}, indent=2)
+        design = Design.objects.create(user=self.user, product=self.product, design_data=old)
+
+        call_command("compact_designs", stdout=io.StringIO())
+
+        design.refresh_from_db()
+        self.assertEqual(len(design.assets), 1)
+        self.assertNotIn("data:", design.design_data)
+        self.assertEqual(MediaBlob.objects.get(name=design.assets[0]).refcount, 1)
+
+
+class DesignDraftTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("drafter", password="pw-12345-long")
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(
+            name="Tee", price=Decimal("15.00"),
+            template_image=SimpleUploadedFile("tee.png", png_bytes(), content_type="image/png"),
+        )
+        self.text = {"id": "t1", "type": "text", "text": "Hi", "fontSize": 40, "x": 320, "y": 200, "w": 120, "h": 60}
+
+    def patch(self, design_id, delta):
+        return self.client.patch(
+            reverse("patch_design_draft", args=[design_id]), json.dumps(delta), content_type="application/json",
+        )
+
+    def test_deltas_edit_one_draft_and_save_promotes_it(self):
+        response = self.client.post(
+            reverse("create_design_draft", args=[self.product.id]),
+            json.dumps({"version": 2, "elements": [self.text]}), content_type="application/json",
+        )
+        draft = Design.objects.get(id=response.json()["id"])
+        self.assertTrue(draft.is_draft)
+
+        moved = {**self.text, "x": 350}
+        second = {**self.text, "id": "t2", "text": "Yo"}
+        response = self.patch(draft.id, {"base": 0, "elements": {"t1": moved, "t2": second}})
+        self.assertEqual(response.json(), {"revision": 1})
+        response = self.patch(draft.id, {"base": 1, "elements": {"t1": None}, "order": ["t2"]})
+        self.assertEqual(response.json(), {"revision": 2})
+
+        draft.refresh_from_db()
+        self.assertEqual([el["text"] for el in json.loads(draft.design_data)["elements"]], ["Yo"])
+        # another tab saved in between: the browser has to resend against revision 2
+        self.assertEqual(self.patch(draft.id, {"base": 1, "elements": {}}).status_code, 409)
+        self.assertEqual(self.patch(draft.id, {"base": 2, "elements": {}, "order": ["nope"]}).status_code, 400)
+
+        # drafts aren't designs yet (no list entry, no stats) and come back in the customiser
+        self.assertEqual(len(self.client.get(reverse("my_designs")).context["designs"]), 0)
+        self.assertEqual(get_stats().design_count, 0)
+        page = self.client.get(reverse("customise", args=[self.product.id]))
+        self.assertEqual(page.context["drafts"]["draft"]["id"], draft.id)
+
+        self.client.post(reverse("save_design", args=[self.product.id]), {
+            "design_data": json.dumps({"version": 2, "elements": [second]}), "size": "L", "draft_id": draft.id,
+        })
+        design = Design.objects.get()
+        self.assertEqual((design.id, design.is_draft, design.preview_status), (draft.id, False, "PENDING"))
+        self.assertEqual(get_stats().design_count, 1)
+        self.assertEqual(self.patch(draft.id, {"base": 2, "elements": {}}).status_code, 404)
+
+
+class DesignCartTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("buyer", password="pw-12345-long")
+        self.client.force_login(self.user)
+        self.product = make_products(1)[0]
+        self.asset = save_asset(png_bytes((20, 20), (1, 2, 3, 255)))
+        self.design = Design.objects.create(
+            user=self.user, product=self.product, size="L", assets=[self.asset],
+            design_data=json.dumps({"version": 2, "elements": [
+                {"type": "image", "asset": self.asset, "x": 1, "y": 1, "w": 20, "h": 20},
+            ]}),
+        )
+
+    def add(self, **data):
+        return self.client.post(reverse("cart_add", args=[self.product.id]), data)
+
+    def test_cart_lines_are_keyed_by_product_design_and_size(self):
+        self.add()
+        self.add(design_id=self.design.id)
+        self.add(design_id=self.design.id)
+        self.add(design_id=self.design.id, size="S")
+
+        cart = client_cart(self.client)
+        plain, in_l, in_s = str(self.product.id), f"{self.product.id}:{self.design.id}:L", f"{self.product.id}:{self.design.id}:S"
+        self.assertEqual(list(cart), [plain, in_l, in_s])
+        self.assertEqual(cart[in_l]["qty"], 2)
+
+        # session + user (logged in) + products + designs
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("cart"))
+        self.assertContains(response, "(custom design)", count=2)
+        self.assertEqual(response.context["total"], self.product.price * 4)
+
+    def test_other_peoples_designs_cant_be_added(self):
+        other = User.objects.create_user("other", password="pw-12345-long")
+        theirs = Design.objects.create(user=other, product=self.product, design_data="{}")
+
+        response = self.add(design_id=theirs.id)
+
+        self.assertRedirects(response, reverse("my_designs"))
+        self.assertEqual(client_cart(self.client), {})
+
+    def test_checkout_keeps_a_copy_of_the_design(self):
+        self.add(design_id=self.design.id)
+        self.client.post(reverse("checkout"), DELIVERY)
+
+        item = OrderItem.objects.get()
+        self.assertEqual((item.design, item.size), (self.design, "L"))
+        self.assertEqual(item.design_data, self.design.design_data)
+        self.assertEqual(item.design_assets, [self.asset])
+        self.assertEqual(MediaBlob.objects.get(name=self.asset).refcount, 2)
+
+        self.design.delete()
+        item.refresh_from_db()
+        self.assertIsNone(item.design)
+        self.assertEqual(item.design_assets, [self.asset])
+        self.assertEqual(MediaBlob.objects.get(name=self.asset).refcount, 1)
+
+        item.order.delete()
+        self.assertEqual(MediaBlob.objects.get(name=self.asset).refcount, 0)
+
+
+@override_settings(PRINT_EXPORT={"DPI": 60, "PRINT_WIDTH_IN": 10, "STRIP_HEIGHT": 64})
+class PrintExportTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("printer", password="pw-12345-long")
+        # print box 300x400 canvas units -> 600x800 px at 60 DPI over 10 inches
+        self.product = Product.objects.create(
+            name="Tee", price=Decimal("15.00"), print_x=100, print_y=50, print_w=300, print_h=400,
+        )
+        asset = save_asset(png_bytes((40, 40), (0, 0, 255, 255)))
+        self.design = Design.objects.create(user=self.user, product=self.product, assets=[asset], design_data=json.dumps({
+            "version": 2,
+            "elements": [
+                {"type": "image", "asset": asset, "x": 150, "y": 80, "w": 100, "h": 100},
+                {"type": "text", "text": "Proxy", "fontSize": 30, "color": "#ff0000", "x": 120, "y": 300, "w": 200, "h": 50},
+            ],
+        }))
+
+    def export(self, **kwargs):
+        return export_design(self.design.id, self.design.design_data, print_box(self.product), **kwargs)
+
+    def test_export_is_print_sized_and_cached_per_version(self):
+        _, name, rendered = self.export()
+        self.assertTrue(rendered)
+
+        with default_storage.open(name, "rb") as fh:
+            img = Image.open(fh)
+            img.load()
+        self.assertEqual(img.size, (600, 800))
+        self.assertEqual(round(img.info["dpi"][0]), 60)
+        # image element: canvas (150, 80) -> ((150 - 100) * 2, (80 - 50) * 2) = (100, 60)
+        self.assertEqual(img.getpixel((150, 110)), (0, 0, 255, 255))
+        self.assertEqual(img.getpixel((5, 5))[3], 0)  # transparent outside the elements
+
+        self.assertEqual(self.export(), (self.design.id, name, False))
+
+        # a new version gets its own file (orders may still need the old one)
+        self.design.design_data = self.design.design_data.replace("Proxy", "Proxy!")
+        _, new_name, rendered = self.export()
+        self.assertTrue(rendered)
+        self.assertNotEqual(new_name, name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_strips_match_a_single_pass_render(self):
+        _, name, _ = self.export()
+        with override_settings(PRINT_EXPORT={"DPI": 60, "PRINT_WIDTH_IN": 10, "STRIP_HEIGHT": 10_000}):
+            _, whole, _ = self.export(force=True)
+        with default_storage.open(whole, "rb") as fh:
+            expected = Image.open(fh).tobytes()
+
+        strips = render_strips(self.design.design_data, print_box(self.product))
+        self.assertEqual(next(strips), (600, 800))
+        self.assertEqual(b"".join(strip.tobytes() for strip in strips), expected)
+
+    def test_image_layers_only_keep_what_they_print(self):
+        asset = save_asset(png_bytes((2000, 2000), (0, 255, 0, 255)))
+        data = {"version": 2, "elements": [{"type": "image", "asset": asset, "x": 150, "y": 80, "w": 100, "h": 100}]}
+
+        # 100 canvas units at scale 2 -> 200 px: the 2000 px source is kept at 1/10
+        [layer] = build_layers(data, print_box(self.product), 2)
+        self.assertEqual(layer.img.size, (200, 200))
+
+    def test_layer_with_a_bad_asset_name_is_skipped(self):
+        # saved before asset names were checked; the rest of the design still renders
+        data = json.loads(self.design.design_data)
+        data["elements"][0]["asset"] = "cas/../../../etc/passwd"
+        self.design.design_data = json.dumps(data)
+
+        _, name, rendered = self.export()
+        self.assertTrue(rendered)
+        self.assertTrue(render_preview_png(self.product, self.design.design_data).startswith(b"\x89PNG"))
+
+    def test_command_exports_designs_on_paid_orders(self):
+        other = Design.objects.create(user=self.user, product=make_products(1)[0], design_data="{}")
+        order = Order.objects.create(user=self.user, full_name="A", email="a@example.com", address_line1="1",
+                                     city="X", postcode="1", country="UK", status="PAID")
+        OrderItem.objects.create(order=order, product=self.product, qty=1, unit_price=Decimal("15.00"),
+                                 design=self.design, design_data=self.design.design_data)
+        # another customer's order of the plain product doesn't make the design printable
+        OrderItem.objects.create(order=order, product=other.product, qty=1, unit_price=Decimal("15.00"))
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir, True)
+
+        out = io.StringIO()
+        call_command("export_print_files", workers=1, output_dir=output_dir, stdout=out)
+
+        self.assertIn(f"Design #{self.design.id} ->", out.getvalue())
+        self.assertNotIn(f"Design #{other.id}", out.getvalue())
+        self.assertEqual(len(os.listdir(output_dir)), 1)
+
+        call_command("export_print_files", workers=1, stdout=out)
+        self.assertIn("1 already exported", out.getvalue())
+
+        design_id = self.design.id
+        self.design.delete()
+        self.assertEqual(default_storage.listdir(f"print_exports/design_{design_id}"), ([], []))
+
+
+class StaticPipelineTests(TestCase):
+    def test_minifiers_keep_strings_regexes_and_line_breaks_that_matter(self):
+        js = minify_js('const a = "x  // y"; // comment\nlet r = /[/]+/g.test(a) / 2\nfoo()\n/* block */ b = a - -1;\n')
+        self.assertEqual(js, 'const a="x  // y";let r=/[/]+/g.test(a)/ 2\nfoo()\nb=a - -1;\n')
+        self.assertEqual(minify_css("a:hover , .b  .c { color : red ; } /* x */"), "a:hover,.b .c{color :red}\n")
+
+    def test_build_hashes_compresses_and_serves_with_far_future_headers(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, True)
+        with override_settings(STATIC_ROOT=static_root):
+            call_command("build_static", stdout=io.StringIO())
+            url = Template("{% load static %}{% static 'store/customise.js' %}").render(Context())
+            self.assertRegex(url, r"^/static/store/customise\.[0-9a-f]{12}\.js$")
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("immutable", response["Cache-Control"])
+            self.assertEqual(response["Vary"], "Accept-Encoding")
+            with open(os.path.join(static_root, url[len("/static/"):]), "rb") as fh:
+                self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), fh.read())
+
+            # the unhashed name still works, but has to be revalidated
+            response = self.client.get("/static/store/customise.js")
+            self.assertNotIn("Content-Encoding", response)
+            self.assertIn("must-revalidate", response["Cache-Control"])
+
+
+@override_settings(JOB_QUEUE={"RETRY_DELAY": 0})
+class JobQueueTests(MediaTestCase):
+    def test_failed_job_is_retried_then_marks_design_failed(self):
+        user = User.objects.create_user("u1", password="pw-12345-long")
+        product = Product.objects.create(name="Tee", price=Decimal("15.00"))
+        design = Design.objects.create(user=user, product=product, design_data="{}", preview_status="PENDING")
+
+        # force every render attempt to fail
+        with mock.patch("store.tasks.render_preview_png", side_effect=OSError("disk full")):
+            job = enqueue("render_design_preview", max_attempts=2, design_id=design.id)
+            with self.assertLogs("store.services.job_queue", "ERROR"):
+                self.assertEqual(run_pending(), 2)
+
+        job.refresh_from_db()
+        design.refresh_from_db()
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(job.attempts, 2)
+        self.assertIn("disk full", job.last_error)
+        self.assertEqual(design.preview_status, "FAILED")
+
+    def test_claimed_job_is_not_run_twice(self):
+        product = Product.objects.create(name="Tee", price=Decimal("15.00"))
+        enqueue("process_product_images", product_id=product.id)
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(Job.objects.get().status, "DONE")
+
+
+    def test_running_workers_requeue_jobs_of_dead_threads(self):
+        product = Product.objects.create(name="Tee", price=Decimal("15.00"))
+        job = enqueue("process_product_images", product_id=product.id)
+        # claimed by a worker thread that died an hour ago
+        Job.objects.filter(id=job.id).update(status="RUNNING", locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertFalse(poll(1))  # not a check pass
+        self.assertTrue(poll(60))
+        self.assertEqual(Job.objects.get().status, "DONE")
+
+
+class ImageVariantTests(MediaTestCase):
+    def test_variants_and_srcset(self):
+        product = Product.objects.create(
+            name="Tee",
+            price=Decimal("15.00"),
+            image=SimpleUploadedFile("tee.png", png_bytes((1200, 800), (200, 10, 10, 255))),
+        )
+        template = Template("{% load image_tags %}{% responsive_image p.image alt=p.name %}")
+
+        # before generation: plain <img>
+        self.assertNotIn("srcset", template.render(Context({"p": product})))
+
+        manifest = generate_variants(product.image)
+
+        self.assertEqual(manifest["width"], 1200)
+        self.assertEqual(manifest["variants"]["png"], [240, 480, 960])
+        html = template.render(Context({"p": product}))
+        self.assertIn("240w.png 240w", html)
+        self.assertIn(f"{product.image.url} 1200w", html)
+
+
+class ProductTemplateTests(MediaTestCase):
+    def test_template_is_prescaled_and_print_box_checked(self):
+        staff = User.objects.create_user("staff", password="pw-12345-long", is_staff=True)
+        self.client.force_login(staff)
+        form = {"name": "Tee", "price": "15.00", "print_x": "700", "print_y": "100", "print_w": "300", "print_h": "300"}
+
+        # 700 + 300 is off the 900px canvas
+        response = self.client.post(reverse("admin_products_create"), {
+            **form, "template_image": SimpleUploadedFile("t.png", png_bytes((1800, 1300), (0, 0, 0, 0))),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+        self.client.post(reverse("admin_products_create"), {
+            **form, "print_x": "300", "template_image": SimpleUploadedFile("t.png", png_bytes((1800, 1300), (0, 0, 0, 0))),
+        })
+        product = Product.objects.get()
+        self.assertFalse(product.template_canvas)
+        run_pending()
+
+        product.refresh_from_db()
+        with product.template_canvas.open("rb") as fh:
+            self.assertEqual(Image.open(fh).size, (900, 650))
+        self.assertEqual(MediaBlob.objects.get(name=product.template_canvas.name).refcount, 1)
+        response = self.client.get(reverse("customise", args=[product.id]))
+        self.assertContains(response, product.template_canvas.url)
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def make_product(self, data):
+        return Product.objects.create(
+            name="Tee", price=Decimal("15.00"), image=SimpleUploadedFile("tee.png", data),
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        data = png_bytes()
+        first, second = self.make_product(data), self.make_product(data)
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("cas/"))
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refcount, 2)
+
+    def test_gc_only_removes_unreferenced_blobs(self):
+        kept = self.make_product(png_bytes(color=(0, 0, 0, 255)))
+        gone = self.make_product(png_bytes(color=(9, 9, 9, 255)))
+        gone_name = gone.image.name
+        gone.delete()
+
+        self.assertEqual(MediaBlob.objects.get(name=gone_name).refcount, 0)
+        self.assertEqual(collect_garbage(grace_seconds=0), [gone_name])
+        self.assertFalse(kept.image.storage.exists(gone_name))
+        self.assertTrue(kept.image.storage.exists(kept.image.name))
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_shop_is_served_from_cache_until_a_product_changes(self):
+        product = make_products(1)[0]
+        self.client.get(reverse("shop"))
+
+        # warm cache + anonymous visitor: no database work at all
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("shop"))
+        self.assertContains(response, "Tee 0")
+
+        product.name = "Renamed tee"
+        product.save()
+
+        self.assertContains(self.client.get(reverse("shop")), "Renamed tee")
+
+    def test_cart_count_is_not_cached_with_the_page(self):
+        product = make_products(1)[0]
+        self.client.get(reverse("product_detail", args=[product.id]))
+
+        self.client.post(reverse("cart_add", args=[product.id]))
+        response = self.client.get(reverse("product_detail", args=[product.id]))
+
+        self.assertContains(response, "Cart (1)")
+
+
+class AdminListPaginationTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user("staff", password="pw-12345-long", is_staff=True)
+        self.client.force_login(staff)
+
+    def test_orders_are_walked_page_by_page_without_gaps(self):
+        for i in range(60):
+            Order.objects.create(status="PAID" if i % 2 else "PENDING", **DELIVERY)
+
+        seen = []
+        url = reverse("admin_orders_list") + "?status=PAID"
+        while url:
+            response = self.client.get(url)
+            seen += [o.id for o in response.context["orders"]]
+            next_url = response.context["next_url"]
+            url = reverse("admin_orders_list") + next_url if next_url else None
+
+        paid = list(Order.objects.filter(status="PAID").order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, paid)
+
+    def test_prev_cursor_returns_to_the_newer_page(self):
+        for _ in range(30):
+            Order.objects.create(**DELIVERY)
+
+        first = self.client.get(reverse("admin_orders_list"))
+        second = self.client.get(reverse("admin_orders_list") + first.context["next_url"])
+        back = self.client.get(reverse("admin_orders_list") + second.context["prev_url"])
+
+        self.assertEqual(list(back.context["orders"]), list(first.context["orders"]))
+        self.assertIsNone(back.context["prev_url"])
+
+    def test_pager_is_not_in_the_page_title(self):
+        make_products(30)
+        for name, title in (("admin_products_list", "Admin • Products"), ("admin_designs_list", "Admin • Designs")):
+            with self.subTest(name=name):
+                self.assertContains(self.client.get(reverse(name)), f"<title>{title}</title>", html=False)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        failing = {r["label"]: r["plan"] for r in audit() if r["problems"] and not r["allowed"]}
+        self.assertEqual(failing, {})
+
+    def test_audited_queries_are_the_ones_views_run(self):
+        staff = User.objects.create_user("staff", password="pw-12345-long", is_staff=True)
+        self.client.force_login(staff)
+        checks = [
+            (reverse("my_designs"), queries.user_designs(staff.id)),
+            (reverse("admin_designs_list"), page_query(queries.admin_designs())),
+        ]
+        for url, queryset in checks:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+                self.assertIn(str(queryset.query), [q["sql"] for q in ctx.captured_queries])
+
+    def test_full_scans_are_detected(self):
+        self.assertEqual(find_problems("2 0 0 SCAN store_order"), ["full scan of store_order"])
+        self.assertEqual(find_problems("2 0 0 SCAN store_order USING INDEX order_created_idx"), [])
+        self.assertEqual(find_problems("Seq Scan on store_order  (cost=0.00..1.01)"), ["full scan of store_order"])
+
+
+class QueryBudgetTests(MediaTestCase):
+    """
+    Hits every view with several rows of related data. QueryBudgetMiddleware raises
+    if a view goes over its @query_budget, so an N+1 shows up as a failing test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user("staff", password="pw-12345-long", is_staff=True)
+        self.products = make_products(6)
+        self.designs = [
+            Design.objects.create(user=self.staff, product=p, design_data="{}") for p in self.products
+        ]
+        self.order = create_order_from_cart({str(p.id): {"qty": 2} for p in self.products}, self.staff, DELIVERY)
+        self.client.force_login(self.staff)
+        set_cart(self.client, {str(p.id): {"qty": 1} for p in self.products})
+
+    def test_the_whole_suite_raises_on_overruns(self):
+        # store/test_runner.py, not just the classes that ask for it
+        self.assertEqual(settings.QUERY_BUDGET_MODE, "raise")
+
+    def test_every_url_declares_a_budget(self):
+        def walk(patterns):
+            for p in patterns:
+                if isinstance(p, URLPattern):
+                    yield p
+                else:
+                    yield from walk(p.url_patterns)
+
+        store_views = [p for p in walk(get_resolver().url_patterns) if p.callback.__module__.startswith("store.")]
+        missing = [p.name for p in store_views if getattr(p.callback, "query_budget", None) is None]
+        self.assertEqual(missing, [])
+
+    def test_pages_stay_within_budget(self):
+        product, design, order = self.products[0], self.designs[0], self.order
+        urls = [
+            reverse("home"), reverse("shop"), reverse("about"),
+            reverse("product_detail", args=[product.id]),
+            reverse("cart"), reverse("checkout"),
+            reverse("payment", args=[order.id]), reverse("thank_you", args=[order.id]),
+            reverse("my_designs"),
+            reverse("admin_dashboard"), reverse("admin_products_list"),
+            reverse("admin_products_edit", args=[product.id]),
+            reverse("admin_orders_list"), reverse("admin_orders_detail", args=[order.id]),
+            reverse("admin_designs_list"), reverse("admin_designs_detail", args=[design.id]),
+            reverse("admin_users_list"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_writes_stay_within_budget(self):
+        product = self.products[0]
+        colors = iter(range(1, 10))
+        # distinct bytes per upload, so every file is a brand new blob (worst case)
+        upload = lambda name: SimpleUploadedFile(name, png_bytes(color=(next(colors), 0, 0, 255)))
+
+        self.client.post(reverse("cart_add", args=[product.id]))
+        self.client.post(reverse("checkout"), DELIVERY)
+        self.client.post(reverse("save_design", args=[product.id]), {"design_data": "{}", "size": "M"})
+        self.client.post(reverse("admin_orders_update_status", args=[self.order.id]), {"status": "PAID"})
+        self.client.post(reverse("admin_products_create"), {
+            "name": "New", "price": "9.99", "image": upload("a.png"), "template_image": upload("b.png"),
+        })
+        self.client.post(reverse("admin_products_edit", args=[product.id]), {
+            "name": "Edited", "price": "9.99", "image": upload("c.png"), "template_image": upload("d.png"),
+        })
+        self.client.post(reverse("admin_products_delete", args=[self.products[1].id]))
+
+    def test_designs_with_many_pictures_stay_within_budget(self):
+        product = self.products[0]
+        picture = lambda c: "data:image/png;base64," + base64.b64encode(png_bytes(color=(c, 9, 0, 255))).decode()
+        image = lambda i, c: {"id": f"i{i}", "type": "image", "src": picture(c), "x": 160, "y": 210, "w": 40, "h": 40}
+        # five brand-new pictures, one of them twice: reference counting is batched, not per picture
+        doc = {"version": 2, "elements": [image(i, c) for i, c in enumerate([1, 2, 3, 4, 5, 5])]}
+
+        draft = self.client.post(
+            reverse("create_design_draft", args=[product.id]), json.dumps(doc), content_type="application/json",
+        ).json()
+        delta = {"base": draft["revision"], "elements": {"i0": None, "i9": image(9, 6), "i8": image(8, 7)}}
+        self.client.generic("PATCH", draft["url"], json.dumps(delta), content_type="application/json")
+        doc["elements"] = [image(i, c) for i, c in enumerate([8, 9, 10, 11])]
+        self.client.post(reverse("save_design", args=[product.id]), {
+            "design_data": json.dumps(doc), "size": "M", "draft_id": draft["id"],
+        })
+
+        counts = dict(MediaBlob.objects.filter(name__in=Design.objects.get(id=draft["id"]).assets).values_list("name", "refcount"))
+        self.assertEqual(sorted(counts.values()), [1, 1, 1, 1])
+        self.assertEqual(MediaBlob.objects.filter(refcount__gt=0, name__startswith="cas/").count(), 4)
+
+
+class AsyncViewTests(TestCase):
+    """Browse -> cart -> checkout -> payment through the ASGI handler (async views + async middleware)."""
+
+    async def test_checkout_flow_over_asgi(self):
+        product = (await sync_to_async(make_products)(1))[0]
+
+        response = await self.async_client.get(reverse("shop"))
+        self.assertContains(response, product.name)
+        response = await self.async_client.get(reverse("product_detail", args=[product.id]))
+        self.assertEqual(response.status_code, 200)
+
+        await self.async_client.post(reverse("cart_add", args=[product.id]))
+        response = await self.async_client.get(reverse("cart"))
+        self.assertContains(response, "Cart (1)")
+
+        response = await self.async_client.post(reverse("checkout"), DELIVERY)
+        order = await Order.objects.aget()
+        self.assertRedirects(response, reverse("payment", args=[order.id]), fetch_redirect_response=False)
+
+        response = await self.async_client.post(reverse("payment", args=[order.id]))
+        self.assertRedirects(response, reverse("thank_you", args=[order.id]), fetch_redirect_response=False)
+        await order.arefresh_from_db()
+        self.assertEqual(order.status, "PAID")
+
+    async def test_missing_product_404s(self):
+        response = await self.async_client.get(reverse("product_detail", args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DashboardStatsTests(TestCase):
+    def test_counters_follow_orders_without_counting_tables(self):
+        products = make_products(2)
+        order = create_order_from_cart({str(p.id): {"qty": 1} for p in products}, None, DELIVERY)
+        mark_order_paid(order)
+
+        stats = get_stats()
+        self.assertEqual((stats.product_count, stats.order_count), (2, 1))
+        self.assertEqual((stats.pending_count, stats.paid_count), (0, 1))
+        self.assertEqual(stats.revenue, order.total_amount)
+
+        today = DailyStats.objects.get(date=timezone.localdate(order.created_at))
+        self.assertEqual((today.orders, today.revenue), (1, order.total_amount))
+
+    def test_reconcile_matches_incremental_counters(self):
+        products = make_products(3)
+        for p in products[:2]:
+            create_order_from_cart({str(p.id): {"qty": 2}}, None, DELIVERY)
+        Order.objects.first().delete()
+        products[2].delete()
+
+        incremental = StoreStats.objects.values().get()
+        rebuilt = StoreStats.objects.filter(id=reconcile_totals().id).values().get()
+
+        for field in ("product_count", "order_count", "pending_count", "revenue"):
+            self.assertEqual(incremental[field], rebuilt[field], field)
+
+
+class BenchFixtureTests(TestCase):
+    def test_seed_and_clear(self):
+        counts = seed(products=20, users=5, designs=30, orders=15)
+
+        stats = get_stats()
+        self.assertEqual(stats.product_count, 20)
+        self.assertEqual(stats.order_count, 15)
+        self.assertEqual(stats.design_count, 30)
+        self.assertEqual(counts["users"], 6)  # + the bench staff user
+        self.assertEqual(OrderItem.objects.count(), 45)
+
+        # a real account that merely starts with "bench_"
+        real = User.objects.create_user("bench_alice", password="pw-12345-long")
+        Design.objects.create(user=real, product=Product.objects.create(name="Real tee", price=Decimal("9.00")), design_data="{}")
+
+        clear_bench_data()
+        self.assertEqual(list(Product.objects.values_list("name", flat=True)), ["Real tee"])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(User.objects.values_list("username", flat=True)), ["bench_alice"])
+        self.assertEqual(Design.objects.get().user, real)
+        self.assertEqual(get_stats().order_count, 0)
+
+    def test_mixed_scenario_deals_every_role_early(self):
+        class VU:
+            def __init__(self, number):
+                self.number = number
+
+        scenario = mixed_scenario([
+            ("shopper", lambda vu: "shopper", 6),
+            ("designer", lambda vu: "designer", 3),
+            ("staff", lambda vu: "staff", 1),
+        ])
+        roles = [scenario(VU(n)) for n in range(10)]
+        self.assertEqual(set(roles[:3]), {"shopper", "designer", "staff"})
+        self.assertEqual(roles.count("shopper"), 6)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        cache.clear()
+        make_products(3)
+        self.staff = User.objects.create_user("staff", password="pw-12345-long", is_staff=True)
+
+    def test_views_are_measured_and_exported(self):
+        self.client.get(reverse("shop"))
+        self.client.get(reverse("shop"))
+
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse("admin_metrics")).content.decode()
+
+        self.assertIn('proxy_request_duration_seconds_count{view="shop"} 2', body)
+        self.assertIn('proxy_request_db_queries_bucket{view="shop",le="+Inf"} 2', body)
+        self.assertIn('proxy_requests_total{view="shop",status="200"} 2', body)
+        self.assertIn('proxy_response_size_bytes_count{view="shop"} 2', body)
+
+    def test_metrics_are_staff_only_unless_token(self):
+        self.assertEqual(self.client.get(reverse("admin_metrics")).status_code, 403)
+        with self.settings(METRICS={"TOKEN": "s3cret"}):
+            response = self.client.get(reverse("admin_metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_slow_sampled_requests_keep_their_sql(self):
+        product = Product.objects.first()
+        with self.settings(METRICS={"SLOW_REQUEST_MS": 0, "TRACE_SAMPLE_RATE": 1.0}):
+            with self.assertLogs("store.metrics", "WARNING"):
+                self.client.get(reverse("product_detail", args=[product.id]))
+                self.client.force_login(self.staff)
+                traces = self.client.get(reverse("admin_metrics_traces")).json()["traces"]
+
+        detail = [t for t in traces if t["view"] == "product_detail"]
+        self.assertEqual(len(detail), 1)
+        self.assertIn("store_product", detail[0]["queries"][0]["sql"])
+
+    def test_worker_snapshots_add_up(self):
+        hist = {"buckets": [1, 0, 1], "sum": 2.0, "count": 2}
+        snap = {"histograms": {"proxy_request_db_queries": {"shop": hist}}, "requests": {"shop": {"200": 2}}, "traces": []}
+        merged = merge([snap, snap])
+        self.assertEqual(merged["histograms"]["proxy_request_db_queries"]["shop"]["buckets"], [2, 0, 2])
+        self.assertEqual(merged["requests"]["shop"]["200"], 4)
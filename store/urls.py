@@ -10,7 +10,7 @@ urlpatterns = [
 
     path("cart/", views.cart_view, name="cart"),
     path("cart/add/<int:product_id>/", views.cart_add, name="cart_add"),
-    path("cart/remove/<int:product_id>/", views.cart_remove, name="cart_remove"),
+    path("cart/remove/<str:key>/", views.cart_remove, name="cart_remove"),
 
     path("checkout/", views.checkout_view, name="checkout"),
     path("thank-you/<int:order_id>/", views.thank_you, name="thank_you"),
@@ -18,6 +18,9 @@ urlpatterns = [
 
     path("customise/<int:product_id>/", views.customise_view, name="customise"),
     path("save-design/<int:product_id>/", views.save_design_view, name="save_design"),
+    path("design-asset/", views.upload_design_asset, name="upload_design_asset"),
+    path("design-drafts/new/<int:product_id>/", views.create_design_draft, name="create_design_draft"),
+    path("design-drafts/<int:design_id>/", views.patch_design_draft, name="patch_design_draft"),
     path("my-designs/", views.my_designs_view, name="my_designs"),
 
     path("register/", views.register_view, name="register"),
@@ -1,79 +1,138 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.core.files.base import ContentFile
+import json
 
-import base64
+from django.conf import settings
+from django.shortcuts import render, redirect, aget_object_or_404, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
 
 from .models import Product, Order, Design
+from .query_budget import query_budget
 from .forms import CheckoutForm
-from .services.order_service import build_cart_summary, create_order_from_cart
-from .services.payment_service import mark_order_paid
+from .services.order_service import SIZES, aprice_cart, acreate_order_from_cart
+from .services.payment_service import amark_order_paid
+from .services.catalogue_cache import acatalogue_version, aget_product, aget_product_list, cache_timeout
+from .services.design_schema import (
+    MAX_ASSET_BYTES, MAX_ASSET_PIXELS, DesignDataError, apply_delta, dump_design, extract_assets,
+    load_delta, load_design, prepare_design, save_asset,
+)
+from .services.job_queue import enqueue
+from .services.print_export import print_box, print_size
+from .services.queries import featured_products, open_draft, shop_products, user_designs
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import RegisterForm
 
 
+# ----------------------------
+# ASYNC HELPERS
+# ----------------------------
+
+# The catalogue, cart and checkout/payment views are async (they're the busiest pages,
+# and under ASGI an async view doesn't hold a thread while it waits on the DB/cache).
+# The rest stay sync - Django runs those in a thread for us.
+#
+# Rule for async views: nothing may query lazily from the event loop. That means
+# - the cart + user are loaded up front (load_request_state), because the
+#   cart_count/auth context processors read them while the template renders
+# - templates get lists, not lazy querysets
+
+async def load_request_state(request):
+    """
+    Loads the cart and the user with the async APIs and returns the cart.
+    After this, request.cart / request.user are plain cached values.
+    """
+    await request.cart.aload()
+    request.user = await request.auser()
+    return request.cart
+
 
 # ----------------------------
 # BASIC PAGES
 # ----------------------------
 
-def home(request):
-    featured = Product.objects.all().order_by("-created_at")[:4]
-    return render(request, "store/home.html", {"featured": featured})
+# Catalogue pages: the product grids are cached as template fragments keyed by
+# catalogue_version (bumped on every Product save/delete), and the product lists
+# behind them are cached per version too, so a warm page runs no Product query.
+# The navbar (cart count, login links) is outside the cached fragments so it stays per-user.
+
+async def catalogue_context(**extra):
+    return {"catalogue_version": await acatalogue_version(), "catalogue_timeout": cache_timeout(), **extra}
+
+
+@query_budget(3)
+async def home(request):
+    await load_request_state(request)
+    featured = await aget_product_list("featured", featured_products())
+    return render(request, "store/home.html", await catalogue_context(featured=featured))
 
 
+@query_budget(2)
 def about(request):
     return render(request, "store/about.html")
 
 
-def shop(request):
-    products = Product.objects.all().order_by("-created_at")
-    return render(request, "store/shop.html", {"products": products})
+@query_budget(3)
+async def shop(request):
+    await load_request_state(request)
+    products = await aget_product_list("shop", shop_products())
+    return render(request, "store/shop.html", await catalogue_context(products=products))
 
 
-def product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    return render(request, "store/product_detail.html", {"product": product})
+@query_budget(3)
+async def product_detail(request, product_id):
+    await load_request_state(request)
+    product = await aget_product(product_id)
+    return render(request, "store/product_detail.html", await catalogue_context(product=product))
 
 
 # ----------------------------
-# CART (SESSION-BASED)
+# CART (COOKIE, see cart_store.py)
 # ----------------------------
 
-def cart_view(request):
-    cart = request.session.get("cart", {})
-    items, total = build_cart_summary(cart)
-    return render(request, "store/cart.html", {"items": items, "total": total})
+@query_budget(4)
+async def cart_view(request):
+    cart = await load_request_state(request)
+    priced = await aprice_cart(cart.lines)
+    # products/designs deleted since they were added: remove them from the cart
+    cart.drop(priced.missing_ids)
+    return render(request, "store/cart.html", {"items": priced.items, "total": priced.total})
 
 
+@query_budget(3)
 def cart_add(request, product_id):
+    """
+    Adds a product to the cart, or one of the user's saved designs for it
+    (POST design_id, + size; the design's own size is the default).
+    """
     # Only allow add via POST (prevents “add by typing URL”)
     if request.method != "POST":
         return redirect("product_detail", product_id=product_id)
 
-    cart = request.session.get("cart", {})
-    key = str(product_id)
-
-    if key in cart:
-        cart[key]["qty"] += 1
-    else:
-        cart[key] = {"qty": 1}
+    size = request.POST.get("size", "")
+    design_id = request.POST.get("design_id", "")
+    design = None
+    if design_id:
+        # only your own designs, and only for this product
+        if design_id.isdigit():
+            design = (
+                Design.objects.filter(id=design_id, user_id=request.user.id, product_id=product_id, is_draft=False)
+                .only("id", "size")
+                .first()
+            )
+        if design is None:
+            return redirect("my_designs")
+        size = size or design.size
 
-    request.session["cart"] = cart
-    request.session.modified = True
+    request.cart.add(product_id, design.id if design else None, size if size in SIZES else "")
     return redirect("cart")
 
 
-def cart_remove(request, product_id):
-    cart = request.session.get("cart", {})
-    key = str(product_id)
-
-    if key in cart:
-        del cart[key]
-        request.session["cart"] = cart
-        request.session.modified = True
-
+@query_budget(0)
+def cart_remove(request, key):
+    request.cart.remove(key)
     return redirect("cart")
 
 
@@ -81,18 +140,24 @@ def cart_remove(request, product_id):
 # CHECKOUT + PAYMENT
 # ----------------------------
 
-def checkout_view(request):
+@query_budget(17)  # 14 + designs in the cart (price them, copy them, count their pictures)
+async def checkout_view(request):
     """
     - View handles request/response only
     - Form handles validation
     - Service handles order creation logic
     """
-    cart = request.session.get("cart", {})
+    cart = await load_request_state(request)
 
     if not cart:
         return redirect("cart")
 
-    items, total = build_cart_summary(cart)
+    # price the cart once and reuse it for both the page and the order
+    priced = await aprice_cart(cart.lines)
+    cart.drop(priced.missing_ids)
+
+    if not priced:
+        return redirect("cart")
 
     if request.method == "POST":
         form = CheckoutForm(request.POST)
@@ -100,15 +165,15 @@ def checkout_view(request):
         if form.is_valid():
             delivery_data = form.cleaned_data
 
-            order = create_order_from_cart(
-                cart=cart,
+            order = await acreate_order_from_cart(
+                cart=cart.lines,
                 user=request.user if request.user.is_authenticated else None,
-                delivery_data=delivery_data
+                delivery_data=delivery_data,
+                priced_cart=priced
             )
 
             # Clear cart after order is created
-            request.session["cart"] = {}
-            request.session.modified = True
+            cart.clear()
 
             # Send them to payment step
             return redirect("payment", order_id=order.id)
@@ -118,27 +183,31 @@ def checkout_view(request):
 
     return render(request, "store/checkout.html", {
         "form": form,
-        "items": items,
-        "total": total
+        "items": priced.items,
+        "total": priced.total
     })
 
 
-def payment_view(request, order_id):
+@query_budget(8)
+async def payment_view(request, order_id):
     """
     Payment step (simulated).
     View is thin: it just updates the order using a service.
     """
-    order = get_object_or_404(Order, id=order_id)
+    await load_request_state(request)
+    order = await aget_object_or_404(Order, id=order_id)
 
     if request.method == "POST":
-        mark_order_paid(order)
+        await amark_order_paid(order)
         return redirect("thank_you", order_id=order.id)
 
     return render(request, "store/payment.html", {"order": order})
 
 
-def thank_you(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+@query_budget(3)
+async def thank_you(request, order_id):
+    await load_request_state(request)
+    order = await aget_object_or_404(Order, id=order_id)
     return render(request, "store/thank_you.html", {"order": order})
 
 
@@ -146,7 +215,13 @@ def thank_you(request, order_id):
 # CUSTOMISER + DESIGNS
 # ----------------------------
 
+def draft_info(design):
+    """What customise.js needs to keep autosaving into a draft."""
+    return {"id": design.id, "revision": design.revision, "url": reverse("patch_design_draft", args=[design.id])}
+
+
 @login_required
+@query_budget(4)
 def customise_view(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
@@ -154,19 +229,137 @@ def customise_view(request, product_id):
     if not product.template_image:
         return render(request, "store/customise_missing_template.html", {"product": product})
 
+    # Carry on with the autosaved draft for this product, if there is one
+    draft = open_draft(request.user.id, product.id).first()
+
+    # Pictures are shrunk in the browser to what the print file can use (the whole print
+    # area at print DPI), then uploaded on their own; the design JSON only names them.
+    print_width, print_height, _ = print_size(print_box(product))
     context = {
         "product": product,
+        # canvas-sized copy once the product job has made it, so the browser never rescales it
+        "template_url": (product.template_canvas or product.template_image).url,
         "print_area": {
             "x": product.print_x,
             "y": product.print_y,
             "w": product.print_w,
             "h": product.print_h,
-        }
+        },
+        "upload": {
+            "url": reverse("upload_design_asset"),
+            "printWidth": print_width,
+            "printHeight": print_height,
+            "maxBytes": MAX_ASSET_BYTES,
+            "maxPixels": MAX_ASSET_PIXELS,
+            "mediaUrl": settings.MEDIA_URL,
+        },
+        "drafts": {
+            "createUrl": reverse("create_design_draft", args=[product.id]),
+            # json_script in the template: the document holds user text
+            "draft": {**draft_info(draft), "document": json.loads(draft.design_data)} if draft else None,
+        },
     }
     return render(request, "store/customise.html", context)
 
 
 @login_required
+@query_budget(2)
+def upload_design_asset(request):
+    """
+    Stores one picture for the customiser (already downscaled + compressed by customise.js)
+    and returns its storage name, which the design's image element then points to ("asset").
+    Nothing references it until a design is saved with it; gc_media's grace period covers that.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    upload = request.FILES.get("image")
+    if upload is None:
+        return JsonResponse({"error": "No image sent"}, status=400)
+    if upload.size > MAX_ASSET_BYTES:
+        return JsonResponse({"error": "Image is too big"}, status=400)
+
+    try:
+        asset = save_asset(upload.read())
+    except DesignDataError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"asset": asset})
+
+
+# ---- drafts (autosave) ----
+# customise.js creates a draft with the whole document on the first change, then only
+# sends deltas (design_schema.apply_delta) a second or so after each edit. The draft is
+# one Design row (is_draft=True) whose revision counts the deltas; Save turns it into a
+# normal design, which is also when the preview gets rendered.
+
+def json_body(request):
+    try:
+        return request.body.decode()
+    except UnicodeDecodeError:
+        return ""
+
+
+@login_required
+@query_budget(10)  # incl. brand-new pictures (media refcounts are batched, any number costs 4)
+def create_design_draft(request, product_id):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    product = get_object_or_404(Product.objects.only("id"), id=product_id)
+
+    try:
+        design_data, assets = prepare_design(json_body(request))
+    except DesignDataError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    with transaction.atomic():
+        design = Design.objects.create(
+            user=request.user, product=product, design_data=design_data, assets=assets, is_draft=True,
+        )
+    return JsonResponse(draft_info(design), status=201)
+
+
+@login_required
+@query_budget(11)  # incl. pictures added (up to 4, batched) and removed (1)
+def patch_design_draft(request, design_id):
+    """
+    Applies one autosave delta. 409 if it was made against an older revision (another tab
+    saved in between); the browser then sends everything again against the current one.
+    """
+    if request.method != "PATCH":
+        return HttpResponseNotAllowed(["PATCH"])
+
+    try:
+        delta = load_delta(json_body(request))
+    except DesignDataError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    with transaction.atomic():
+        design = (
+            Design.objects.select_for_update()
+            .filter(id=design_id, user=request.user, is_draft=True)
+            .only("id", "design_data", "assets", "revision", "is_draft")
+            .first()
+        )
+        if design is None:
+            return JsonResponse({"error": "No such draft"}, status=404)
+        if delta["base"] != design.revision:
+            return JsonResponse({"error": "Draft has changed", "revision": design.revision}, status=409)
+
+        try:
+            document, assets = extract_assets(apply_delta(load_design(design.design_data), delta))
+            design.design_data = dump_design(document)
+        except DesignDataError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+        design.assets = assets
+        design.revision += 1
+        design.save(update_fields=["design_data", "assets", "revision"])
+
+    return JsonResponse({"revision": design.revision})
+
+
+@login_required
+@query_budget(17)  # worst case: promoting a draft with new + removed pictures, first design of the day
 def save_design_view(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
@@ -174,43 +367,52 @@ def save_design_view(request, product_id):
         return redirect("customise", product_id=product.id)
 
     design_json = request.POST.get("design_data", "")
-    preview_data_url = request.POST.get("preview_data_url", "")
     size = request.POST.get("size", "")
 
-    # If the JS didn't send design data, just bounce back
-    if not design_json or not preview_data_url:
+    # The browser only sends the design JSON; the preview PNG is rendered in the
+    # background from the JSON + product template. Validated against the design schema,
+    # with any inline pictures moved out into media files first.
+    try:
+        design_data, assets = prepare_design(design_json)
+    except DesignDataError:
         return redirect("customise", product_id=product.id)
 
-    # Save design row in SQL
-    design = Design.objects.create(
-        user=request.user,
-        product=product,
-        design_data=design_json,
-        size=size
-    )
-
-    # Save preview image (canvas screenshot) as a real file
-    try:
-        header, data = preview_data_url.split(";base64,")
-        file_data = base64.b64decode(data)
-        design.preview.save(
-            f"design_{design.id}.png",
-            ContentFile(file_data),
-            save=True
-        )
-    except Exception:
-        # If image saving fails, still keep the design JSON
-        pass
+    # Save design row in SQL + queue its preview (my_designs shows "rendering" until done).
+    # An autosaved draft of it becomes this design, rather than leaving a second copy behind.
+    draft_id = request.POST.get("draft_id", "")
+    with transaction.atomic():
+        design = None
+        if draft_id.isdigit():
+            design = (
+                Design.objects.select_for_update()
+                .filter(id=draft_id, user=request.user, product=product, is_draft=True)
+                .defer("design_data")
+                .first()
+            )
+        if design is None:
+            design = Design(user=request.user, product=product)
+        else:
+            design.created_at = timezone.now()  # saved now, not when the draft was started
+
+        design.design_data = design_data
+        design.assets = assets
+        design.size = size
+        design.is_draft = False
+        design.preview_status = "PENDING"
+        design.save()
+        enqueue("render_design_preview", design_id=design.id)
 
     return redirect("my_designs")
 
 
 @login_required
+@query_budget(3)
 def my_designs_view(request):
-    designs = Design.objects.filter(user=request.user).order_by("-created_at")
+    designs = user_designs(request.user.id)
     return render(request, "store/my_designs.html", {"designs": designs})
 
 
+@query_budget(15)
 def register_view(request):
     """
     Creates a new user account and logs them in straight away.
@@ -230,6 +432,7 @@ def register_view(request):
     return render(request, "store/register.html", {"form": form})
 
 
+@query_budget(9)
 def login_view(request):
     """
     Logs a user in using Django's AuthenticationForm.
@@ -253,7 +456,10 @@ def login_view(request):
     return render(request, "store/login.html", {"form": form})
 
 
+@query_budget(4)
 def logout_view(request):
     logout(request)
+    # the cart is a cookie now, not part of the session logout() flushes
+    request.cart.clear()
     return redirect("home")
 